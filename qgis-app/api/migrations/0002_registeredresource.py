@@ -0,0 +1,58 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+RESOURCE_MODELS = [
+    ("geopackages", "Geopackage"),
+    ("layerdefinitions", "LayerDefinition"),
+    ("models", "Model"),
+    ("styles", "Style"),
+    ("wavefronts", "Wavefront"),
+]
+
+
+def populate_registered_resources(apps, schema_editor):
+    ContentType = apps.get_model("contenttypes", "ContentType")
+    RegisteredResource = apps.get_model("api", "RegisteredResource")
+
+    for app_label, model_name in RESOURCE_MODELS:
+        model = apps.get_model(app_label, model_name)
+        content_type, created = ContentType.objects.get_or_create(
+            app_label=app_label, model=model_name.lower()
+        )
+        RegisteredResource.objects.bulk_create(
+            [
+                RegisteredResource(
+                    uuid=uuid, content_type=content_type, object_id=object_id
+                )
+                for object_id, uuid in model.objects.values_list("pk", "uuid")
+            ],
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("contenttypes", "0002_remove_content_type_name"),
+        ("api", "0001_initial"),
+        ("geopackages", "0011_geopackage_search_vector"),
+        ("layerdefinitions", "0004_layerdefinition_search_vector"),
+        ("models", "0010_model_search_vector"),
+        ("styles", "0017_style_search_vector"),
+        ("wavefronts", "0004_wavefront_search_vector"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RegisteredResource",
+            fields=[
+                ("uuid", models.UUIDField(primary_key=True, serialize=False)),
+                ("object_id", models.PositiveIntegerField()),
+                ("content_type", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to="contenttypes.contenttype")),
+            ],
+            options={
+                "unique_together": {("content_type", "object_id")},
+            },
+        ),
+        migrations.RunPython(populate_registered_resources, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,10 @@
 from base.models.processing_models import Resource
-from django.db import models
+from django.contrib.contenttypes.models import ContentType
+from django.db import models, transaction
 from django.utils.translation import gettext_lazy as _
 from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
 from django.contrib.auth.models import User
+from lib.token_cache import invalidate_token_record
 
 class UserOutstandingToken(models.Model):
     """
@@ -33,4 +35,84 @@ class UserOutstandingToken(models.Model):
         verbose_name=_("Last used at"),
         blank=True,
         null=True
-    )
\ No newline at end of file
+    )
+
+
+class RegisteredResource(models.Model):
+    """
+    Type and id of the shared resources by uuid, kept in sync by the
+    resources post_save and post_delete signals
+    """
+    uuid = models.UUIDField(primary_key=True)
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ("content_type", "object_id")
+
+    @classmethod
+    def get_model(cls, uuid):
+        """
+        Returns the resource model and id of the uuid, or (None, None)
+        """
+        entry = cls.objects.filter(uuid=uuid).values_list(
+            "content_type_id", "object_id"
+        ).first()
+        if entry is None:
+            return None, None
+        content_type_id, object_id = entry
+        return ContentType.objects.get_for_id(content_type_id).model_class(), object_id
+
+
+def register_resource(
+    sender, instance, created=False, raw=False, update_fields=None, **kw
+):
+    """
+    Registers the uuid of a saved resource
+    """
+    if raw:
+        return
+    if not created and update_fields and "uuid" not in update_fields:
+        return
+    content_type = ContentType.objects.get_for_model(instance)
+    with transaction.atomic():
+        if not created:
+            # The uuid of the resource may have changed
+            RegisteredResource.objects.filter(
+                content_type=content_type, object_id=instance.pk
+            ).exclude(uuid=instance.uuid).delete()
+        RegisteredResource.objects.bulk_create(
+            [
+                RegisteredResource(
+                    uuid=instance.uuid,
+                    content_type=content_type,
+                    object_id=instance.pk,
+                )
+            ],
+            update_conflicts=True,
+            unique_fields=["uuid"],
+            update_fields=["content_type", "object_id"],
+        )
+
+
+def unregister_resource(sender, instance, **kw):
+    """
+    Unregisters the uuid of a deleted resource
+    """
+    RegisteredResource.objects.filter(uuid=instance.uuid).delete()
+
+
+def connect_resource_signals():
+    """
+    Connects the uuid registration to every resource model, once the
+    models of the resources apps are loaded
+    """
+    for resource_model in Resource.__subclasses__():
+        if resource_model._meta.abstract:
+            continue
+        models.signals.post_save.connect(register_resource, sender=resource_model)
+        models.signals.post_delete.connect(unregister_resource, sender=resource_model)
+
+
+models.signals.post_save.connect(invalidate_token_record, sender=UserOutstandingToken)
+models.signals.post_delete.connect(invalidate_token_record, sender=UserOutstandingToken)
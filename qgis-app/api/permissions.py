@@ -1,11 +1,10 @@
 from rest_framework import permissions
 from rest_framework.permissions import BasePermission
 from rest_framework_simplejwt.authentication import JWTAuthentication
-from django.contrib.auth.models import User
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
-from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
-import datetime
+from django.utils.functional import SimpleLazyObject
 from api.models import UserOutstandingToken
+from lib.token_cache import token_validation_cache
 
 MANAGER_GROUP = "Style Managers"
 
@@ -29,6 +28,23 @@ class IsHasAccessOrReadOnly(permissions.BasePermission):
 
         return user == obj.creator or user.is_staff or is_manager
 
+def _load_user_token(jti, user_id):
+  """
+  Returns the id and last use date of the user token record of an
+  outstanding and not blacklisted token, or False
+  """
+  user_token = (
+    UserOutstandingToken.objects.filter(
+      token__jti=jti, user_id=user_id, token__blacklistedtoken__isnull=True
+    )
+    .values("pk", "last_used_at")
+    .first()
+  )
+  if user_token is None:
+    return False
+  return {"id": user_token["pk"], "last_used": user_token["last_used_at"]}
+
+
 class HasValidToken(BasePermission):
   def has_permission(self, request, view):
     auth_token = request.META.get("HTTP_AUTHORIZATION")
@@ -41,18 +57,21 @@ class HasValidToken(BasePermission):
       validated_token = authentication.get_validated_token(auth_token[7:])
       user_id = validated_token.payload.get('user_id')
       jti = validated_token.payload.get('refresh_jti')
-      token_id = OutstandingToken.objects.get(jti=jti).pk
-      is_blacklisted = BlacklistedToken.objects.filter(token_id=token_id).exists()
-      if not user_id or is_blacklisted:
+      if not user_id or not jti:
         return False
 
-      user = User.objects.get(pk=user_id)
-      if not user:
+      # Cached until the token is blacklisted or deleted
+      validation = token_validation_cache.get(
+        "user", jti, lambda: _load_user_token(jti, user_id)
+      )
+      if not validation:
         return False
-      user_token = UserOutstandingToken.objects.get(token__pk=token_id, user=user)
-      user_token.last_used_at = datetime.datetime.now()
-      user_token.save()
-      request.user_token = user_token
+      token_validation_cache.touch(
+        UserOutstandingToken, validation["id"], "last_used_at", validation["last_used"]
+      )
+      request.user_token = SimpleLazyObject(
+        lambda: UserOutstandingToken.objects.get(pk=validation["id"])
+      )
       return True
     except (InvalidToken, TokenError):
-      return False
\ No newline at end of file
+      return False
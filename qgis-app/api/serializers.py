@@ -5,9 +5,9 @@ from rest_framework import serializers
 from styles.models import Style, StyleType
 from layerdefinitions.models import LayerDefinition
 from wavefronts.models import WAVEFRONTS_STORAGE_PATH, Wavefront
-from sorl.thumbnail import get_thumbnail
+from base.thumbnails import get_resource_thumbnail
 from django.conf import settings
-from os.path import exists, join
+from os.path import join
 from django.templatetags.static import static
 from wavefronts.validator import WavefrontValidator
 
@@ -51,20 +51,16 @@ class ResourceBaseSerializer(serializers.ModelSerializer):
 
     def get_thumbnail(self, obj):
         request = self.context.get('request')
-        try:
-            if obj.thumbnail_image and exists(obj.thumbnail_image.path):
-                thumbnail = get_thumbnail(obj.thumbnail_image, "128x128", crop="center")
-                if request is not None:
-                    return request.build_absolute_uri(thumbnail.url)
-                return thumbnail.url
-        except Exception as e:
-            pass
-
-        # Return a full URL to a default image if no thumbnail exists or if there's an error
-        default_url = static("images/qgis-icon-32x32.png")
+        thumbnail = get_resource_thumbnail(obj, "api")
+        if thumbnail is not None:
+            url = thumbnail["url"]
+        else:
+            # Default image until the thumbnails are rendered, or if the
+            # resource has no image
+            url = static("images/qgis-icon-32x32.png")
         if request is not None:
-            return request.build_absolute_uri(default_url)
-        return default_url
+            return request.build_absolute_uri(url)
+        return url
 
 
 class GeopackageSerializer(ResourceBaseSerializer):
@@ -2,6 +2,8 @@ import io
 import json
 import zipfile
 import os
+import uuid
+from unittest import mock
 
 from django.contrib.auth.models import Group, User
 from django.core.files.base import ContentFile
@@ -10,6 +12,12 @@ from django.test import TestCase, override_settings
 from django.urls import reverse
 
 # models
+from base.downloads import (
+    flush_resource_download_buffer,
+    resource_download_buffer,
+)
+from api.models import RegisteredResource
+from base.thumbnails import get_resource_thumbnail, update_resource_thumbnails
 from geopackages.models import Geopackage
 from models.models import Model
 from styles.models import Style, StyleType
@@ -205,6 +213,28 @@ class TestResourceAPIList(TestCase):
         self.assertIsNone(w_index)
         self.assertIsNotNone(s_index)
 
+    def test_get_list_resources_paginated(self):
+        url = "%s?%s" % (reverse("resource-list"), "limit=2&offset=0")
+        response = self.client.get(url)
+        json_parse = json.loads(response.content)
+        self.assertEqual(json_parse["total"], 5)
+        self.assertIsNone(json_parse["previous"])
+        self.assertIn("offset=2", json_parse["next"])
+        self.assertEqual(
+            [d["resource_type"] for d in json_parse["results"]],
+            ["LayerDefinition", "3DModel"],
+        )
+
+        url = "%s?%s" % (reverse("resource-list"), "limit=2&offset=4")
+        response = self.client.get(url)
+        json_parse = json.loads(response.content)
+        self.assertEqual(json_parse["total"], 5)
+        self.assertIsNone(json_parse["next"])
+        self.assertEqual(
+            [d["resource_type"] for d in json_parse["results"]], ["Style"]
+        )
+        self.assertEqual(json_parse["results"][0]["name"], "style_zero")
+
     def test_get_list_resources_with_filter_creator(self):
         param = "creator=creator 0"
         url = "%s?%s" % (reverse("resource-list"), param)
@@ -234,6 +264,19 @@ class TestResourceAPIList(TestCase):
         self.assertIsNotNone(w_index)
         self.assertIsNone(s_index)
 
+    def test_get_list_resources_with_filter_creator_renamed(self):
+        self.creator0.first_name = "Alice"
+        self.creator0.save()
+        url = "%s?%s" % (reverse("resource-list"), "creator=alice")
+        response = self.client.get(url)
+        json_parse = json.loads(response.content)
+        self.assertEqual(json_parse["total"], 3)
+        # The keyword does not match the creator names
+        url = "%s?%s" % (reverse("resource-list"), "keyword=alice")
+        response = self.client.get(url)
+        json_parse = json.loads(response.content)
+        self.assertEqual(json_parse["total"], 0)
+
     def test_get_list_resources_with_filter_keyword(self):
         param = "keyword=testing"
         url = "%s?%s" % (reverse("resource-list"), param)
@@ -270,14 +313,63 @@ class TestResourceAPIList(TestCase):
         self.assertEqual(
             response.get("Content-Disposition"), "attachment; filename=style_zero.zip"
         )
-        with io.BytesIO(response.content) as file:
+        with io.BytesIO(b"".join(response.streaming_content)) as file:
             zip_file = zipfile.ZipFile(file, "r")
             self.assertIsNone(zip_file.testzip())
             self.assertIn("a_filename", zip_file.namelist()[0])
             self.assertNotIn(".zip", zip_file.namelist())
             zip_file.close()
 
+    def test_download_resource_counted(self):
+        url = reverse("resource-download", kwargs={"uuid": self.style.uuid})
+        for i in range(2):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            response.close()
+        self.style.refresh_from_db()
+        self.assertEqual(self.style.download_count, 2)
+
+    @override_settings(
+        CACHES={
+            "default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"},
+            "downloads": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+        }
+    )
+    def test_download_resource_buffered(self):
+        with mock.patch.object(resource_download_buffer, "cache_alias", "downloads"):
+            resource_download_buffer.cache.clear()
+            url = reverse("resource-download", kwargs={"uuid": self.style.uuid})
+            for i in range(3):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                response.close()
+            self.style.refresh_from_db()
+            self.assertEqual(self.style.download_count, 0)
+
+            self.assertEqual(flush_resource_download_buffer(), 3)
+            self.style.refresh_from_db()
+            self.assertEqual(self.style.download_count, 3)
+
+    def test_download_resource_registry(self):
+        self.assertEqual(RegisteredResource.objects.count(), 5)
+        self.assertEqual(
+            RegisteredResource.get_model(self.style.uuid), (Style, self.style.pk)
+        )
+        url = reverse("resource-download", kwargs={"uuid": uuid.uuid4()})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 404)
+
+        Style.objects.filter(pk=self.style.pk).update(approved=False)
+        url = reverse("resource-download", kwargs={"uuid": self.style.uuid})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 404)
+
+        self.style.delete()
+        self.assertEqual(RegisteredResource.objects.count(), 4)
+        self.assertEqual(RegisteredResource.get_model(self.style.uuid), (None, None))
+
     def test_thumbnail_exists(self):
+        update_resource_thumbnails(Style, self.style.pk)
         url = reverse("resource-list")
         response = self.client.get(url)
         json_parse = json.loads(response.content)
@@ -298,6 +390,28 @@ class TestResourceAPIList(TestCase):
         expected_url = 'http://testserver/media/cache'
         self.assertTrue(str(result[s_index]['thumbnail']).startswith(expected_url))
 
+    @mock.patch("base.models.processing_models.queue_resource_thumbnails")
+    def test_thumbnails_rendered(self, queue_resource_thumbnails):
+        self.assertIsNone(get_resource_thumbnail(self.style, "api"))
+        self.assertTrue(update_resource_thumbnails(Style, self.style.pk))
+        self.style.refresh_from_db()
+        thumbnail = get_resource_thumbnail(self.style, "api")
+        self.assertTrue(thumbnail["url"].startswith("/media/cache"))
+        # The 1x1 image is not upscaled
+        self.assertEqual((thumbnail["width"], thumbnail["height"]), (1, 1))
+
+        # The thumbnails of the previous image are dropped
+        self.style.name = "style renamed"
+        self.style.save()
+        queue_resource_thumbnails.assert_not_called()
+        self.style.thumbnail_image = SimpleUploadedFile(
+            "new.gif", self.style.thumbnail_image.read(), content_type="image/gif"
+        )
+        self.style.save()
+        queue_resource_thumbnails.assert_called_once_with(self.style)
+        self.style.refresh_from_db()
+        self.assertEqual(self.style.thumbnails, {})
+
     def test_thumbnail_missing(self):
         # Ensure that the object's thumbnail_image is missing
         os.remove(self.style.thumbnail_image.path)
@@ -1,18 +1,18 @@
 from collections import OrderedDict
 
 from api.serializers import GeopackageSerializer, ModelSerializer, StyleSerializer, LayerDefinitionSerializer, WavefrontSerializer
-from base.license import zip_a_file_if_not_zipfile
-from django.contrib.postgres.search import SearchVector
-from django.http import Http404, HttpResponse, HttpResponseRedirect
+from base.downloads import record_resource_download
+from base.models.processing_models import resource_search_query
+from django.http import Http404, HttpResponseRedirect
+from lib.file_delivery import serve_file
 from django.utils.decorators import method_decorator
 from django.utils.text import slugify
 from django.views.decorators.cache import cache_page
-from drf_multiple_model.pagination import MultipleModelLimitOffsetPagination
-from drf_multiple_model.views import FlatMultipleModelAPIView
 from django.views.decorators.csrf import ensure_csrf_cookie
 from django.shortcuts import get_object_or_404, render
 from django.contrib.auth.decorators import login_required
 from django.db import transaction
+from django.db.models import IntegerField, Value
 
 from django.views.generic import ListView, DetailView
 from rest_framework_simplejwt.tokens import RefreshToken, api_settings
@@ -27,13 +27,14 @@ from django.contrib import messages
 # models
 from geopackages.models import Geopackage
 from models.models import Model
-from rest_framework import filters, permissions
+from rest_framework import generics, permissions
+from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
 from styles.models import Style
 from layerdefinitions.models import LayerDefinition
 from wavefronts.models import Wavefront
-from api.models import UserOutstandingToken
+from api.models import RegisteredResource, UserOutstandingToken
 from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
 
 from rest_framework.response import Response
@@ -60,24 +61,23 @@ def filter_resource_subtype(queryset, request, *args, **kwargs):
         return queryset.none()
 
 
+def filter_search_vector(queryset, text, weights):
+    search_query = resource_search_query(text, weights)
+    if search_query is None:
+        return queryset.none()
+    return queryset.filter(search_vector=search_query)
+
+
 def filter_creator(queryset, request, *args, **kwargs):
     creator = request.query_params["creator"]
-    qs = queryset.annotate(
-        search=(
-            SearchVector("creator__username")
-            + SearchVector("creator__first_name")
-            + SearchVector("creator__last_name")
-        )
-    ).filter(search=creator)
-    return qs
+    # The creator names have the weight C in the search vector
+    return filter_search_vector(queryset, creator, "C")
 
 
 def filter_keyword(queryset, request, *args, **kwargs):
     keyword = request.query_params["keyword"]
-    qs = queryset.annotate(
-        search=(SearchVector("name") + SearchVector("description"))
-    ).filter(search=keyword)
-    return qs
+    # The name and description have the weights A and B
+    return filter_search_vector(queryset, keyword, "AB")
 
 
 def filter_general(queryset, request, *args, **kwargs):
@@ -96,34 +96,40 @@ def filter_general(queryset, request, *args, **kwargs):
     return queryset
 
 
-class LimitPagination(MultipleModelLimitOffsetPagination):
+class LimitPagination(LimitOffsetPagination):
     default_limit = 10
 
-    def format_response(self, data):
+    def get_paginated_response(self, data):
         """
         override the output of pagination
         """
 
-        return OrderedDict(
-            [
-                ("total", self.total),
-                ("next", self.get_next_link()),
-                ("previous", self.get_previous_link()),
-                ("results", data),
-            ]
+        return Response(
+            OrderedDict(
+                [
+                    ("total", self.count),
+                    ("next", self.get_next_link()),
+                    ("previous", self.get_previous_link()),
+                    ("results", data),
+                ]
+            )
         )
 
 
 # cache for 2 hours
 @method_decorator(cache_page(60 * 60 * 2), name="dispatch")
-class ResourceAPIList(FlatMultipleModelAPIView):
-    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
-    pagination_class = LimitPagination
+class ResourceAPIList(generics.GenericAPIView):
+    """
+    Approved resources of all the types, listed by type then by upload
+    date.
 
-    add_model_type = False
+    The filtered resources of every type are paginated together with a
+    single UNION query of their type, id and upload date; only the
+    resources of the page are then loaded and serialized.
+    """
 
-    filter_backends = (filters.SearchFilter,)
-    search_field = ("name", "creator")
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = LimitPagination
 
     querylist = [
         {
@@ -153,6 +159,56 @@ class ResourceAPIList(FlatMultipleModelAPIView):
         },
     ]
 
+    def get_queryset(self):
+        """
+        Returns the (type position in querylist, id, upload date) of the
+        filtered resources of every type
+        """
+        querysets = []
+        for position, query_data in enumerate(self.querylist):
+            queryset = query_data["filter_fn"](
+                query_data["queryset"].all(), self.request, *self.args, **self.kwargs
+            )
+            querysets.append(
+                queryset.annotate(
+                    resource_position=Value(position, output_field=IntegerField())
+                )
+                .order_by()
+                .values_list("resource_position", "pk", "upload_date")
+            )
+        return (
+            querysets[0]
+            .union(*querysets[1:], all=True)
+            .order_by("resource_position", "upload_date", "pk")
+        )
+
+    def get_page_data(self, page):
+        """
+        Returns the serialized resources of the page, in the page order
+        """
+        pks = {}
+        for position, pk, upload_date in page:
+            pks.setdefault(position, []).append(pk)
+        data = {}
+        context = self.get_serializer_context()
+        for position, position_pks in pks.items():
+            query_data = self.querylist[position]
+            resources = list(
+                query_data["queryset"]
+                .filter(pk__in=position_pks)
+                .select_related("creator")
+            )
+            serializer = query_data["serializer_class"](
+                resources, many=True, context=context
+            )
+            for resource, resource_data in zip(resources, serializer.data):
+                data[(position, resource.pk)] = resource_data
+        return [data[(position, pk)] for position, pk, upload_date in page]
+
+    def get(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.get_queryset())
+        return self.get_paginated_response(self.get_page_data(page))
+
 
 class ResourceAPIDownload(APIView):
     """
@@ -161,30 +217,19 @@ class ResourceAPIDownload(APIView):
     The zipfile only contains a resource file.
     """
 
-    # Cache page for the requested url
-    @method_decorator(cache_page(60 * 60 * 2))
+    # Not cached: every download is counted, the archive is served
+    # from disk
     def get(self, request, *args, **kwargs):
         uuid = kwargs.get("uuid")
-        if Geopackage.approved_objects.filter(uuid=uuid).exists():
-            object = Geopackage.approved_objects.get(uuid=uuid)
-        elif Model.approved_objects.filter(uuid=uuid).exists():
-            object = Model.approved_objects.get(uuid=uuid)
-        elif Style.approved_objects.filter(uuid=uuid).exists():
-            object = Style.approved_objects.get(uuid=uuid)
-        elif LayerDefinition.approved_objects.filter(uuid=uuid).exists():
-            object = LayerDefinition.approved_objects.get(uuid=uuid)
-        elif Wavefront.approved_objects.filter(uuid=uuid).exists():
-            object = Wavefront.approved_objects.get(uuid=uuid)
-        else:
+        model, object_id = RegisteredResource.get_model(uuid)
+        if model is None:
             raise Http404
+        object = get_object_or_404(model.approved_objects, pk=object_id)
 
-        object.increase_download_counter()
-        object.save(update_fields=['download_count'])
-        # zip the resource
-        zipfile = zip_a_file_if_not_zipfile(object.file.file.name)
-
-        response = HttpResponse(
-            zipfile.getvalue(), content_type="application/x-zip-compressed"
+        record_resource_download(object)
+        # the resource zip, or the resource if it is a zip
+        response = serve_file(
+            request, object.get_api_archive(), "application/x-zip-compressed"
         )
         response["Content-Disposition"] = "attachment; filename=%s.zip" % (
             slugify(object.name, allow_unicode=True)
@@ -363,18 +408,13 @@ def _get_resource_serializer(resource_type):
         return None
 
 def _get_resource_object(uuid, resource_type):
-    if resource_type.lower() == "geopackage":
-        return get_object_or_404(Geopackage.approved_objects, uuid=uuid)
-    elif resource_type.lower() == "3dmodel":
-        return get_object_or_404(Wavefront.approved_objects, uuid=uuid)
-    elif resource_type.lower() == "style":
-        return get_object_or_404(Style.approved_objects, uuid=uuid)
-    elif resource_type.lower() == "layerdefinition":
-        return get_object_or_404(LayerDefinition.approved_objects, uuid=uuid)
-    elif resource_type.lower() == "model":
-        return get_object_or_404(Model.approved_objects, uuid=uuid)
-    else:
+    model, object_id = RegisteredResource.get_model(uuid)
+    if model is None:
+        raise Http404
+    model_type = "3dmodel" if model is Wavefront else model.__name__.lower()
+    if resource_type.lower() != model_type:
         return None
+    return get_object_or_404(model.approved_objects, pk=object_id)
 
 class ResourceCreateView(APIView):
     """
@@ -0,0 +1,81 @@
+"""
+Pre-built download archives of the shared resources.
+
+An archive is stored next to the resource file, its name ends with a
+fingerprint of its members (name, size and modification time of the
+files, or content): when the resource file, its name or the license
+changes, a new archive is built on the next request and the previous
+one is removed.
+"""
+import glob
+import hashlib
+import os
+import tempfile
+import zipfile
+
+ARCHIVE_SUFFIX = ".zip"
+
+
+def get_archive_fingerprint(members):
+    """
+    Returns the fingerprint of the archive members, a list of
+    (file path or bytes content, name in the archive)
+    """
+    digest = hashlib.sha1()
+    for source, arcname in members:
+        digest.update(arcname.encode("utf-8"))
+        if isinstance(source, bytes):
+            digest.update(source)
+        else:
+            stat = os.stat(source)
+            digest.update(("%s:%s" % (stat.st_mtime_ns, stat.st_size)).encode())
+    return digest.hexdigest()[:16]
+
+
+def remove_archives(base_path, keep=None):
+    """
+    Removes the archives of base_path, but keep
+    """
+    for path in glob.glob(glob.escape(base_path) + ".*" + ARCHIVE_SUFFIX):
+        if path != keep:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def get_archive(base_path, members, compression=zipfile.ZIP_STORED):
+    """
+    Returns the path of the archive of the members, built if it does
+    not exist yet.
+
+    :param base_path: the archive path is base_path.<fingerprint>.zip
+    :param members: list of (file path or bytes content, name in the archive)
+    """
+    archive_path = "%s.%s%s" % (
+        base_path,
+        get_archive_fingerprint(members),
+        ARCHIVE_SUFFIX,
+    )
+    if os.path.exists(archive_path):
+        return archive_path
+    # Concurrent builds write their own temporary file, the archive is
+    # replaced atomically
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(archive_path), suffix=".tmp" + ARCHIVE_SUFFIX
+    )
+    try:
+        with os.fdopen(fd, "wb") as file:
+            with zipfile.ZipFile(file, "w", compression) as zf:
+                for source, arcname in members:
+                    if isinstance(source, bytes):
+                        zf.writestr(arcname, source)
+                    else:
+                        zf.write(source, arcname)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, archive_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    remove_archives(base_path, keep=archive_path)
+    return archive_path
@@ -0,0 +1,58 @@
+"""
+Shared resources download counters.
+
+Like the plugin downloads (plugins.downloads), the downloads are
+counted in the DOWNLOAD_COUNTER_CACHE and written by the
+flush_download_counters periodic task when that setting names a
+shared cache, otherwise they are written immediately. The counters are
+incremented with F() expressions, the resources are not saved.
+"""
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from lib.counter_buffer import CounterBuffer
+
+resource_download_buffer = CounterBuffer(
+    "resource_downloads", getattr(settings, "DOWNLOAD_COUNTER_CACHE", None)
+)
+
+
+def record_resource_download(resource):
+    """
+    Counts one download of the resource
+    """
+    key = (resource._meta.label_lower, resource.pk)
+    if resource_download_buffer.enabled:
+        resource_download_buffer.incr(key)
+    else:
+        save_resource_download_counts({key: 1})
+
+
+def save_resource_download_counts(counts):
+    """
+    Writes a dict of (model label, resource id): downloads to the
+    database
+    """
+    # Sorted keys: concurrent flushes lock the rows in the same order
+    with transaction.atomic():
+        for (label, pk), count in sorted(counts.items()):
+            apps.get_model(label).objects.filter(pk=pk).update(
+                download_count=F("download_count") + count
+            )
+
+
+def flush_resource_download_buffer():
+    """
+    Writes the buffered downloads to the database, returns the
+    number of flushed downloads
+    """
+    if not resource_download_buffer.enabled:
+        return 0
+    counts = resource_download_buffer.drain()
+    try:
+        save_resource_download_counts(counts)
+    except Exception:
+        resource_download_buffer.restore(counts)
+        raise
+    return sum(counts.values())
@@ -2,14 +2,29 @@
 Base Model for sharing file feature
 """
 import datetime
+import logging
 import os
+import re
 import uuid
+import zipfile
+
+from base.archives import get_archive, remove_archives
+from base.license import LICENSE_FILE
+from base.thumbnails import queue_resource_thumbnails
 
 from django.contrib.auth.models import User
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchQuery, SearchVector, SearchVectorField
 from django.db import models
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Concat
 from django.utils.translation import gettext_lazy as _
 from taggit_autosuggest.managers import TaggableManager
 
+# Fields of the search vector, the creator names have the weight C
+SEARCH_VECTOR_FIELDS = {"name", "description", "creator"}
+CREATOR_NAME_FIELDS = {"username", "first_name", "last_name"}
+
 
 class UnapprovedManager(models.Manager):
     """Custom Queryset Manager for Unapproved Resource"""
@@ -118,6 +133,14 @@ class Resource(models.Model):
         db_index=True,
     )
 
+    # full text search document: name (A), description (B) and creator
+    # names (C), updated on save and when the creator names change
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    # url and dimensions of the thumbnails of thumbnail_image, rendered
+    # by the generate_resource_thumbnails task
+    thumbnails = models.JSONField(default=dict, blank=True, editable=False)
+
     # Manager
     objects = models.Manager()
     approved_objects = ApprovedManager()
@@ -126,8 +149,12 @@ class Resource(models.Model):
 
     tags = TaggableManager(blank=True)
 
+    # Compression of the download archive
+    archive_compression = zipfile.ZIP_STORED
+
     class Meta:
         abstract = True
+        indexes = [GinIndex(fields=["search_vector"], name="%(class)s_search_idx")]
 
     @property
     def get_creator_name(self):
@@ -135,23 +162,123 @@ class Resource(models.Model):
             return self.creator.username
         return "%s %s" % (self.creator.first_name, self.creator.last_name)
 
-    def increase_download_counter(self):
-        self.download_count += 1
+    def get_archive_members(self):
+        """
+        Returns the (file path or content, name) of the download
+        archive files: the resource file and the license
+        """
+        return [
+            (self.file.path, os.path.join(self.name, os.path.basename(self.file.path))),
+            (LICENSE_FILE, os.path.join(self.name, "license.txt")),
+        ]
+
+    def get_download_archive(self):
+        """
+        Returns the path of the download archive, built if needed
+        """
+        return get_archive(
+            "%s.download" % self.file.path,
+            self.get_archive_members(),
+            self.archive_compression,
+        )
+
+    def get_api_archive(self):
+        """
+        Returns the path of the API download archive: the resource file
+        if it is a zip, or a zip of the file without license
+        """
+        if zipfile.is_zipfile(self.file.path):
+            return self.file.path
+        return get_archive(
+            "%s.api" % self.file.path,
+            [(self.file.path, os.path.basename(self.file.path))],
+        )
 
     def save(self, *args, **kwargs):
         # update modified file
         self.modified_date = datetime.datetime.now()
+        update_fields = kwargs.get("update_fields")
+        image_changed = (
+            not update_fields or "thumbnail_image" in update_fields
+        ) and self.thumbnails.get("source") != self.thumbnail_image.name
+        if image_changed:
+            # The thumbnails of the previous image are not used anymore
+            self.thumbnails = {}
+            if update_fields:
+                kwargs["update_fields"] = list(update_fields) + ["thumbnails"]
         super().save(*args, **kwargs)
+        if image_changed and self.thumbnail_image:
+            queue_resource_thumbnails(self)
+        if not update_fields or SEARCH_VECTOR_FIELDS & set(update_fields):
+            update_resources_search_vector(type(self).objects.filter(pk=self.pk))
+        if self.approved and not update_fields and self.file:
+            # Build the download archive of the approved resource now
+            # rather than on the first download
+            try:
+                self.get_download_archive()
+            except OSError:
+                logging.exception("Cannot build the archive of %s" % self)
 
     def delete(self, *args, **kwargs):
         if os.path.isfile(self.file.path):
             os.remove(self.file.path)
+        remove_archives("%s.download" % self.file.path)
+        remove_archives("%s.api" % self.file.path)
         super(Resource, self).delete(*args, **kwargs)
 
     def __str__(self):
         return "%s" % (self.name)
 
 
+def update_resources_search_vector(queryset):
+    """
+    Updates the search vector of the resources of the queryset
+    """
+    creator_names = User.objects.filter(pk=OuterRef("creator_id")).annotate(
+        names=Concat(
+            "username", Value(" "), "first_name", Value(" "), "last_name"
+        )
+    )
+    return queryset.update(
+        search_vector=(
+            SearchVector("name", weight="A")
+            + SearchVector("description", weight="B")
+            + SearchVector(Subquery(creator_names.values("names")), weight="C")
+        )
+    )
+
+
+def resource_search_query(text, weights=None):
+    """
+    Returns a query matching the resources search vector with all the
+    words of text, in the fields of the given weights (e.g. "AB" for the
+    name and description), or None if text has no word
+    """
+    words = re.findall(r"\w+", text)
+    if not words:
+        return None
+    if weights is None:
+        return SearchQuery(" ".join(words))
+    return SearchQuery(
+        " & ".join("%s:%s" % (word, weights) for word in words), search_type="raw"
+    )
+
+
+def update_creator_resources_search_vector(
+    sender, instance, created=False, raw=False, update_fields=None, **kw
+):
+    """
+    Updates the search vector of the user resources when the user
+    names change
+    """
+    if raw or created:
+        return
+    if update_fields and not CREATOR_NAME_FIELDS & set(update_fields):
+        return
+    for model in Resource.__subclasses__():
+        update_resources_search_vector(model.objects.filter(creator=instance))
+
+
 class ResourceReview(models.Model):
     """
     A Review Model.
@@ -189,3 +316,6 @@ class ResourceReview(models.Model):
 
     def __str__(self):
         return self.comment
+
+
+models.signals.post_save.connect(update_creator_resources_search_vector, sender=User)
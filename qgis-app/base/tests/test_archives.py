@@ -0,0 +1,51 @@
+import os
+import shutil
+import tempfile
+from zipfile import ZipFile
+
+from base.archives import get_archive
+from django.test import SimpleTestCase
+
+TESTFILES_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "testfiles"))
+
+
+class TestGetArchive(SimpleTestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.file = os.path.join(self.tmp_dir, "test.txt")
+        shutil.copy(os.path.join(TESTFILES_DIR, "test.txt"), self.file)
+        self.base_path = "%s.download" % self.file
+
+    def _archives(self):
+        return sorted(
+            name for name in os.listdir(self.tmp_dir) if name.endswith(".zip")
+        )
+
+    def test_built_once(self):
+        members = [(self.file, "test/test.txt"), (b"license", "test/license.txt")]
+        path = get_archive(self.base_path, members)
+        mtime = os.stat(path).st_mtime_ns
+
+        self.assertEqual(get_archive(self.base_path, members), path)
+        self.assertEqual(os.stat(path).st_mtime_ns, mtime)
+        with ZipFile(path) as zf:
+            self.assertEqual(zf.namelist(), ["test/test.txt", "test/license.txt"])
+            self.assertEqual(zf.read("test/license.txt"), b"license")
+
+    def test_rebuilt_when_members_change(self):
+        path = get_archive(self.base_path, [(self.file, "test/test.txt")])
+
+        new_path = get_archive(
+            self.base_path, [(self.file, "test/test.txt"), (b"new", "test/license.txt")]
+        )
+        self.assertNotEqual(new_path, path)
+        self.assertEqual(self._archives(), [os.path.basename(new_path)])
+
+        with open(self.file, "a") as file:
+            file.write("changed")
+        newer_path = get_archive(
+            self.base_path, [(self.file, "test/test.txt"), (b"new", "test/license.txt")]
+        )
+        self.assertNotEqual(newer_path, new_path)
+        self.assertEqual(self._archives(), [os.path.basename(newer_path)])
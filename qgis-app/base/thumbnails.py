@@ -0,0 +1,85 @@
+"""
+Pre-generated thumbnails of the shared resources images.
+
+The thumbnails of every size used by the templates and the API are
+rendered by the generate_resource_thumbnails task when the resource
+image is uploaded or changed, their url and dimensions are stored in
+Resource.thumbnails: the pages and the API never read the images.
+"""
+import logging
+
+from django.db import transaction
+from sorl.thumbnail import get_thumbnail
+
+# Thumbnail name: (geometry, sorl options)
+THUMBNAIL_SIZES = {
+    # lists, gallery, detail and review pages
+    "preview": ("420x420", {"format": "PNG"}),
+    # 3D models viewer
+    "icon": ("150x150", {"format": "PNG"}),
+    # resources API
+    "api": ("128x128", {"crop": "center"}),
+}
+
+
+def render_thumbnails(image):
+    """
+    Renders the thumbnails of the image, returns the thumbnails data
+    stored in Resource.thumbnails
+    """
+    sizes = {}
+    for name, (geometry, options) in THUMBNAIL_SIZES.items():
+        thumbnail = get_thumbnail(image, geometry, **options)
+        sizes[name] = {
+            "url": thumbnail.url,
+            "width": thumbnail.width,
+            "height": thumbnail.height,
+        }
+    return {"source": image.name, "sizes": sizes}
+
+
+def update_resource_thumbnails(model, pk):
+    """
+    Renders and stores the thumbnails of a resource, returns True if
+    they were stored
+    """
+    resource = model.objects.filter(pk=pk).first()
+    if resource is None or not resource.thumbnail_image:
+        return False
+    try:
+        thumbnails = render_thumbnails(resource.thumbnail_image)
+    except Exception:
+        logging.exception("Cannot render the thumbnails of %s" % resource)
+        return False
+    # The image may have changed while rendering, the thumbnails of the
+    # new image are rendered by its own task
+    return bool(
+        model.objects.filter(
+            pk=pk, thumbnail_image=resource.thumbnail_image.name
+        ).update(thumbnails=thumbnails)
+    )
+
+
+def queue_resource_thumbnails(resource):
+    """
+    Renders the thumbnails of the resource in a task once the
+    transaction is committed
+    """
+    from plugins.tasks.generate_resource_thumbnails import generate_resource_thumbnails
+
+    label, pk = resource._meta.label_lower, resource.pk
+    transaction.on_commit(lambda: generate_resource_thumbnails.delay(label, pk))
+
+
+def get_resource_thumbnail(resource, name):
+    """
+    Returns the url, width and height of a stored thumbnail of the
+    resource image, None if the thumbnails of the current image are not
+    rendered yet
+    """
+    thumbnails = resource.thumbnails or {}
+    if not resource.thumbnail_image or (
+        thumbnails.get("source") != resource.thumbnail_image.name
+    ):
+        return None
+    return thumbnails.get("sizes", {}).get(name)
@@ -1,17 +1,18 @@
 import logging
 from os.path import exists
 from base.forms.processing_forms import ResourceBaseReviewForm
-from base.license import zipped_with_license
+from base.downloads import record_resource_download
+from base.models.processing_models import resource_search_query
 from django.conf import settings
+from lib.file_delivery import serve_file
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.models import User
 from django.contrib.messages.views import SuccessMessageMixin
-from django.contrib.postgres.search import SearchVector
 from django.contrib.sites.models import Site
 from django.core.mail import send_mail
 from django.db import models
-from django.http import HttpResponse, HttpResponseRedirect, JsonResponse
+from django.http import HttpResponseRedirect, JsonResponse
 from django.shortcuts import get_object_or_404
 from django.template.response import TemplateResponse
 from django.urls import reverse, reverse_lazy
@@ -179,15 +180,11 @@ class ResourceSearchMixin(object):
         ]
         q = self.request.GET.get("q")
         if q:
-            qs = qs.annotate(
-                search=(
-                    SearchVector("name")
-                    + SearchVector("description")
-                    + SearchVector("creator__username")
-                    + SearchVector("creator__first_name")
-                    + SearchVector("creator__last_name")
-                )
-            ).filter(search=q)
+            search_query = resource_search_query(q)
+            if search_query is None:
+                qs = qs.none()
+            else:
+                qs = qs.filter(search_vector=search_query)
         order_by = self.request.GET.get("order_by", None)
         if order_by:
             # for style sharing app, there is style_type column that doesn't
@@ -492,14 +489,11 @@ class ResourceBaseDownload(ResourceBaseContextMixin, View):
                 )
                 return TemplateResponse(request, self.template_name, context)
         else:
-            object.increase_download_counter()
-            object.save(update_fields=['download_count'])
-
-        # zip the resource and license.txt
-        zipfile = zipped_with_license(object.file.file.name, object.name)
+            record_resource_download(object)
 
-        response = HttpResponse(
-            zipfile.getvalue(), content_type="application/x-zip-compressed"
+        # the resource and license.txt zip, built once
+        response = serve_file(
+            request, object.get_download_archive(), "application/x-zip-compressed"
         )
         zip_name = slugify(object.name, allow_unicode=True)
         response["Content-Disposition"] = f"attachment; filename*=utf-8''{escape_uri_path(zip_name)}.zip"
@@ -3,6 +3,18 @@
 from django.urls import re_path as url
 from haystack.query import SearchQuerySet
 from haystack.views import SearchView
+from plugins.search import SEARCH_ENGINE, format_headline, search_plugins
+
+
+class PluginSearchResult:
+    """
+    Plugin found by the postgres search engine, with the attributes of
+    the haystack search results used by the template
+    """
+
+    def __init__(self, plugin):
+        self.object = plugin
+        self.headline = format_headline(plugin.headline)
 
 
 class SearchWithRequest(SearchView):
@@ -13,7 +25,7 @@ class SearchWithRequest(SearchView):
         if form_kwargs is None:
             form_kwargs = {}
 
-        if self.searchqueryset is None:
+        if self.searchqueryset is None and SEARCH_ENGINE == "haystack":
             sqs1 = SearchQuerySet().filter(
                 description_auto=self.request.GET.get("q", "")
             )
@@ -30,7 +42,17 @@ class SearchWithRequest(SearchView):
         """
         Fetches the results
         """
-        return self.form.searchqueryset
+        if SEARCH_ENGINE == "haystack":
+            return self.form.searchqueryset
+        return search_plugins(self.query)
+
+    def build_page(self):
+        paginator, page = super(SearchWithRequest, self).build_page()
+        if SEARCH_ENGINE != "haystack":
+            page.object_list = [
+                PluginSearchResult(plugin) for plugin in page.object_list
+            ]
+        return paginator, page
 
 
 urlpatterns = [
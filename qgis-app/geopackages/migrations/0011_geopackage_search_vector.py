@@ -0,0 +1,42 @@
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Concat
+
+
+def populate_search_vector(apps, schema_editor):
+    Geopackage = apps.get_model("geopackages", "Geopackage")
+    User = apps.get_model("auth", "User")
+
+    creator_names = User.objects.filter(pk=OuterRef("creator_id")).annotate(
+        names=Concat("username", Value(" "), "first_name", Value(" "), "last_name")
+    )
+    Geopackage.objects.update(
+        search_vector=(
+            SearchVector("name", weight="A")
+            + SearchVector("description", weight="B")
+            + SearchVector(Subquery(creator_names.values("names")), weight="C")
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("geopackages", "0010_geopackage_tags"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="geopackage",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="geopackage",
+            index=django.contrib.postgres.indexes.GinIndex(fields=["search_vector"], name="geopackage_search_idx"),
+        ),
+        migrations.RunPython(populate_search_vector, migrations.RunPython.noop),
+    ]
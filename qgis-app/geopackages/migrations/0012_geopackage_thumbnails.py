@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("geopackages", "0011_geopackage_search_vector"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="geopackage",
+            name="thumbnails",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
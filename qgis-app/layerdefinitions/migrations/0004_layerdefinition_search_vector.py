@@ -0,0 +1,42 @@
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Concat
+
+
+def populate_search_vector(apps, schema_editor):
+    LayerDefinition = apps.get_model("layerdefinitions", "LayerDefinition")
+    User = apps.get_model("auth", "User")
+
+    creator_names = User.objects.filter(pk=OuterRef("creator_id")).annotate(
+        names=Concat("username", Value(" "), "first_name", Value(" "), "last_name")
+    )
+    LayerDefinition.objects.update(
+        search_vector=(
+            SearchVector("name", weight="A")
+            + SearchVector("description", weight="B")
+            + SearchVector(Subquery(creator_names.values("names")), weight="C")
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("layerdefinitions", "0003_layerdefinition_tags"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="layerdefinition",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="layerdefinition",
+            index=django.contrib.postgres.indexes.GinIndex(fields=["search_vector"], name="layerdefinition_search_idx"),
+        ),
+        migrations.RunPython(populate_search_vector, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("layerdefinitions", "0004_layerdefinition_search_vector"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="layerdefinition",
+            name="thumbnails",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -65,6 +65,13 @@ class LayerDefinition(Resource):
     def get_absolute_url(self):
         return reverse("layerdefinition_detail", args=(self.id,))
 
+    def get_archive_members(self):
+        """The qlr file and its own license"""
+        return [
+            (self.file.path, os.path.join(self.name, os.path.basename(self.file.path))),
+            ((self.license or "").encode("utf-8"), os.path.join(self.name, "license.txt")),
+        ]
+
     def extension(self):
         name, extension = os.path.splitext(self.file.name)
         return extension
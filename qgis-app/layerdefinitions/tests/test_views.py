@@ -210,7 +210,7 @@ class TestDownloadLayerDefinition(SetUpTest, TestCase):
             "Test QLR File/my-vapour-pressure.qlr",
             "Test QLR File/license.txt",
         ]
-        with io.BytesIO(response.content) as file:
+        with io.BytesIO(b"".join(response.streaming_content)) as file:
             zip_file = zipfile.ZipFile(file, "r")
             self.assertIsNone(zip_file.testzip())
             for f in expected_filename_list:
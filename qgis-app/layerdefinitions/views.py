@@ -1,5 +1,4 @@
 from base.views.processing_view import (
-    HttpResponse,
     HttpResponseRedirect,
     ResourceBaseCreateView,
     ResourceBaseDeleteView,
@@ -22,7 +21,8 @@ from base.views.processing_view import (
 )
 from layerdefinitions.file_handler import get_provider, get_url_datasource
 from layerdefinitions.forms import UpdateForm, UploadForm
-from layerdefinitions.license import zipped_with_license
+from base.downloads import record_resource_download
+from lib.file_delivery import serve_file
 from layerdefinitions.models import LayerDefinition, Review
 from django.utils.translation import gettext_lazy as _
 from urllib.parse import unquote
@@ -152,18 +152,11 @@ class LayerDefinitionDownloadView(ResourceMixin, ResourceBaseDownload):
                 )
                 return TemplateResponse(request, self.template_name, context)
         else:
-            object.increase_download_counter()
-            object.save(update_fields=['download_count'])
-
-        # zip the resource and license.txt
-        zipfile = zipped_with_license(
-            file=object.file.file.name,
-            zip_subdir=object.name,
-            custom_license=object.license,
-        )
+            record_resource_download(object)
 
-        response = HttpResponse(
-            zipfile.getvalue(), content_type="application/x-zip-compressed"
+        # the resource and custom license.txt zip, built once
+        response = serve_file(
+            request, object.get_download_archive(), "application/x-zip-compressed"
         )
         response["Content-Disposition"] = "attachment; filename=%s.zip" % (
             slugify(object.name, allow_unicode=True)
@@ -0,0 +1,163 @@
+"""
+Counters buffered in a shared cache (memcached, redis...) and drained
+periodically, so that hot counters are not written to the database
+on every hit.
+"""
+import hashlib
+import time
+
+from django.core.cache import caches
+
+
+class CounterBuffer:
+    """
+    Buffers counters identified by a tuple of values (the key).
+
+    Every counter is stored in its own cache entry and incremented
+    atomically with cache.incr(). A counter registers its key in an
+    append-only index, which is read by drain(), when it is created and
+    when it is incremented again after a drain brought it to zero: the
+    drained counters are forgotten until then, drain() only reads the
+    counters incremented since the previous drain. drain() must only
+    run in one process at a time (e.g. a periodic Celery task).
+    """
+
+    # Index entries still missing after this delay are never written
+    # (e.g. the registering process died) or were evicted
+    pending_timeout = 10 * 60
+
+    def __init__(self, name, cache_alias=None, timeout=2 * 24 * 60 * 60):
+        """
+        :param name: prefix of the cache keys
+        :param cache_alias: name of the cache in settings.CACHES, the
+                            buffer is disabled when None
+        :param timeout: expiration of the counters which are not drained
+        """
+        self.name = name
+        self.cache_alias = cache_alias
+        self.timeout = timeout
+        self.index_key = "%s:index" % name
+        self.drained_key = "%s:drained" % name
+        self.active_key = "%s:active" % name
+        self.pending_key = "%s:pending" % name
+
+    @property
+    def enabled(self):
+        return bool(self.cache_alias)
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def _counter_key(self, key):
+        # Cache keys cannot contain spaces (e.g. in country names)
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        return "%s:%s" % (self.name, digest)
+
+    def _index_entry_key(self, position):
+        return "%s:%s" % (self.index_key, position)
+
+    def _register(self, counter_key, key):
+        self.cache.add(self.index_key, 0, None)
+        position = self.cache.incr(self.index_key)
+        self.cache.set(
+            self._index_entry_key(position), (counter_key, key), self.timeout
+        )
+
+    def incr(self, key, delta=1):
+        """
+        Increments the counter of key by delta
+        """
+        counter_key = self._counter_key(key)
+        try:
+            value = self.cache.incr(counter_key, delta)
+        except ValueError:
+            # New or expired counter
+            if not self.cache.add(counter_key, delta, self.timeout):
+                # Created in the meantime
+                self.incr(key, delta)
+                return
+            value = delta
+        if value == delta:
+            # New counter, or counter drained to zero
+            self._register(counter_key, key)
+
+    def _read_index(self, positions, pending):
+        """
+        Returns a dict of counter key: key of the index entries at
+        positions, the missing entries are added to pending (position:
+        time) to be read again by the next drains
+        """
+        entries = self.cache.get_many([self._index_entry_key(i) for i in positions])
+        registered = {}
+        now = time.time()
+        for position in positions:
+            entry = entries.get(self._index_entry_key(position))
+            if entry is not None:
+                pending.pop(position, None)
+                counter_key, key = entry
+                registered[counter_key] = key
+            elif now - pending.setdefault(position, now) > self.pending_timeout:
+                del pending[position]
+        return registered
+
+    def drain(self):
+        """
+        Returns a dict of key: value of the buffered counters and
+        subtracts the returned values from the buffer.
+        """
+        position = self.cache.get(self.index_key, 0)
+        state = self.cache.get_many(
+            [self.drained_key, self.active_key, self.pending_key]
+        )
+        drained = state.get(self.drained_key, 0)
+        if drained > position:
+            # Evicted index
+            drained = 0
+        # Counters incremented during the previous drain
+        active = state.get(self.active_key, {})
+        # Index positions taken before the previous drains, whose
+        # entries were not written yet
+        pending = state.get(self.pending_key, {})
+        active.update(
+            self._read_index(
+                list(pending) + list(range(drained + 1, position + 1)), pending
+            )
+        )
+
+        counts = {}
+        values = self.cache.get_many(list(active.keys()))
+        for counter_key, key in list(active.items()):
+            value = values.get(counter_key)
+            del active[counter_key]
+            if not value:
+                # Expired or drained to zero: registered again by the
+                # next increment
+                continue
+            try:
+                remaining = self.cache.decr(counter_key, value)
+            except ValueError:
+                # Expired after being read
+                remaining = 0
+            if remaining:
+                # Incremented since it was read, without registering
+                active[counter_key] = key
+            counts[key] = counts.get(key, 0) + value
+
+        self.cache.set_many(
+            {
+                self.active_key: active,
+                self.drained_key: position,
+                self.pending_key: pending,
+            },
+            None,
+        )
+        return counts
+
+    def restore(self, counts):
+        """
+        Adds back counts returned by drain(), e.g. when they could not
+        be saved
+        """
+        for key, value in counts.items():
+            self.incr(key, value)
@@ -0,0 +1,136 @@
+"""
+File delivery backends: files stored under MEDIA_ROOT are either
+streamed by Django or handed over to the web server.
+
+The backend is selected with the FILE_DELIVERY_BACKEND setting:
+
+    * "django": FileResponse streaming, with Range support
+    * "nginx": X-Accel-Redirect to the FILE_DELIVERY_NGINX_LOCATION
+      internal location (which must alias MEDIA_ROOT)
+    * "apache": X-Sendfile with the absolute path of the file (needs
+      mod_xsendfile)
+"""
+import os
+import re
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.encoding import escape_uri_path
+from django.utils.http import http_date
+
+FILE_DELIVERY_CHUNK_SIZE = 64 * 1024
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def get_file_etag(stat):
+    """
+    Returns a strong ETag from the file modification time and size
+    """
+    return '"%x-%x"' % (stat.st_mtime_ns, stat.st_size)
+
+
+def parse_range_header(range_header, size):
+    """
+    Returns the (first, last) bytes of a single "bytes=" range, None if
+    the header is missing or not supported (the whole file is sent) and
+    False if the range cannot be satisfied.
+    """
+    match = RANGE_RE.match(range_header.strip()) if range_header else None
+    if not match or not any(match.groups()):
+        return None
+    first, last = match.groups()
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if not length:
+            return False
+        return max(size - length, 0), size - 1
+    first = int(first)
+    last = min(int(last), size - 1) if last else size - 1
+    if first > last:
+        return False
+    return first, last
+
+
+def _iter_file_range(file_path, first, last):
+    with open(file_path, "rb") as file:
+        file.seek(first)
+        remaining = last - first + 1
+        while remaining > 0:
+            chunk = file.read(min(FILE_DELIVERY_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _django_response(request, file_path, stat, etag):
+    range_header = request.headers.get("Range")
+    if_range = request.headers.get("If-Range")
+    byte_range = None
+    if range_header and (not if_range or if_range == etag):
+        byte_range = parse_range_header(range_header, stat.st_size)
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = "bytes */%s" % stat.st_size
+        return response
+    if byte_range is None:
+        response = FileResponse(open(file_path, "rb"))
+        response["Content-Length"] = stat.st_size
+        return response
+    first, last = byte_range
+    response = StreamingHttpResponse(
+        _iter_file_range(file_path, first, last), status=206
+    )
+    response["Content-Range"] = "bytes %s-%s/%s" % (first, last, stat.st_size)
+    response["Content-Length"] = last - first + 1
+    return response
+
+
+def _nginx_response(file_path):
+    location = getattr(settings, "FILE_DELIVERY_NGINX_LOCATION", "/protected-media/")
+    relative_path = os.path.relpath(file_path, settings.MEDIA_ROOT)
+    response = HttpResponse()
+    response["X-Accel-Redirect"] = escape_uri_path(
+        "%s/%s" % (location.rstrip("/"), relative_path)
+    )
+    return response
+
+
+def _apache_response(file_path):
+    response = HttpResponse()
+    response["X-Sendfile"] = file_path
+    return response
+
+
+def serve_file(request, file_path, content_type, filename=None):
+    """
+    Returns a response delivering the file with the configured backend,
+    with ETag and Last-Modified validators. Conditional requests
+    are answered with 304 Not Modified.
+    """
+    stat = os.stat(file_path)
+    etag = get_file_etag(stat)
+    response = get_conditional_response(
+        request, etag=etag, last_modified=int(stat.st_mtime)
+    )
+    if response is None:
+        backend = getattr(settings, "FILE_DELIVERY_BACKEND", "django")
+        if backend == "nginx":
+            response = _nginx_response(file_path)
+            response["Content-Length"] = stat.st_size
+        elif backend == "apache":
+            response = _apache_response(file_path)
+            response["Content-Length"] = stat.st_size
+        else:
+            response = _django_response(request, file_path, stat, etag)
+        response["Accept-Ranges"] = "bytes"
+        if response.status_code != 416:
+            response["Content-Type"] = content_type
+            if filename:
+                response["Content-Disposition"] = "attachment; filename=%s" % filename
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(stat.st_mtime)
+    return response
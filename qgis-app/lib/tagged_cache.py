@@ -0,0 +1,119 @@
+"""
+Cache with tag-based invalidation.
+
+Each tag has a version stored in the cache, an entry keeps the versions
+of its tags when it is stored and is discarded as soon as one of them
+changed: invalidating a tag replaces its version, the entries of the
+tag are not looked up. An evicted tag version is replaced too, so the
+entries of the tag are never served with a lost invalidation.
+
+The versions start with the time they were created, which is the time
+of the last invalidation of the tag (or later, after an eviction).
+"""
+import time
+import uuid
+
+from django.core.cache import caches
+
+
+class TaggedCache:
+    """
+    Caches values tagged by name in a shared cache (memcached,
+    redis...). Without cache, nothing is cached.
+    """
+
+    def __init__(self, name, cache_alias=None, timeout=3600):
+        """
+        :param name: prefix of the cache keys
+        :param cache_alias: name of the cache in settings.CACHES, nothing
+                            is cached when None
+        :param timeout: expiration of the cached entries
+        """
+        self.name = name
+        self.cache_alias = cache_alias
+        self.timeout = timeout
+
+    @property
+    def enabled(self):
+        return bool(self.cache_alias)
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def _key(self, key):
+        return "%s:entry:%s" % (self.name, key)
+
+    def _tag_key(self, tag):
+        return "%s:tag:%s" % (self.name, tag)
+
+    def _new_version(self):
+        # Random part: two invalidations can happen in the same nanosecond
+        return "%x-%s" % (time.time_ns(), uuid.uuid4().hex[:8])
+
+    @staticmethod
+    def get_version_time(version):
+        """
+        Returns the timestamp of the creation of a tag version
+        """
+        created, sep, _ = version.partition("-")
+        return int(created, 16) / 1e9 if sep else 0
+
+    def get_tag_versions(self, tags):
+        """
+        Returns the current version of the tags, the missing versions
+        are created
+        """
+        tag_keys = {self._tag_key(tag): tag for tag in tags}
+        stored = self.cache.get_many(tag_keys)
+        versions = {tag_keys[key]: version for key, version in stored.items()}
+        for key, tag in tag_keys.items():
+            if key not in stored:
+                version = self._new_version()
+                # Another process may have created it in the meantime
+                if not self.cache.add(key, version, None):
+                    version = self.cache.get(key)
+                versions[tag] = version
+        return versions
+
+    def get(self, key, versions):
+        """
+        Returns the value cached for key if it was stored with the given
+        tag versions, None otherwise
+        """
+        entry = self.cache.get(self._key(key))
+        if entry is not None and entry["tags"] == versions:
+            return entry["value"]
+        return None
+
+    def set(self, key, value, versions):
+        """
+        Stores the value of key computed with the given tag versions,
+        which must be read before the value is computed: an invalidation
+        happening meanwhile discards the stored value.
+        """
+        self.cache.set(self._key(key), {"tags": versions, "value": value}, self.timeout)
+
+    def get_or_set(self, key, tags, default):
+        """
+        Returns the value cached for key or stores and returns the value
+        returned by default(), unless it is None
+        """
+        if not self.enabled:
+            return default()
+        versions = self.get_tag_versions(tags)
+        value = self.get(key, versions)
+        if value is None:
+            value = default()
+            if value is not None:
+                self.set(key, value, versions)
+        return value
+
+    def invalidate(self, *tags):
+        """
+        Discards the entries of the tags
+        """
+        if self.enabled and tags:
+            self.cache.set_many(
+                {self._tag_key(tag): self._new_version() for tag in tags}, None
+            )
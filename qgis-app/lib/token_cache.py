@@ -0,0 +1,114 @@
+"""
+Cache of the JWT tokens validation.
+
+The validation of a token (outstanding, not blacklisted, owner and
+token record found) is cached by jti, the signals of the token models
+invalidate it as soon as a token is blacklisted or deleted. The last
+use date of the tokens is written at most once per interval.
+"""
+import datetime
+
+from django.conf import settings
+from django.core.cache import caches
+
+# Kinds of tokens, the validation of a jti is cached per kind
+TOKEN_KINDS = ("user", "plugin")
+
+
+class TokenValidationCache:
+    """
+    Caches the validation of the tokens in a shared cache (memcached,
+    redis...). Without cache, the tokens are validated on every request.
+    """
+
+    def __init__(self, name, cache_alias=None, timeout=300, last_used_interval=300):
+        """
+        :param name: prefix of the cache keys
+        :param cache_alias: name of the cache in settings.CACHES, the
+                            validations are not cached when None
+        :param timeout: expiration of the cached validations
+        :param last_used_interval: minimum number of seconds between two
+                                   writes of the last use date of a token
+        """
+        self.name = name
+        self.cache_alias = cache_alias
+        self.timeout = timeout
+        self.last_used_interval = last_used_interval
+
+    @property
+    def enabled(self):
+        return bool(self.cache_alias)
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def _key(self, kind, jti):
+        return "%s:%s:%s" % (self.name, kind, jti)
+
+    def get(self, kind, jti, loader):
+        """
+        Returns the cached validation of the token, or the validation
+        returned by loader(), which must be False for an invalid token
+        """
+        if not self.enabled:
+            return loader()
+        key = self._key(kind, jti)
+        validation = self.cache.get(key)
+        if validation is None:
+            validation = loader()
+            self.cache.set(key, validation, self.timeout)
+        return validation
+
+    def invalidate(self, *jtis):
+        """
+        Removes the cached validation of the tokens
+        """
+        if self.enabled and jtis:
+            self.cache.delete_many(
+                [self._key(kind, jti) for jti in jtis for kind in TOKEN_KINDS]
+            )
+
+    def touch(self, model, pk, field, last_used=None):
+        """
+        Sets the last use date of a token record with an update (no
+        save), unless it was written less than last_used_interval
+        seconds ago. last_used is the stored date, only read without
+        cache. Returns True if the date was written.
+        """
+        now = datetime.datetime.now()
+        if self.enabled:
+            # Only the first use in the interval adds the key
+            key = "%s:used:%s:%s" % (self.name, model._meta.label_lower, pk)
+            if not self.cache.add(key, 1, self.last_used_interval):
+                return False
+        elif (
+            last_used is not None
+            and (now - last_used).total_seconds() < self.last_used_interval
+        ):
+            return False
+        model.objects.filter(pk=pk).update(**{field: now})
+        return True
+
+
+token_validation_cache = TokenValidationCache(
+    "token_validation",
+    getattr(settings, "TOKEN_VALIDATION_CACHE", None),
+    timeout=getattr(settings, "TOKEN_VALIDATION_CACHE_TIMEOUT", 300),
+    last_used_interval=getattr(settings, "TOKEN_LAST_USED_INTERVAL", 300),
+)
+
+
+def invalidate_outstanding_token(sender, instance, **kw):
+    """
+    Removes the cached validation of a deleted outstanding token
+    """
+    token_validation_cache.invalidate(instance.jti)
+
+
+def invalidate_token_record(sender, instance, **kw):
+    """
+    Removes the cached validation of the token of a blacklisted token
+    or of a user or plugin token record
+    """
+    token_validation_cache.invalidate(instance.token.jti)
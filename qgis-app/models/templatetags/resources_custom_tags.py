@@ -1,6 +1,7 @@
 import os.path
 
 import markdown
+from base.thumbnails import get_resource_thumbnail
 from django import template
 from django.conf import settings
 from django.forms import CheckboxInput
@@ -49,6 +50,19 @@ def anchor_sort_arrow(name, order_by, current_order, current_query):
     return mark_safe(result)
 
 
+@register.simple_tag
+def resource_thumbnail(resource, name):
+    """
+    Returns the url, width and height of a stored thumbnail of the
+    resource image (see base.thumbnails.THUMBNAIL_SIZES), or the image
+    itself without dimensions until its thumbnails are rendered
+    """
+    thumbnail = get_resource_thumbnail(resource, name)
+    if thumbnail is None and resource.thumbnail_image:
+        thumbnail = {"url": resource.thumbnail_image.url}
+    return thumbnail
+
+
 @register.filter(name="is_checkbox")
 def is_checkbox(field):
     return isinstance(field.field.widget, CheckboxInput)
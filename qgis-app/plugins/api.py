@@ -14,6 +14,7 @@ from django.core.files.uploadedfile import InMemoryUploadedFile
 from django.db import IntegrityError, connection
 from django.utils.translation import gettext_lazy as _
 from plugins.models import *
+from plugins.uploads import UploadError, finish_upload, start_upload, write_chunk
 from plugins.validator import validator
 from plugins.views import plugin_notify
 from rpc4django import rpcmethod
@@ -41,6 +42,93 @@ def plugin_maintaners(**kwargs):
     )
 
 
+def _upload_package(request, package, size):
+    """
+    Creates a new plugin or updates an existing one from a package file
+    of size bytes, returns the plugin and the new version
+    """
+    try:
+        cleaned_data = dict(validator(package))
+    except ValidationError as e:
+        msg = _(
+            "File upload must be a valid QGIS Python plugin compressed archive."
+        )
+        raise Fault(1, "%s %s" % (msg, ",".join(e.messages)))
+
+    plugin_data = {
+        "name": cleaned_data["name"],
+        "package_name": cleaned_data["package_name"],
+        "description": cleaned_data["description"],
+        "created_by": request.user,
+        "icon": cleaned_data["icon_file"],
+        "author": cleaned_data["author"],
+        "email": cleaned_data["email"],
+        "about": cleaned_data["about"],
+    }
+
+    # Gets existing plugin
+    try:
+        plugin = Plugin.objects.get(package_name=plugin_data["package_name"])
+        # Apply new values
+        plugin.name = plugin_data["name"]
+        plugin.description = plugin_data["description"]
+        plugin.icon = plugin_data["icon"]
+        is_new = False
+    except Plugin.DoesNotExist:
+        plugin = Plugin(**plugin_data)
+        is_new = True
+
+    # Optional Metadata:
+    if cleaned_data.get("homepage"):
+        plugin.homepage = cleaned_data.get("homepage")
+    if cleaned_data.get("tracker"):
+        plugin.tracker = cleaned_data.get("tracker")
+    if cleaned_data.get("repository"):
+        plugin.repository = cleaned_data.get("repository")
+    if cleaned_data.get("deprecated"):
+        plugin.deprecated = cleaned_data.get("deprecated")
+
+    plugin.save()
+
+    if is_new:
+        plugin_notify(plugin)
+
+    # Takes care of tags
+    if cleaned_data.get("tags"):
+        plugin.tags.set(
+            [t.strip().lower() for t in cleaned_data.get("tags").split(",")]
+        )
+
+    version_data = {
+        "plugin": plugin,
+        "min_qg_version": cleaned_data["qgisMinimumVersion"],
+        "version": cleaned_data["version"],
+        "created_by": request.user,
+        "package": InMemoryUploadedFile(
+            package,
+            "package",
+            "%s.zip" % plugin.package_name,
+            "application/zip",
+            size,
+            "UTF-8",
+        ),
+        "approved": request.user.has_perm("plugins.can_approve") or plugin.approved,
+    }
+
+    # Optional version metadata
+    if cleaned_data.get("experimental"):
+        version_data["experimental"] = cleaned_data.get("experimental")
+    if cleaned_data.get("changelog"):
+        version_data["changelog"] = cleaned_data.get("changelog")
+    if cleaned_data.get("qgisMaximumVersion"):
+        version_data["max_qg_version"] = cleaned_data.get("qgisMaximumVersion")
+
+    new_version = PluginVersion(**version_data)
+    new_version.clean()
+    new_version.save()
+    return plugin, new_version
+
+
 @rpcmethod(name="plugin.upload", signature=["array", "base64"], login_required=True)
 def plugin_upload(package, **kwargs):
     """
@@ -55,85 +143,7 @@ def plugin_upload(package, **kwargs):
         request = kwargs.get("request")
         package = BytesIO(package)
         package.len = package.getbuffer().nbytes
-        try:
-            cleaned_data = dict(validator(package))
-        except ValidationError as e:
-            msg = _(
-                "File upload must be a valid QGIS Python plugin compressed archive."
-            )
-            raise Fault(1, "%s %s" % (msg, ",".join(e.messages)))
-
-        plugin_data = {
-            "name": cleaned_data["name"],
-            "package_name": cleaned_data["package_name"],
-            "description": cleaned_data["description"],
-            "created_by": request.user,
-            "icon": cleaned_data["icon_file"],
-            "author": cleaned_data["author"],
-            "email": cleaned_data["email"],
-            "about": cleaned_data["about"],
-        }
-
-        # Gets existing plugin
-        try:
-            plugin = Plugin.objects.get(package_name=plugin_data["package_name"])
-            # Apply new values
-            plugin.name = plugin_data["name"]
-            plugin.description = plugin_data["description"]
-            plugin.icon = plugin_data["icon"]
-            is_new = False
-        except Plugin.DoesNotExist:
-            plugin = Plugin(**plugin_data)
-            is_new = True
-
-        # Optional Metadata:
-        if cleaned_data.get("homepage"):
-            plugin.homepage = cleaned_data.get("homepage")
-        if cleaned_data.get("tracker"):
-            plugin.tracker = cleaned_data.get("tracker")
-        if cleaned_data.get("repository"):
-            plugin.repository = cleaned_data.get("repository")
-        if cleaned_data.get("deprecated"):
-            plugin.deprecated = cleaned_data.get("deprecated")
-
-        plugin.save()
-
-        if is_new:
-            plugin_notify(plugin)
-
-        # Takes care of tags
-        if cleaned_data.get("tags"):
-            plugin.tags.set(
-                [t.strip().lower() for t in cleaned_data.get("tags").split(",")]
-            )
-
-        version_data = {
-            "plugin": plugin,
-            "min_qg_version": cleaned_data["qgisMinimumVersion"],
-            "version": cleaned_data["version"],
-            "created_by": request.user,
-            "package": InMemoryUploadedFile(
-                package,
-                "package",
-                "%s.zip" % plugin.package_name,
-                "application/zip",
-                package.len,
-                "UTF-8",
-            ),
-            "approved": request.user.has_perm("plugins.can_approve") or plugin.approved,
-        }
-
-        # Optional version metadata
-        if cleaned_data.get("experimental"):
-            version_data["experimental"] = cleaned_data.get("experimental")
-        if cleaned_data.get("changelog"):
-            version_data["changelog"] = cleaned_data.get("changelog")
-        if cleaned_data.get("qgisMaximumVersion"):
-            version_data["max_qg_version"] = cleaned_data.get("qgisMaximumVersion")
-
-        new_version = PluginVersion(**version_data)
-        new_version.clean()
-        new_version.save()
+        plugin, new_version = _upload_package(request, package, package.len)
     except IntegrityError as e:
         # Avoids error: current transaction is aborted, commands ignored until
         # end of transaction block
@@ -147,6 +157,81 @@ def plugin_upload(package, **kwargs):
     return (plugin.pk, new_version.pk)
 
 
+def _get_user_upload(request, upload_id):
+    try:
+        return PluginUpload.objects.get(pk=upload_id, created_by=request.user)
+    except (PluginUpload.DoesNotExist, ValidationError):
+        raise Fault(1, _("Unknown upload."))
+
+
+@rpcmethod(
+    name="plugin.upload_start", signature=["string", "int", "string"], login_required=True
+)
+def plugin_upload_start(size, sha256, **kwargs):
+    """
+    Starts a chunked upload of a plugin package of size bytes with the
+    given SHA-256 digest (hexadecimal).
+    Returns the upload ID, the chunks are sent with plugin.upload_chunk.
+    """
+    request = kwargs.get("request")
+    try:
+        upload = start_upload(size, sha256, created_by=request.user)
+    except UploadError as e:
+        raise Fault(1, "%s" % e)
+    return str(upload.pk)
+
+
+@rpcmethod(
+    name="plugin.upload_chunk",
+    signature=["int", "string", "int", "base64"],
+    login_required=True,
+)
+def plugin_upload_chunk(upload_id, offset, chunk, **kwargs):
+    """
+    Writes a chunk of a package at offset, which must not be after the
+    received bytes: an upload is resumed from the returned offset.
+    Returns the offset of the next chunk.
+    """
+    upload = _get_user_upload(kwargs.get("request"), upload_id)
+    if isinstance(chunk, str):
+        chunk = b64decode(chunk.encode("utf-8"))
+    elif not isinstance(chunk, bytes):
+        chunk = chunk.data
+    try:
+        return write_chunk(upload, offset, BytesIO(chunk), len(chunk))
+    except UploadError as e:
+        raise Fault(1, "%s" % e)
+
+
+@rpcmethod(name="plugin.upload_finish", signature=["array", "string"], login_required=True)
+def plugin_upload_finish(upload_id, **kwargs):
+    """
+    Checks the package of a chunked upload and creates a new plugin or
+    updates an existing one, like plugin.upload.
+    Returns an array containing the ID (primary key) of the plugin and the ID of the version.
+    """
+    request = kwargs.get("request")
+    upload = _get_user_upload(request, upload_id)
+    try:
+        package = finish_upload(upload)
+    except UploadError as e:
+        raise Fault(1, "%s" % e)
+    try:
+        plugin, new_version = _upload_package(request, package, upload.size)
+    except Fault:
+        raise
+    except IntegrityError as e:
+        connection.close()
+        raise Fault(1, "%s" % e)
+    except Exception as e:
+        raise Fault(1, "%s" % e)
+    finally:
+        package.close()
+        upload.delete()
+
+    return (plugin.pk, new_version.pk)
+
+
 @rpcmethod(name="plugin.tags", signature=["array"], login_required=False)
 def plugin_tags(**kwargs):
     """
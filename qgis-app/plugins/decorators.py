@@ -1,10 +1,32 @@
 from functools import wraps
 from django.http import HttpResponseForbidden
+from django.utils.functional import SimpleLazyObject
 from rest_framework_simplejwt.authentication import JWTAuthentication
-from plugins.models import Plugin, PluginOutstandingToken
+from lib.token_cache import token_validation_cache
+from plugins.models import PluginOutstandingToken
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
-from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
-import datetime
+
+
+def _load_plugin_token(jti, plugin_id):
+  """
+  Returns the id, plugin package name and last use date of the plugin
+  token record of an outstanding and not blacklisted token, or False
+  """
+  plugin_token = (
+    PluginOutstandingToken.objects.filter(
+      token__jti=jti, plugin_id=plugin_id, token__blacklistedtoken__isnull=True
+    )
+    .values("pk", "plugin__package_name", "last_used_on")
+    .first()
+  )
+  if plugin_token is None:
+    return False
+  return {
+    "id": plugin_token["pk"],
+    "package_name": plugin_token["plugin__package_name"],
+    "last_used": plugin_token["last_used_on"],
+  }
+
 
 def has_valid_token(function):
   @wraps(function)
@@ -20,18 +42,21 @@ def has_valid_token(function):
       validated_token = authentication.get_validated_token(auth_token[7:])
       plugin_id = validated_token.payload.get('plugin_id')
       jti = validated_token.payload.get('refresh_jti')
-      token_id = OutstandingToken.objects.get(jti=jti).pk
-      is_blacklisted = BlacklistedToken.objects.filter(token_id=token_id).exists()
-      if not plugin_id or is_blacklisted:
+      if not plugin_id or not jti:
           raise InvalidToken("Invalid token")
 
-      plugin = Plugin.objects.get(pk=plugin_id)
-      if not plugin or plugin.package_name != package_name:
+      # Cached until the token is blacklisted or deleted
+      validation = token_validation_cache.get(
+        "plugin", jti, lambda: _load_plugin_token(jti, plugin_id)
+      )
+      if not validation or validation["package_name"] != package_name:
           raise InvalidToken("Invalid token")
-      plugin_token = PluginOutstandingToken.objects.get(token__pk=token_id, plugin=plugin)
-      plugin_token.last_used_on = datetime.datetime.now()
-      plugin_token.save()
-      request.plugin_token = plugin_token
+      token_validation_cache.touch(
+        PluginOutstandingToken, validation["id"], "last_used_on", validation["last_used"]
+      )
+      request.plugin_token = SimpleLazyObject(
+        lambda: PluginOutstandingToken.objects.get(pk=validation["id"])
+      )
       return function(request, *args, **kwargs)
     except (InvalidToken, TokenError) as e:
         return HttpResponseForbidden(str(e))
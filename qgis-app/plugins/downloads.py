@@ -0,0 +1,92 @@
+"""
+Plugin download counters.
+
+When the DOWNLOAD_COUNTER_CACHE setting names a shared cache, the
+downloads are counted in that cache and written to the database by the
+flush_download_counters periodic task, otherwise they are written
+immediately. In both cases the counters are incremented with F()
+expressions and the daily records are upserted, without loading
+and saving the plugin and the version.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils.timezone import now
+from lib.counter_buffer import CounterBuffer
+from plugins.models import Plugin, PluginVersion, PluginVersionDownload
+
+download_buffer = CounterBuffer(
+    "plugin_downloads", getattr(settings, "DOWNLOAD_COUNTER_CACHE", None)
+)
+
+UPSERT_DOWNLOADS_SQL = """
+INSERT INTO {table} (plugin_version_id, download_date, country_code, country_name, download_count)
+VALUES (%s, %s, %s, %s, %s)
+ON CONFLICT (plugin_version_id, download_date, country_code, country_name)
+DO UPDATE SET download_count = {table}.download_count + EXCLUDED.download_count
+"""
+
+
+def record_download(version, country_code, country_name):
+    """
+    Counts one download of the plugin version from the country
+    """
+    key = (
+        version.pk,
+        version.plugin_id,
+        now().date().isoformat(),
+        country_code,
+        country_name,
+    )
+    if download_buffer.enabled:
+        download_buffer.incr(key)
+    else:
+        save_download_counts({key: 1})
+
+
+def save_download_counts(counts):
+    """
+    Writes a dict of (version id, plugin id, date, country code,
+    country name): downloads to the database
+    """
+    if not counts:
+        return
+    versions = defaultdict(int)
+    plugins = defaultdict(int)
+    records = []
+    for (version_id, plugin_id, date, country_code, country_name), count in sorted(
+        counts.items()
+    ):
+        versions[version_id] += count
+        plugins[plugin_id] += count
+        records.append((version_id, date, country_code, country_name, count))
+
+    sql = UPSERT_DOWNLOADS_SQL.format(table=PluginVersionDownload._meta.db_table)
+    # Sorted ids: concurrent flushes lock the rows in the same order
+    with transaction.atomic():
+        for version_id, count in sorted(versions.items()):
+            PluginVersion.objects.filter(pk=version_id).update(
+                downloads=F("downloads") + count
+            )
+        for plugin_id, count in sorted(plugins.items()):
+            Plugin.objects.filter(pk=plugin_id).update(downloads=F("downloads") + count)
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, records)
+
+
+def flush_download_buffer():
+    """
+    Writes the buffered downloads to the database, returns the
+    number of flushed downloads
+    """
+    if not download_buffer.enabled:
+        return 0
+    counts = download_buffer.drain()
+    try:
+        save_download_counts(counts)
+    except Exception:
+        download_buffer.restore(counts)
+        raise
+    return sum(counts.values())
@@ -0,0 +1,272 @@
+"""
+Cache and conditional requests of the plugins.xml feeds, cache of the
+pages, purged by the Plugin and PluginVersion signals.
+
+The feeds are tagged by QGIS version (x.y) and by plugin: a change of
+a plugin version only discards the feeds of the QGIS versions in its
+range and the feeds of the plugin, so they can be cached for hours.
+The pages cached by the cache middleware share a single tag, discarded
+on every plugin change.
+
+The feeds are sent with ETag and Last-Modified validators: the versions
+of their tags, or the newest change of their plugin versions without
+FEED_CACHE. The conditional requests are answered with 304 Not Modified
+without rendering the feed. The cached plugins.xml files are served as
+files, with their own validators.
+"""
+import functools
+import hashlib
+import os
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from lib.tagged_cache import TaggedCache
+from plugins.models import PluginVersion
+from plugins.xml_feed import (
+    add_patch_version,
+    get_cached_xml_path,
+    normalize_qgis_version,
+    serve_cached_xml,
+    version_to_tuple,
+)
+
+# Last minor version of a QGIS major version, as in is_version_in_range
+MAX_MINOR_VERSION = 99
+
+PAGES_TAG = "pages"
+
+feed_cache = TaggedCache(
+    "plugins_feed",
+    getattr(settings, "FEED_CACHE", None),
+    timeout=getattr(settings, "FEED_CACHE_TIMEOUT", 6 * 3600),
+)
+
+
+def get_qgis_tag(qgis_version):
+    """
+    Returns the tag of the feeds of a QGIS version, every patch
+    release included
+    """
+    return "qgis:%s.%s" % version_to_tuple(qgis_version)[:2]
+
+
+def get_plugin_tag(package_name):
+    return "plugin:%s" % package_name
+
+
+def _get_feed_params(request, kwargs):
+    """
+    Returns the QGIS version and the package name of a feed request
+    """
+    qgis_version = kwargs.get("qg_version") or request.GET.get("qgis", "1.8.0")
+    package_name = kwargs.get("package_name") or request.GET.get("package_name")
+    return qgis_version, package_name
+
+
+def _get_feed_tags(qgis_version, package_name):
+    tags = [get_qgis_tag(qgis_version)]
+    if package_name:
+        tags.append(get_plugin_tag(package_name))
+    return tags
+
+
+def get_qgis_range_tags(min_qg_version, max_qg_version):
+    """
+    Returns the tags of the feeds listing a version compatible between
+    min_qg_version and max_qg_version
+    """
+    min_major, min_minor, _ = version_to_tuple(min_qg_version)
+    if max_qg_version:
+        max_major, max_minor, _ = version_to_tuple(max_qg_version)
+    else:
+        max_major, max_minor = min_major, MAX_MINOR_VERSION
+    tags = []
+    for major in range(min_major, max_major + 1):
+        first = min_minor if major == min_major else 0
+        last = max_minor if major == max_major else MAX_MINOR_VERSION
+        tags.extend(
+            "qgis:%s.%s" % (major, minor)
+            for minor in range(first, min(last, MAX_MINOR_VERSION) + 1)
+        )
+    return tags
+
+
+def invalidate_plugin_feeds(package_name, *qg_ranges):
+    """
+    Discards the cached pages, the feeds of the plugin and the feeds of
+    the QGIS versions in the (min_qg_version, max_qg_version) ranges
+    """
+    tags = {PAGES_TAG}
+    if package_name:
+        tags.add(get_plugin_tag(package_name))
+    for min_qg_version, max_qg_version in qg_ranges:
+        tags.update(get_qgis_range_tags(min_qg_version, max_qg_version))
+    feed_cache.invalidate(*tags)
+
+
+def _iter_and_store(key, versions, content, content_type):
+    """
+    Yields the chunks of a streamed feed and caches the feed once it
+    was entirely sent
+    """
+    chunks = []
+    for chunk in content:
+        chunks.append(chunk)
+        yield chunk
+    feed_cache.set(key, (b"".join(chunks), content_type), versions)
+
+
+def cache_feed(view):
+    """
+    Caches the successful responses of a feed view for FEED_CACHE_TIMEOUT
+    seconds, by absolute URL. The streamed responses are still streamed
+    and cached once they were entirely sent. Without FEED_CACHE, the view
+    is called on every request.
+    """
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not feed_cache.enabled or request.method not in ("GET", "HEAD"):
+            return view(request, *args, **kwargs)
+        versions = feed_cache.get_tag_versions(
+            _get_feed_tags(*_get_feed_params(request, kwargs))
+        )
+        key = "%s:%s" % (
+            view.__name__,
+            hashlib.md5(request.build_absolute_uri().encode("utf-8")).hexdigest(),
+        )
+        cached = feed_cache.get(key, versions)
+        if cached is not None:
+            content, content_type = cached
+            return HttpResponse(content, content_type=content_type)
+        response = view(request, *args, **kwargs)
+        if response.status_code != 200:
+            return response
+        if response.streaming:
+            response.streaming_content = _iter_and_store(
+                key, versions, response.streaming_content, response["Content-Type"]
+            )
+        else:
+            feed_cache.set(key, (response.content, response["Content-Type"]), versions)
+        return response
+
+    return wrapper
+
+
+def _get_versions_validators(qgis_version, package_name, stable_only):
+    """
+    Returns the validators of a feed from its plugin versions: their
+    number changes when one is approved, unapproved or deleted, the
+    newest creation or plugin modification date is the last change
+    """
+    qg_version = normalize_qgis_version(qgis_version)
+    versions = PluginVersion.objects.filter(
+        approved=True,
+        min_qg_version__lte=add_patch_version(qg_version, "99"),
+        max_qg_version__gte=add_patch_version(qg_version, "0"),
+    )
+    if package_name:
+        versions = versions.filter(plugin__package_name=package_name)
+    if stable_only == "1":
+        versions = versions.filter(experimental=False)
+    changes = versions.aggregate(
+        count=Count("pk"),
+        latest_id=Max("pk"),
+        created_on=Max("created_on"),
+        modified_on=Max("plugin__modified_on"),
+    )
+    dates = [date for date in (changes["created_on"], changes["modified_on"]) if date]
+    last_modified = max(dates).timestamp() if dates else 0
+    etag = '"%x-%x-%x"' % (
+        changes["count"],
+        changes["latest_id"] or 0,
+        int(last_modified * 1e6),
+    )
+    return etag, last_modified
+
+
+def get_feed_validators(request, kwargs):
+    """
+    Returns the (strong ETag, Last-Modified timestamp) of a feed request
+    """
+    qgis_version, package_name = _get_feed_params(request, kwargs)
+    if not feed_cache.enabled:
+        return _get_versions_validators(
+            qgis_version,
+            package_name,
+            kwargs.get("stable_only") or request.GET.get("stable_only", "0"),
+        )
+    versions = feed_cache.get_tag_versions(_get_feed_tags(qgis_version, package_name))
+    digest = hashlib.md5(
+        ":".join(versions[tag] for tag in sorted(versions)).encode("utf-8")
+    ).hexdigest()
+    last_modified = max(feed_cache.get_version_time(v) for v in versions.values())
+    return '"%s"' % digest, last_modified
+
+
+def conditional_feed(view):
+    """
+    Sends the ETag and Last-Modified validators of a feed view and
+    answers the conditional requests with 304 Not Modified without
+    calling the view
+    """
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD"):
+            return view(request, *args, **kwargs)
+        etag, last_modified = get_feed_validators(request, kwargs)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=int(last_modified)
+        )
+        if response is None:
+            response = view(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response["ETag"] = etag
+            if last_modified:
+                response["Last-Modified"] = http_date(last_modified)
+        return response
+
+    return wrapper
+
+
+def cached_xml_file(view):
+    """
+    Serves the cached plugins.xml file of the requested QGIS version (or
+    its pre-compressed variant) when it exists, instead of calling the
+    feed view
+    """
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if (
+            request.method in ("GET", "HEAD")
+            and not _get_feed_params(request, kwargs)[1]
+        ):
+            path_file = get_cached_xml_path(request.GET.get("qgis", None))
+            if os.path.exists(path_file):
+                return serve_cached_xml(request, path_file)
+        return view(request, *args, **kwargs)
+
+    return wrapper
+
+
+def get_pages_key_prefix():
+    """
+    Returns the current version of the pages tag, empty without
+    FEED_CACHE
+    """
+    if not feed_cache.enabled:
+        return ""
+    return feed_cache.get_tag_versions([PAGES_TAG])[PAGES_TAG]
+
+
+def invalidate_qgis_feeds(qgis_version):
+    """
+    Discards the cached pages and the feeds of a QGIS version, whose
+    cached plugins.xml file was written again
+    """
+    feed_cache.invalidate(PAGES_TAG, get_qgis_tag(qgis_version))
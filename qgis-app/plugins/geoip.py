@@ -0,0 +1,109 @@
+"""
+Country lookup of the download IPs.
+
+The MaxMind database is opened once per process, memory-mapped, and
+the resolved IPs are kept in a bounded LRU cache (GEOIP_CACHE_SIZE).
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.gis.geoip2 import GeoIP2
+
+NOT_DEFINED = ("N/D", "N/D")
+
+_reader = None
+_reader_lock = threading.Lock()
+
+
+def get_geoip_reader():
+    """
+    Returns the process-wide GeoIP2 reader, opened on first use
+    """
+    global _reader
+    if _reader is None:
+        with _reader_lock:
+            if _reader is None:
+                # MODE_AUTO memory-maps the database, with the
+                # libmaxminddb extension when it is installed
+                _reader = GeoIP2(cache=GeoIP2.MODE_AUTO)
+    return _reader
+
+
+class CountryLookup:
+    """
+    LRU cache of IP: (country code, country name) with hit rate and
+    lookup latency statistics
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.lookup_time = 0.0
+
+    def _lookup(self, ip):
+        try:
+            country_data = get_geoip_reader().country(ip)
+        except Exception:  # AddressNotFoundError, invalid IPs
+            return NOT_DEFINED
+        return (
+            country_data["country_code"] or NOT_DEFINED[0],
+            country_data["country_name"] or NOT_DEFINED[1],
+        )
+
+    def __call__(self, ip):
+        """
+        Returns the (country code, country name) of the IP, ("N/D", "N/D")
+        when unknown
+        """
+        if not ip:
+            return NOT_DEFINED
+        with self._lock:
+            result = self._results.get(ip)
+            if result is not None:
+                self._results.move_to_end(ip)
+                self.hits += 1
+                return result
+        start = time.perf_counter()
+        result = self._lookup(ip)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.misses += 1
+            self.lookup_time += elapsed
+            if self.max_size > 0:
+                self._results[ip] = result
+                self._results.move_to_end(ip)
+                while len(self._results) > self.max_size:
+                    self._results.popitem(last=False)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+            self.hits = 0
+            self.misses = 0
+            self.lookup_time = 0.0
+
+    def stats(self):
+        """
+        Returns the statistics of this process
+        """
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "size": len(self._results),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / requests if requests else 0.0,
+                "avg_lookup_ms": (
+                    self.lookup_time * 1000 / self.misses if self.misses else 0.0
+                ),
+            }
+
+
+get_country = CountryLookup(getattr(settings, "GEOIP_CACHE_SIZE", 10000))
@@ -0,0 +1,59 @@
+"""
+Validation of the plugins icons.
+
+The icons are checked once, when they are uploaded or changed: the
+validity, format and dimensions are stored on the Plugin and the
+templates do not read the icon files.
+"""
+import re
+import xml.etree.ElementTree as ET
+
+from PIL import Image
+
+SVG_LENGTH_RE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*(px)?\s*$")
+
+# Stored when the icon cannot be read: (valid, format, width, height)
+INVALID_ICON = (False, "", None, None)
+
+
+def _parse_svg_length(value):
+    match = SVG_LENGTH_RE.match(value or "")
+    if match:
+        return round(float(match.group(1)))
+    return None
+
+
+def _read_svg_info(file):
+    root = ET.parse(file).getroot()
+    width = _parse_svg_length(root.get("width"))
+    height = _parse_svg_length(root.get("height"))
+    view_box = (root.get("viewBox") or "").replace(",", " ").split()
+    if (width is None or height is None) and len(view_box) == 4:
+        try:
+            width, height = (round(float(value)) for value in view_box[2:])
+        except ValueError:
+            pass
+    return True, "SVG", width, height
+
+
+def _read_image_info(file):
+    image = Image.open(file)
+    image_format, (width, height) = image.format, image.size
+    image.verify()
+    return True, image_format, width, height
+
+
+def read_icon_info(file):
+    """
+    Returns (valid, format, width, height) of an icon file: a well
+    formed SVG document or an image readable by Pillow
+    """
+    file.seek(0)
+    try:
+        if file.name.lower().endswith(".svg"):
+            return _read_svg_info(file)
+        return _read_image_info(file)
+    except (OSError, SyntaxError, ValueError, ET.ParseError):
+        return INVALID_ICON
+    finally:
+        file.seek(0)
@@ -0,0 +1,66 @@
+import base64
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.test.utils import override_settings
+from plugins.middleware import HttpAuthMiddleware
+
+BENCHMARK_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"},
+    "benchmark_basic_auth": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache"
+    },
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the CPU time of the HTTP-Basic authentication of the "
+        "HttpAuthMiddleware, without and with the verified credentials cache"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("username", help="Existing user")
+        parser.add_argument("password", help="Password of the user")
+        parser.add_argument(
+            "--requests", type=int, default=20, help="Number of requests per run"
+        )
+
+    def _run(self, request, count):
+        middleware = HttpAuthMiddleware(lambda request: HttpResponse())
+        start = time.process_time()
+        for _ in range(count):
+            middleware(request)
+        return (time.process_time() - start) / count
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username=options["username"]).first()
+        if user is None or not user.check_password(options["password"]):
+            raise CommandError("Invalid username or password")
+        credentials = base64.b64encode(
+            ("%s:%s" % (options["username"], options["password"])).encode("utf8")
+        ).decode("ascii")
+        request = RequestFactory().post(
+            "/plugins/RPC2/", HTTP_AUTHORIZATION="Basic %s" % credentials
+        )
+        count = options["requests"]
+
+        with override_settings(BASIC_AUTH_CACHE=None):
+            uncached = self._run(request, count)
+        with override_settings(
+            CACHES=BENCHMARK_CACHES, BASIC_AUTH_CACHE="benchmark_basic_auth"
+        ):
+            cached = self._run(request, count)
+
+        self.stdout.write(
+            "Without cache: {:.2f} ms CPU per request".format(uncached * 1000)
+        )
+        self.stdout.write("With cache: {:.2f} ms CPU per request".format(cached * 1000))
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Saved: {:.2f} ms CPU per request".format((uncached - cached) * 1000)
+            )
+        )
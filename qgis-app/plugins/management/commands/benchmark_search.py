@@ -0,0 +1,67 @@
+import time
+
+from django.core.management.base import BaseCommand
+from haystack.query import SearchQuerySet
+from plugins.models import Plugin
+from plugins.search import search_plugins
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the first result page of the plugins search queries with the "
+        "haystack (Whoosh) index and with the postgres full text search"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("queries", nargs="+", help="Search queries")
+        parser.add_argument(
+            "--repeat", type=int, default=10, help="Runs per query, the best is kept"
+        )
+        parser.add_argument(
+            "--per-page", type=int, default=20, help="Size of the result page"
+        )
+
+    def _haystack_page(self, query, per_page):
+        results = (
+            SearchQuerySet().filter(description_auto=query)
+            | SearchQuerySet().filter(name_auto=query)
+            | SearchQuerySet().filter(text=query)
+            | SearchQuerySet().filter(package_name_auto=query)
+        )
+        return results.count(), [result.pk for result in results[:per_page]]
+
+    def _postgres_page(self, query, per_page):
+        results = search_plugins(query)
+        return results.count(), [plugin.pk for plugin in results[:per_page]]
+
+    def _time(self, function, query, options):
+        best = None
+        for _ in range(options["repeat"]):
+            start = time.perf_counter()
+            count, page = function(query, options["per_page"])
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, count
+
+    def handle(self, *args, **options):
+        self.stdout.write("{} plugins".format(Plugin.objects.count()))
+        totals = {"haystack": 0, "postgres": 0}
+        for query in options["queries"]:
+            line = []
+            for engine, function in (
+                ("haystack", self._haystack_page),
+                ("postgres", self._postgres_page),
+            ):
+                elapsed, count = self._time(function, query, options)
+                totals[engine] += elapsed
+                line.append(
+                    "{}: {:.1f} ms ({} results)".format(engine, elapsed * 1000, count)
+                )
+            self.stdout.write("{!r}: {}".format(query, ", ".join(line)))
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Total: haystack {:.1f} ms, postgres {:.1f} ms".format(
+                    totals["haystack"] * 1000, totals["postgres"] * 1000
+                )
+            )
+        )
@@ -0,0 +1,74 @@
+import os
+import time
+from unittest import mock
+
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.management.base import BaseCommand
+from plugins.validator import validator
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the plugin package validator over a corpus of plugin zips "
+        "(the metadata url checks are skipped)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "paths", nargs="+", help="Plugin zip files or folders of zip files"
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=5, help="Runs per package, the best is kept"
+        )
+
+    def _get_packages(self, paths):
+        for path in paths:
+            if os.path.isdir(path):
+                for name in sorted(os.listdir(path)):
+                    if name.endswith(".zip"):
+                        yield os.path.join(path, name)
+            else:
+                yield path
+
+    def _time_validator(self, path, repeat):
+        best = None
+        error = None
+        for _ in range(repeat):
+            with open(path, "rb") as package:
+                start = time.perf_counter()
+                try:
+                    validator(File(package))
+                except ValidationError as e:
+                    error = ", ".join(e.messages)
+                elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, error
+
+    def handle(self, *args, **options):
+        total_size = 0
+        total_time = 0
+        with mock.patch("plugins.validator._check_url_link"):
+            for path in self._get_packages(options["paths"]):
+                size = os.path.getsize(path)
+                elapsed, error = self._time_validator(path, options["repeat"])
+                total_size += size
+                total_time += elapsed
+                self.stdout.write(
+                    "{}: {:.1f} MB in {:.1f} ms{}".format(
+                        os.path.basename(path),
+                        size / 1000000,
+                        elapsed * 1000,
+                        " ({})".format(error) if error else "",
+                    )
+                )
+        if total_time:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    "Total: {:.1f} MB in {:.1f} ms ({:.1f} MB/s)".format(
+                        total_size / 1000000,
+                        total_time * 1000,
+                        total_size / 1000000 / total_time,
+                    )
+                )
+            )
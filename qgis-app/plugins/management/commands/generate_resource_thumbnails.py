@@ -0,0 +1,41 @@
+from base.models.processing_models import Resource
+from base.thumbnails import update_resource_thumbnails
+from django.core.management.base import BaseCommand
+from plugins.tasks.generate_resource_thumbnails import generate_resource_thumbnails
+
+
+class Command(BaseCommand):
+    help = (
+        "Render the thumbnails of the shared resources images which are "
+        "missing or out of date"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--queue",
+            action="store_true",
+            help="Queue a generate_resource_thumbnails task per resource "
+            "instead of rendering them in this process",
+        )
+
+    def handle(self, *args, **options):
+        count = 0
+        for model in Resource.__subclasses__():
+            resources = (
+                model.objects.exclude(thumbnail_image="")
+                .values_list("pk", "thumbnail_image", "thumbnails")
+                .order_by("pk")
+            )
+            for pk, image, thumbnails in resources.iterator():
+                if (thumbnails or {}).get("source") == image:
+                    continue
+                if options["queue"]:
+                    generate_resource_thumbnails.delay(model._meta.label_lower, pk)
+                elif not update_resource_thumbnails(model, pk):
+                    self.stderr.write(
+                        "Cannot render the thumbnails of %s %s"
+                        % (model._meta.label_lower, pk)
+                    )
+                    continue
+                count += 1
+        self.stdout.write("%s resources thumbnails rendered or queued" % count)
@@ -0,0 +1,75 @@
+from django.core.management.base import BaseCommand
+from django.db.models import ExpressionWrapper, F, FloatField, OuterRef, Subquery
+from plugins.models import Plugin, PluginVersion, update_plugins_sort_fields
+
+
+class Command(BaseCommand):
+    help = (
+        "Check the stored latest version dates and average vote of the "
+        "plugins and repair the inconsistent ones"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report the inconsistent plugins",
+        )
+
+    def _get_stale_plugins(self):
+        versions = PluginVersion.objects.filter(plugin=OuterRef("pk")).order_by(
+            "-created_on"
+        )
+        plugins = Plugin.objects.annotate(
+            expected_latest_version_date=Subquery(
+                versions.filter(approved=True).values("created_on")[:1]
+            ),
+            expected_latest_any_version_date=Subquery(
+                versions.values("created_on")[:1]
+            ),
+            expected_average_vote=ExpressionWrapper(
+                F("rating_score") / (F("rating_votes") + 0.001),
+                output_field=FloatField(),
+            ),
+        ).values_list(
+            "pk",
+            "package_name",
+            "latest_version_date",
+            "expected_latest_version_date",
+            "latest_any_version_date",
+            "expected_latest_any_version_date",
+            "average_vote",
+            "expected_average_vote",
+        )
+        stale = []
+        for (
+            pk,
+            package_name,
+            latest_version_date,
+            expected_latest_version_date,
+            latest_any_version_date,
+            expected_latest_any_version_date,
+            average_vote,
+            expected_average_vote,
+        ) in plugins.iterator():
+            if (
+                latest_version_date != expected_latest_version_date
+                or latest_any_version_date != expected_latest_any_version_date
+                or abs(average_vote - float(expected_average_vote)) > 1e-6
+            ):
+                stale.append((pk, package_name))
+        return stale
+
+    def handle(self, *args, **options):
+        stale = self._get_stale_plugins()
+        for pk, package_name in stale:
+            self.stdout.write("Inconsistent plugin: {}".format(package_name))
+        if stale and not options["dry_run"]:
+            update_plugins_sort_fields(
+                Plugin.objects.filter(pk__in=[pk for pk, package_name in stale])
+            )
+            self.stdout.write(
+                self.style.SUCCESS("Repaired {} plugins".format(len(stale)))
+            )
+        elif not stale:
+            self.stdout.write(self.style.SUCCESS("All plugins are consistent"))
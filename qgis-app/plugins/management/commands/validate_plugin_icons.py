@@ -0,0 +1,65 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from plugins.icons import INVALID_ICON, read_icon_info
+from plugins.models import ICON_INFO_FIELDS, Plugin
+
+
+def _read_stored_icon_info(storage, name):
+    try:
+        with storage.open(name, "rb") as file:
+            return read_icon_info(file)
+    except OSError:
+        return INVALID_ICON
+
+
+class Command(BaseCommand):
+    help = "Check the plugins icons and store their validity, format and " "dimensions"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Check all the icons, not only the unchecked ones",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Number of icons checked in parallel",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of plugins updated per query",
+        )
+
+    def handle(self, *args, **options):
+        plugins = Plugin.objects.exclude(icon="").exclude(icon__isnull=True)
+        if not options["all"]:
+            plugins = plugins.filter(icon_valid__isnull=True)
+        plugins = list(plugins.only("pk", "icon").order_by("pk"))
+        storage = Plugin._meta.get_field("icon").storage
+
+        with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+            infos = executor.map(
+                lambda plugin: _read_stored_icon_info(storage, plugin.icon.name),
+                plugins,
+            )
+            invalid = 0
+            for plugin, info in zip(plugins, infos):
+                for field, value in zip(ICON_INFO_FIELDS, info):
+                    setattr(plugin, field, value)
+                if not plugin.icon_valid:
+                    invalid += 1
+                    self.stdout.write(
+                        "Invalid icon: %s (%s)" % (plugin.icon.name, plugin.pk)
+                    )
+
+        # Not saved: the modification date and the search index are kept
+        Plugin.objects.bulk_update(
+            plugins, ICON_INFO_FIELDS, batch_size=options["batch_size"]
+        )
+        self.stdout.write("%s icons checked, %s invalid" % (len(plugins), invalid))
@@ -1,15 +1,88 @@
 # Custom middleware to handle HTTP_AUTHORIZATION
 # Author: A. Pasotti
 
+from contextvars import ContextVar
+
+from django.conf import settings
 from django.contrib import auth
+from django.core.cache import caches
+from django.middleware import cache as cache_middleware
+from django.utils.cache import patch_cache_control
+from django.utils.crypto import constant_time_compare, salted_hmac
+from plugins.feed_cache import get_pages_key_prefix
 from rest_framework_simplejwt.authentication import JWTAuthentication
 
+BASIC_AUTH_KEY_SALT = "plugins.middleware.HttpAuthMiddleware"
+
+# Read once per request: the response is stored under the prefix of the
+# data it was rendered from
+_pages_key_prefix = ContextVar("pages_key_prefix", default="")
+
+
+def _get_credentials_key(username, password):
+    # Keyed hash: the cache never holds the credentials
+    digest = salted_hmac(
+        BASIC_AUTH_KEY_SALT, "%s\0%s" % (username, password), algorithm="sha256"
+    ).hexdigest()
+    return "basic_auth:%s" % digest
+
+
+def _get_user_fingerprint(user):
+    # Changes when the password is changed or the user is blocked
+    return salted_hmac(
+        BASIC_AUTH_KEY_SALT,
+        "%s:%s:%s" % (user.pk, user.password, user.is_active),
+        algorithm="sha256",
+    ).hexdigest()
+
+
+def authenticate_basic(username, password):
+    """
+    Authenticates HTTP-Basic credentials.
+
+    When the BASIC_AUTH_CACHE setting names a shared cache, verified
+    credentials are cached for BASIC_AUTH_CACHE_TIMEOUT seconds: the
+    next requests only load the user instead of checking the password
+    hash (or binding to LDAP). A cached verification is discarded when
+    the user password changes or the user is blocked. The users of an
+    external backend (LDAP) keep a cached verification for up to
+    BASIC_AUTH_CACHE_TIMEOUT seconds after their directory password
+    changed: their stored password does not change.
+    """
+    cache_alias = getattr(settings, "BASIC_AUTH_CACHE", None)
+    if not cache_alias:
+        return auth.authenticate(username=username, password=password)
+    cache = caches[cache_alias]
+    key = _get_credentials_key(username, password)
+    cached = cache.get(key)
+    if cached is not None:
+        user_id, backend, fingerprint = cached
+        user = auth.get_user_model().objects.filter(pk=user_id).first()
+        if (
+            user is not None
+            and user.is_active
+            and constant_time_compare(_get_user_fingerprint(user), fingerprint)
+        ):
+            user.backend = backend
+            return user
+        cache.delete(key)
+    user = auth.authenticate(username=username, password=password)
+    if user is not None:
+        cache.set(
+            key,
+            (user.pk, user.backend, _get_user_fingerprint(user)),
+            getattr(settings, "BASIC_AUTH_CACHE_TIMEOUT", 300),
+        )
+    return user
+
+
 def HttpAuthMiddleware(get_response):
     """
     Simple HTTP-Basic auth for testing webservices
     """
 
     def middleware(request):
+        basic_only = False
         auth_basic = request.META.get("HTTP_AUTHORIZATION")
         if auth_basic and not str(auth_basic).startswith('Bearer'):
             import base64
@@ -20,13 +93,23 @@ def HttpAuthMiddleware(get_response):
             username = username.decode("utf8")
             password = password.decode("utf8")
 
-            user = auth.authenticate(username=username, password=password)
+            user = authenticate_basic(username, password)
             if user:
-                # User is valid.  Set request.user and persist user in the session
-                # by logging the user in.
+                # User is valid. Set request.user, and persist the user in
+                # the session of the clients which have one: the stateless
+                # clients (scripts sending the credentials on every call)
+                # would get a new session on each request.
                 request.user = user
-                auth.login(request, user)
+                if settings.SESSION_COOKIE_NAME in request.COOKIES:
+                    auth.login(request, user)
+                else:
+                    basic_only = True
         response = get_response(request)
+        if basic_only:
+            # No session cookie tells the cache middleware that the page
+            # is rendered for this user: it must not be cached for the
+            # anonymous requests
+            patch_cache_control(response, private=True)
 
         # Code to be executed for each request/response after
         # the view is called.
@@ -34,3 +117,33 @@ def HttpAuthMiddleware(get_response):
         return response
 
     return middleware
+
+
+class PagesKeyPrefixMixin:
+    """
+    Adds the version of the pages tag of the feed cache to the key
+    prefix of the cache middleware: the pages cached before a plugin
+    change are not read anymore and expire.
+    """
+
+    @property
+    def key_prefix(self):
+        return "%s%s" % (self._key_prefix, _pages_key_prefix.get())
+
+    @key_prefix.setter
+    def key_prefix(self, value):
+        self._key_prefix = value
+
+
+class UpdateCacheMiddleware(
+    PagesKeyPrefixMixin, cache_middleware.UpdateCacheMiddleware
+):
+    pass
+
+
+class FetchFromCacheMiddleware(
+    PagesKeyPrefixMixin, cache_middleware.FetchFromCacheMiddleware
+):
+    def process_request(self, request):
+        _pages_key_prefix.set(get_pages_key_prefix())
+        return super().process_request(request)
@@ -0,0 +1,47 @@
+from django.db import migrations, models
+from django.db.models import ExpressionWrapper, F, OuterRef, Subquery
+
+
+def populate_sort_fields(apps, schema_editor):
+    Plugin = apps.get_model("plugins", "Plugin")
+    PluginVersion = apps.get_model("plugins", "PluginVersion")
+
+    versions = PluginVersion.objects.filter(plugin=OuterRef("pk")).order_by(
+        "-created_on"
+    )
+    Plugin.objects.update(
+        latest_version_date=Subquery(
+            versions.filter(approved=True).values("created_on")[:1]
+        ),
+        latest_any_version_date=Subquery(versions.values("created_on")[:1]),
+        average_vote=ExpressionWrapper(
+            F("rating_score") / (F("rating_votes") + 0.001),
+            output_field=models.FloatField(),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("plugins", "0012_pluginversionfeedback_modified_on"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="plugin",
+            name="latest_version_date",
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, null=True, verbose_name="Latest approved version date"),
+        ),
+        migrations.AddField(
+            model_name="plugin",
+            name="latest_any_version_date",
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, help_text="Creation date of the latest version, approved or not", null=True, verbose_name="Latest version date"),
+        ),
+        migrations.AddField(
+            model_name="plugin",
+            name="average_vote",
+            field=models.FloatField(db_index=True, default=0, editable=False, verbose_name="Average vote"),
+        ),
+        migrations.RunPython(populate_sort_fields, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def populate_tag_counts(apps, schema_editor):
+    ContentType = apps.get_model("contenttypes", "ContentType")
+    PluginVersion = apps.get_model("plugins", "PluginVersion")
+    PluginTagCount = apps.get_model("plugins", "PluginTagCount")
+    TaggedItem = apps.get_model("taggit", "TaggedItem")
+
+    content_type = ContentType.objects.filter(
+        app_label="plugins", model="plugin"
+    ).first()
+    if content_type is None:
+        return
+    counts = (
+        TaggedItem.objects.filter(
+            content_type=content_type,
+            object_id__in=PluginVersion.objects.filter(approved=True).values(
+                "plugin_id"
+            ),
+        )
+        .values_list("tag_id")
+        .annotate(num_times=Count("object_id", distinct=True))
+    )
+    PluginTagCount.objects.bulk_create(
+        [
+            PluginTagCount(tag_id=tag_id, num_times=num_times)
+            for tag_id, num_times in counts
+        ]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("contenttypes", "0002_remove_content_type_name"),
+        ("taggit", "0006_rename_taggeditem_content_type_object_id_taggit_tagg_content_8fc721_idx"),
+        ("plugins", "0013_plugin_sort_fields"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PluginTagCount",
+            fields=[
+                ("tag", models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name="plugin_count", serialize=False, to="taggit.tag")),
+                ("num_times", models.IntegerField(db_index=True, default=0)),
+            ],
+        ),
+        migrations.RunPython(populate_tag_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,63 @@
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.operations import TrigramExtension
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+
+def populate_search_vector(apps, schema_editor):
+    ContentType = apps.get_model("contenttypes", "ContentType")
+    Plugin = apps.get_model("plugins", "Plugin")
+    TaggedItem = apps.get_model("taggit", "TaggedItem")
+    User = apps.get_model("auth", "User")
+
+    content_type = ContentType.objects.filter(
+        app_label="plugins", model="plugin"
+    ).first()
+    tags = (
+        TaggedItem.objects.filter(content_type=content_type, object_id=OuterRef("pk"))
+        .values("object_id")
+        .annotate(names=StringAgg("tag__name", " "))
+        .values("names")
+    )
+    usernames = User.objects.filter(pk=OuterRef("created_by_id")).values("username")
+    Plugin.objects.update(
+        search_vector=(
+            SearchVector("name", "package_name", weight="A", config="simple")
+            + SearchVector(Subquery(tags), weight="B", config="simple")
+            + SearchVector("description", weight="B", config="simple")
+            + SearchVector("about", weight="C", config="simple")
+            + SearchVector("author", Subquery(usernames), weight="D", config="simple")
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("plugins", "0014_plugintagcount"),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name="plugin",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="plugin",
+            index=django.contrib.postgres.indexes.GinIndex(fields=["search_vector"], name="plugins_search_vector_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="plugin",
+            index=django.contrib.postgres.indexes.GinIndex(fields=["name"], name="plugins_name_trgm_idx", opclasses=["gin_trgm_ops"]),
+        ),
+        migrations.AddIndex(
+            model_name="plugin",
+            index=django.contrib.postgres.indexes.GinIndex(fields=["package_name"], name="plugins_package_name_trgm_idx", opclasses=["gin_trgm_ops"]),
+        ),
+        migrations.RunPython(populate_search_vector, migrations.RunPython.noop),
+    ]
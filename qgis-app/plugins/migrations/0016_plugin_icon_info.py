@@ -0,0 +1,31 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("plugins", "0015_plugin_search_vector"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="plugin",
+            name="icon_valid",
+            field=models.BooleanField(editable=False, null=True, verbose_name="Valid icon"),
+        ),
+        migrations.AddField(
+            model_name="plugin",
+            name="icon_format",
+            field=models.CharField(blank=True, default="", editable=False, max_length=16, verbose_name="Icon format"),
+        ),
+        migrations.AddField(
+            model_name="plugin",
+            name="icon_width",
+            field=models.PositiveIntegerField(editable=False, null=True, verbose_name="Icon width"),
+        ),
+        migrations.AddField(
+            model_name="plugin",
+            name="icon_height",
+            field=models.PositiveIntegerField(editable=False, null=True, verbose_name="Icon height"),
+        ),
+    ]
@@ -0,0 +1,28 @@
+import uuid
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("plugins", "0016_plugin_icon_info"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PluginUpload",
+            fields=[
+                ("id", models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ("size", models.PositiveIntegerField(verbose_name="Size")),
+                ("sha256", models.CharField(max_length=64, verbose_name="SHA-256 digest")),
+                ("created_on", models.DateTimeField(auto_now_add=True, db_index=True, verbose_name="Created on")),
+                ("created_by", models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                ("plugin", models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to="plugins.plugin")),
+                ("token", models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to="plugins.pluginoutstandingtoken")),
+            ],
+        ),
+    ]
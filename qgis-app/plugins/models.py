@@ -3,21 +3,41 @@
 import datetime
 import os
 import re
+import uuid
 
 from django.conf import settings
 from django.contrib.auth.models import User
-from django.db import models
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.db import models, transaction
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
 from djangoratings.fields import AnonymousRatingField
+from plugins.icons import INVALID_ICON, read_icon_info
+from taggit.models import Tag, TaggedItem
 from taggit_autosuggest.managers import TaggableManager
-from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken,
+    OutstandingToken,
+)
+from lib.token_cache import invalidate_outstanding_token, invalidate_token_record
 
-from django.db.models import OuterRef, Count, Subquery, F
+from django.db.models import OuterRef, Count, ExpressionWrapper, Max, Q, Subquery, F
 
 PLUGINS_STORAGE_PATH = getattr(settings, "PLUGINS_STORAGE_PATH", "packages/%Y")
 PLUGINS_FRESH_DAYS = getattr(settings, "PLUGINS_FRESH_DAYS", 30)
+# Temporary files of the chunked package uploads
+PLUGIN_UPLOADS_DIR = getattr(
+    settings,
+    "PLUGIN_UPLOADS_DIR",
+    os.path.join(settings.MEDIA_ROOT, "packages", "uploads"),
+)
+
+# Stored result of plugins.icons.read_icon_info()
+ICON_INFO_FIELDS = ("icon_valid", "icon_format", "icon_width", "icon_height")
 
 
 # Used in Version fields to transform DB value back to human readable string
@@ -27,26 +47,10 @@ VERSION_RE = r"(^|(?<=\.))0+(?!(\.|$|-))|\.#+"
 
 class BasePluginManager(models.Manager):
     """
-    Adds a score
+    Base manager of the plugins lists, the average vote and the latest
+    version date are stored in the plugin
     """
 
-    def get_queryset(self):
-        return (
-            super(BasePluginManager, self)
-            .get_queryset()
-            .extra(
-                select={
-                    "average_vote": "rating_score/(rating_votes+0.001)",
-                    "latest_version_date": (
-                        "SELECT created_on FROM plugins_pluginversion WHERE "
-                        "plugins_pluginversion.plugin_id = plugins_plugin.id "
-                        "AND approved = TRUE "
-                        "ORDER BY created_on DESC LIMIT 1"
-                    ),
-                }
-            )
-        )
-
 
 class ApprovedPlugins(BasePluginManager):
     """
@@ -170,16 +174,6 @@ class UnapprovedPlugins(BasePluginManager):
             super(UnapprovedPlugins, self)
             .get_queryset()
             .filter(pluginversion__approved=False, deprecated=False)
-            .extra(
-                select={
-                    "average_vote": "rating_score/(rating_votes+0.001)",
-                    "latest_version_date": (
-                        "SELECT created_on FROM plugins_pluginversion WHERE "
-                        "plugins_pluginversion.plugin_id = plugins_plugin.id "
-                        "ORDER BY created_on DESC LIMIT 1"
-                    ),
-                }
-            )
             .distinct()
         )
 
@@ -312,16 +306,7 @@ class FeedbackCompletedPlugins(models.Manager):
             .filter(
                 total_feedback_count=F('completed_feedback_count')
             )
-            .extra(
-                select={
-                    "average_vote": "rating_score/(rating_votes+0.001)",
-                    "latest_version_date": (
-                        "SELECT created_on FROM plugins_pluginversion WHERE "
-                        "plugins_pluginversion.plugin_id = plugins_plugin.id "
-                        "ORDER BY created_on DESC LIMIT 1"
-                    ),
-                }
-            ).distinct()
+            .distinct()
         )
 
 class FeedbackReceivedPlugins(models.Manager):
@@ -349,16 +334,7 @@ class FeedbackReceivedPlugins(models.Manager):
             .filter(
                 received_feedback_count__gte=1
             )
-            .extra(
-                select={
-                    "average_vote": "rating_score/(rating_votes+0.001)",
-                    "latest_version_date": (
-                        "SELECT created_on FROM plugins_pluginversion WHERE "
-                        "plugins_pluginversion.plugin_id = plugins_plugin.id "
-                        "ORDER BY created_on DESC LIMIT 1"
-                    ),
-                }
-            ).distinct()
+            .distinct()
         )
 
 
@@ -380,16 +356,7 @@ class FeedbackPendingPlugins(models.Manager):
             .filter(
                 total_feedback_count=0
             )
-            .extra(
-                select={
-                    "average_vote": "rating_score/(rating_votes+0.001)",
-                    "latest_version_date": (
-                        "SELECT created_on FROM plugins_pluginversion WHERE "
-                        "plugins_pluginversion.plugin_id = plugins_plugin.id "
-                        "ORDER BY created_on DESC LIMIT 1"
-                    ),
-                }
-            ).distinct()
+            .distinct()
         )
 
 
@@ -469,10 +436,41 @@ class Plugin(models.Model):
     icon = models.ImageField(
         _("Icon"), blank=True, null=True, upload_to=PLUGINS_STORAGE_PATH
     )
+    # Checked when the icon is uploaded or changed, null when not checked
+    icon_valid = models.BooleanField(_("Valid icon"), null=True, editable=False)
+    icon_format = models.CharField(
+        _("Icon format"), max_length=16, blank=True, default="", editable=False
+    )
+    icon_width = models.PositiveIntegerField(_("Icon width"), null=True, editable=False)
+    icon_height = models.PositiveIntegerField(
+        _("Icon height"), null=True, editable=False
+    )
 
     # downloads (soft trigger from versions)
     downloads = models.IntegerField(_("Downloads"), default=0, editable=False)
 
+    # Stored for sorting: updated by the versions signals and save()
+    latest_version_date = models.DateTimeField(
+        _("Latest approved version date"),
+        null=True,
+        blank=True,
+        editable=False,
+        db_index=True,
+    )
+    latest_any_version_date = models.DateTimeField(
+        _("Latest version date"),
+        help_text=_("Creation date of the latest version, approved or not"),
+        null=True,
+        blank=True,
+        editable=False,
+        db_index=True,
+    )
+    average_vote = models.FloatField(
+        _("Average vote"), default=0, editable=False, db_index=True
+    )
+    # Full text search document: updated with the search index
+    search_vector = SearchVectorField(null=True, editable=False)
+
     # Flags
     featured = models.BooleanField(_("Featured"), default=False, db_index=True)
     deprecated = models.BooleanField(_("Deprecated"), default=False, db_index=True)
@@ -574,10 +572,8 @@ class Plugin(models.Model):
     def avg_vote(self):
         """
         Returns the rating_score/(rating_votes+0.001) value, this
-        calculation is also available in manager's queries as
-        "average_vote".
-        This property is still useful when the object is not loaded
-        through a manager, for example in related objects.
+        calculation is also stored in the "average_vote" field
+        when the plugin is saved.
         """
         return self.rating_score / (self.rating_votes + 0.001)
 
@@ -589,6 +585,19 @@ class Plugin(models.Model):
         # sure you query for it using the 'plugins' class
         # instead of the 'pluginversion' class.
         permissions = (("can_approve", "Can approve plugins versions"),)
+        indexes = [
+            GinIndex(fields=["search_vector"], name="plugins_search_vector_idx"),
+            GinIndex(
+                fields=["name"],
+                opclasses=["gin_trgm_ops"],
+                name="plugins_name_trgm_idx",
+            ),
+            GinIndex(
+                fields=["package_name"],
+                opclasses=["gin_trgm_ops"],
+                name="plugins_package_name_trgm_idx",
+            ),
+        ]
 
     def get_absolute_url(self):
         return reverse("plugin_detail", args=(self.package_name,))
@@ -656,8 +665,51 @@ class Plugin(models.Model):
             self.modified_on = datetime.datetime.now()
         if not self.maintainer:
             self.maintainer = self.created_by
+        # The ratings save the plugin after each vote
+        self.average_vote = self.avg_vote
+        update_fields = kwargs.get("update_fields")
+        if self.pk and not update_fields:
+            # The versions signals only update the stored dates, this
+            # instance may still hold the previous ones
+            self.update_latest_version_dates()
+        if not update_fields or "icon" in update_fields:
+            # New icons (uploaded files are not committed yet) and icons
+            # which were never checked
+            if not self.icon or not self.icon._committed or self.icon_valid is None:
+                self.update_icon_info()
+                if update_fields:
+                    kwargs["update_fields"] = list(update_fields) + list(ICON_INFO_FIELDS)
         super(Plugin, self).save(*args, **kwargs)
 
+    def update_latest_version_dates(self):
+        """
+        Sets the creation date of the latest version and of the latest
+        approved version, as stored by update_plugins_sort_fields
+        """
+        dates = self.pluginversion_set.aggregate(
+            latest_version_date=Max("created_on", filter=Q(approved=True)),
+            latest_any_version_date=Max("created_on"),
+        )
+        self.latest_version_date = dates["latest_version_date"]
+        self.latest_any_version_date = dates["latest_any_version_date"]
+
+    def update_icon_info(self):
+        """
+        Checks the icon and sets its validity, format and dimensions
+        """
+        if not self.icon:
+            info = (None, "", None, None)
+        elif self.icon._committed:
+            try:
+                with self.icon.open("rb"):
+                    info = read_icon_info(self.icon)
+            except OSError:
+                info = INVALID_ICON
+        else:
+            info = read_icon_info(self.icon.file)
+        for field, value in zip(ICON_INFO_FIELDS, info):
+            setattr(self, field, value)
+
 
 # Plugin version managers
 
@@ -798,6 +850,31 @@ class PluginOutstandingToken(models.Model):
         null=True
     )
 
+
+class PluginUpload(models.Model):
+    """
+    Chunked upload of a plugin package, the chunks are written to a
+    temporary file (see plugins.uploads)
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    # Set for the uploads of a new version with a plugin token
+    plugin = models.ForeignKey(Plugin, null=True, blank=True, on_delete=models.CASCADE)
+    token = models.ForeignKey(
+        PluginOutstandingToken, null=True, blank=True, on_delete=models.CASCADE
+    )
+    # Set for the uploads of the XML-RPC users
+    created_by = models.ForeignKey(
+        User, null=True, blank=True, on_delete=models.CASCADE
+    )
+    size = models.PositiveIntegerField(_("Size"))
+    sha256 = models.CharField(_("SHA-256 digest"), max_length=64)
+    created_on = models.DateTimeField(_("Created on"), auto_now_add=True, db_index=True)
+
+    @property
+    def path(self):
+        return os.path.join(PLUGIN_UPLOADS_DIR, "%s.part" % self.pk)
+
+
 class PluginVersion(models.Model):
     """
     Plugin versions
@@ -1038,6 +1115,16 @@ def delete_plugin_icon(sender, instance, **kw):
         pass
 
 
+def delete_plugin_upload_file(sender, instance, **kw):
+    """
+    Removes the temporary file of a finished or expired chunked upload
+    """
+    try:
+        os.remove(instance.path)
+    except FileNotFoundError:
+        pass
+
+
 class PluginVersionDownload(models.Model):
     """
     Plugin version downloads
@@ -1063,5 +1150,250 @@ class PluginVersionDownload(models.Model):
         )
 
 
+class PluginTagCount(models.Model):
+    """
+    Number of approved plugins by tag, kept up to date by the tags and
+    versions signals, read by the plugins tag cloud
+    """
+    tag = models.OneToOneField(
+        Tag,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="plugin_count",
+    )
+    num_times = models.IntegerField(default=0, db_index=True)
+
+
+def refresh_plugin_tag_counts(tag_ids=None):
+    """
+    Counts again the approved plugins of the tags, all the tags if
+    tag_ids is None
+    """
+    items = TaggedItem.objects.filter(
+        content_type=ContentType.objects.get_for_model(Plugin),
+        object_id__in=Plugin.approved_objects.values("id"),
+    )
+    tag_counts = PluginTagCount.objects.all()
+    if tag_ids is not None:
+        tag_ids = list(tag_ids)
+        if not tag_ids:
+            return
+        items = items.filter(tag_id__in=tag_ids)
+        tag_counts = tag_counts.filter(tag_id__in=tag_ids)
+    counts = dict(
+        items.values_list("tag_id").annotate(
+            num_times=Count("object_id", distinct=True)
+        )
+    )
+    with transaction.atomic():
+        tag_counts.exclude(tag_id__in=counts.keys()).delete()
+        PluginTagCount.objects.bulk_create(
+            [
+                PluginTagCount(tag_id=tag_id, num_times=num_times)
+                for tag_id, num_times in counts.items()
+            ],
+            update_conflicts=True,
+            unique_fields=["tag"],
+            update_fields=["num_times"],
+        )
+
+
+def _is_counter_update(update_fields):
+    """
+    Returns True if the save only updates the download counter
+    """
+    return bool(update_fields) and set(update_fields) <= {"downloads"}
+
+
+def update_plugins_sort_fields(queryset):
+    """
+    Updates the stored latest version dates and average vote of the
+    plugins of the queryset, without calling their save()
+    """
+    versions = PluginVersion.objects.filter(plugin=OuterRef("pk")).order_by(
+        "-created_on"
+    )
+    return queryset.update(
+        latest_version_date=Subquery(
+            versions.filter(approved=True).values("created_on")[:1]
+        ),
+        latest_any_version_date=Subquery(versions.values("created_on")[:1]),
+        average_vote=ExpressionWrapper(
+            F("rating_score") / (F("rating_votes") + 0.001),
+            output_field=models.FloatField(),
+        ),
+    )
+
+
+def update_plugins_search_vector(queryset):
+    """
+    Updates the full text search document of the plugins of the
+    queryset, weighted like the search index fields
+    """
+    tags = (
+        TaggedItem.objects.filter(
+            content_type=ContentType.objects.get_for_model(Plugin),
+            object_id=OuterRef("pk"),
+        )
+        .values("object_id")
+        .annotate(names=StringAgg("tag__name", " "))
+        .values("names")
+    )
+    usernames = User.objects.filter(pk=OuterRef("created_by_id")).values("username")
+    return queryset.update(
+        search_vector=(
+            SearchVector("name", "package_name", weight="A", config="simple")
+            + SearchVector(Subquery(tags), weight="B", config="simple")
+            + SearchVector("description", weight="B", config="simple")
+            + SearchVector("about", weight="C", config="simple")
+            + SearchVector(
+                "author", Subquery(usernames), weight="D", config="simple"
+            )
+        )
+    )
+
+
+def update_version_plugin_sort_fields(sender, instance, raw=False, **kw):
+    """
+    Updates the latest version dates of the plugin when one of its
+    versions is saved, approved, unapproved or deleted
+    """
+    if raw or _is_counter_update(kw.get("update_fields")):
+        return
+    update_plugins_sort_fields(Plugin.objects.filter(pk=instance.plugin_id))
+
+
+def update_plugin_tag_counts(sender, instance, action, pk_set=None, **kw):
+    """
+    Updates the tag counts when a plugin is tagged or untagged
+    """
+    if not isinstance(instance, Plugin):
+        return
+    if action == "pre_clear":
+        instance._cleared_tag_ids = list(instance.tags.values_list("id", flat=True))
+    elif action == "post_clear":
+        refresh_plugin_tag_counts(getattr(instance, "_cleared_tag_ids", []))
+    elif action in ("post_add", "post_remove"):
+        refresh_plugin_tag_counts(pk_set or [])
+
+
+def update_version_tag_counts(sender, instance, raw=False, **kw):
+    """
+    Updates the counts of the plugin tags when a version is saved,
+    approved, unapproved or deleted
+    """
+    if raw or _is_counter_update(kw.get("update_fields")):
+        return
+    refresh_plugin_tag_counts(
+        TaggedItem.objects.filter(
+            content_type=ContentType.objects.get_for_model(Plugin),
+            object_id=instance.plugin_id,
+        ).values_list("tag_id", flat=True)
+    )
+
+
+def store_plugin_tag_ids(sender, instance, **kw):
+    """
+    Keeps the tags of a deleted plugin, their counts are updated once
+    the plugin and its tagged items are deleted
+    """
+    instance._deleted_tag_ids = list(instance.tags.values_list("id", flat=True))
+
+
+def update_deleted_plugin_tag_counts(sender, instance, **kw):
+    refresh_plugin_tag_counts(getattr(instance, "_deleted_tag_ids", []))
+
+
+def _schedule_plugins_xml_update(min_qg_version, max_qg_version):
+    """
+    Renders again the cached plugins.xml files of the QGIS versions
+    in the given range once the transaction is committed
+    """
+    from plugins.tasks.generate_plugins_xml import update_plugins_xml
+
+    transaction.on_commit(
+        lambda: update_plugins_xml.delay(min_qg_version, max_qg_version)
+    )
+
+
+def _schedule_feed_cache_invalidation(package_name, *qg_ranges):
+    """
+    Discards the cached feeds of the plugin and of the QGIS versions in
+    the given ranges once the transaction is committed
+    """
+    from plugins.feed_cache import invalidate_plugin_feeds
+
+    transaction.on_commit(lambda: invalidate_plugin_feeds(package_name, *qg_ranges))
+
+
+def store_version_previous_range(sender, instance, raw=False, **kw):
+    """
+    Keeps the QGIS versions range stored in the database, the cached
+    plugins.xml of the previous range must be updated too
+    """
+    if raw or not instance.pk or _is_counter_update(kw.get("update_fields")):
+        return
+    instance._previous_qg_range = (
+        PluginVersion.objects.filter(pk=instance.pk)
+        .values_list("min_qg_version", "max_qg_version")
+        .first()
+    )
+
+
+def update_version_plugins_xml(sender, instance, raw=False, **kw):
+    """
+    Updates the cached plugins.xml when a version is saved, approved,
+    unapproved or deleted
+    """
+    if raw or _is_counter_update(kw.get("update_fields")):
+        return
+    min_qg_version = instance.min_qg_version
+    max_qg_version = instance.max_qg_version
+    qg_ranges = [(min_qg_version, max_qg_version)]
+    previous_range = getattr(instance, "_previous_qg_range", None)
+    if previous_range and previous_range != (min_qg_version, max_qg_version):
+        _schedule_plugins_xml_update(*previous_range)
+        qg_ranges.append(previous_range)
+    _schedule_plugins_xml_update(min_qg_version, max_qg_version)
+    _schedule_feed_cache_invalidation(instance.plugin.package_name, *qg_ranges)
+
+
+def update_plugin_plugins_xml(sender, instance, raw=False, created=False, **kw):
+    """
+    Updates the cached plugins.xml of the QGIS versions supported by
+    the plugin approved versions when the plugin is changed
+    """
+    if raw or created or _is_counter_update(kw.get("update_fields")):
+        return
+    qg_range = instance.pluginversion_set.filter(approved=True).aggregate(
+        min_qg_version=models.Min("min_qg_version"),
+        max_qg_version=models.Max("max_qg_version"),
+    )
+    qg_ranges = []
+    if qg_range["min_qg_version"]:
+        _schedule_plugins_xml_update(
+            qg_range["min_qg_version"], qg_range["max_qg_version"]
+        )
+        qg_ranges.append((qg_range["min_qg_version"], qg_range["max_qg_version"]))
+    _schedule_feed_cache_invalidation(instance.package_name, *qg_ranges)
+
+
 models.signals.post_delete.connect(delete_version_package, sender=PluginVersion)
 models.signals.post_delete.connect(delete_plugin_icon, sender=Plugin)
+models.signals.post_delete.connect(delete_plugin_upload_file, sender=PluginUpload)
+models.signals.pre_save.connect(store_version_previous_range, sender=PluginVersion)
+models.signals.post_save.connect(update_version_plugins_xml, sender=PluginVersion)
+models.signals.post_delete.connect(update_version_plugins_xml, sender=PluginVersion)
+models.signals.post_save.connect(update_plugin_plugins_xml, sender=Plugin)
+models.signals.post_save.connect(update_version_plugin_sort_fields, sender=PluginVersion)
+models.signals.post_delete.connect(update_version_plugin_sort_fields, sender=PluginVersion)
+models.signals.m2m_changed.connect(update_plugin_tag_counts, sender=TaggedItem)
+models.signals.post_save.connect(update_version_tag_counts, sender=PluginVersion)
+models.signals.post_delete.connect(update_version_tag_counts, sender=PluginVersion)
+models.signals.pre_delete.connect(store_plugin_tag_ids, sender=Plugin)
+models.signals.post_delete.connect(update_deleted_plugin_tag_counts, sender=Plugin)
+models.signals.post_delete.connect(invalidate_outstanding_token, sender=OutstandingToken)
+models.signals.post_save.connect(invalidate_token_record, sender=BlacklistedToken)
+models.signals.post_delete.connect(invalidate_token_record, sender=BlacklistedToken)
+models.signals.post_save.connect(invalidate_token_record, sender=PluginOutstandingToken)
+models.signals.post_delete.connect(invalidate_token_record, sender=PluginOutstandingToken)
@@ -0,0 +1,245 @@
+"""
+Plugins search.
+
+The plugins are searched with the PLUGINS_SEARCH_ENGINE:
+
+* postgres: full text search on the stored Plugin.search_vector (GIN
+  index) and trigram similarity of the name and package name (pg_trgm
+  GIN indexes), works on any number of web nodes;
+* haystack: the HAYSTACK_CONNECTIONS index (Whoosh files).
+
+The QueuedSignalProcessor replaces the haystack RealtimeSignalProcessor:
+instead of updating the index in the request, the ids of the changed
+plugins are queued in the SEARCH_INDEX_QUEUE_CACHE and the
+update_search_index periodic task indexes them in batches. Without
+SEARCH_INDEX_QUEUE_CACHE the plugins are indexed once the transaction
+is committed.
+"""
+import datetime
+import re
+
+from django.conf import settings
+from django.contrib.postgres.search import (
+    SearchHeadline,
+    SearchQuery,
+    SearchRank,
+    TrigramSimilarity,
+)
+from django.db import transaction
+from django.db.models import F, Q, signals
+from django.db.models.functions import Greatest
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+from haystack import connection_router, connections
+from haystack.query import SearchQuerySet
+from haystack.signals import BaseSignalProcessor
+from lib.counter_buffer import CounterBuffer
+from plugins.models import Plugin, PluginVersion, update_plugins_search_vector
+from taggit.models import TaggedItem
+
+SEARCH_ENGINE = getattr(settings, "PLUGINS_SEARCH_ENGINE", "postgres")
+SEARCH_INDEX_BATCH_SIZE = getattr(settings, "SEARCH_INDEX_BATCH_SIZE", 100)
+
+# Highlight delimiters returned by the database, replaced once the
+# headline is escaped
+HIGHLIGHT_START = "\x02"
+HIGHLIGHT_STOP = "\x03"
+
+# Fields which are not indexed: saves only touching them are ignored
+UNINDEXED_FIELDS = {
+    "downloads",
+    "rating_votes",
+    "rating_score",
+    "average_vote",
+    "latest_version_date",
+    "latest_any_version_date",
+}
+
+search_index_queue = CounterBuffer(
+    "plugin_search_index", getattr(settings, "SEARCH_INDEX_QUEUE_CACHE", None)
+)
+
+
+def _get_plugin_identifier(pk):
+    # Identifier of the plugin documents in the index
+    return "%s.%s" % (Plugin._meta.label_lower, pk)
+
+
+def _update_haystack_index(plugin_ids):
+    """
+    Indexes the approved plugins of plugin_ids and removes the other
+    ones (unapproved or deleted) from the haystack index
+    """
+    for using in connection_router.for_write():
+        backend = connections[using].get_backend()
+        index = connections[using].get_unified_index().get_index(Plugin)
+        plugins = list(index.index_queryset(using=using).filter(pk__in=plugin_ids))
+        if plugins:
+            backend.update(index, plugins)
+        indexed = {plugin.pk for plugin in plugins}
+        for pk in plugin_ids:
+            if pk not in indexed:
+                backend.remove(_get_plugin_identifier(pk))
+
+
+def update_search_index(plugin_ids):
+    """
+    Updates the search documents of the plugins, in batches
+    """
+    plugin_ids = sorted(set(plugin_ids))
+    for start in range(0, len(plugin_ids), SEARCH_INDEX_BATCH_SIZE):
+        batch = plugin_ids[start : start + SEARCH_INDEX_BATCH_SIZE]
+        update_plugins_search_vector(Plugin.objects.filter(pk__in=batch))
+        if SEARCH_ENGINE == "haystack":
+            _update_haystack_index(batch)
+
+
+def queue_search_index_update(plugin_id):
+    """
+    Queues the (re)indexation of a plugin
+    """
+    if search_index_queue.enabled:
+        search_index_queue.incr(plugin_id)
+    else:
+        transaction.on_commit(lambda: update_search_index([plugin_id]))
+
+
+def flush_search_index_queue():
+    """
+    Indexes the queued plugins, returns their number
+    """
+    plugin_ids = search_index_queue.drain()
+    try:
+        update_search_index(plugin_ids.keys())
+    except Exception:
+        search_index_queue.restore(plugin_ids)
+        raise
+    return len(plugin_ids)
+
+
+def catch_up_search_index(hours=24):
+    """
+    Incremental alternative to a full rebuild of the index: indexes the
+    plugins changed during the last hours and the plugins missing from
+    the index, removes the documents of the plugins which are not
+    approved anymore. Returns the number of updated plugins.
+    """
+    since = datetime.datetime.now() - datetime.timedelta(hours=hours)
+    plugin_ids = set(
+        Plugin.objects.filter(
+            Q(modified_on__gte=since)
+            | Q(latest_any_version_date__gte=since)
+            | Q(search_vector__isnull=True)
+        ).values_list("pk", flat=True)
+    )
+    if SEARCH_ENGINE != "haystack":
+        update_search_index(plugin_ids)
+        return len(plugin_ids)
+    approved_ids = set(Plugin.approved_objects.values_list("pk", flat=True))
+    for using in connection_router.for_write():
+        indexed_ids = {
+            int(pk)
+            for pk in SearchQuerySet(using=using)
+            .models(Plugin)
+            .values_list("pk", flat=True)
+        }
+        plugin_ids |= approved_ids - indexed_ids
+        plugin_ids |= indexed_ids - approved_ids
+    update_search_index(plugin_ids)
+    return len(plugin_ids)
+
+
+def search_plugins(query):
+    """
+    Returns the approved plugins matching the query, best ranked first,
+    with their description headline.
+
+    Every word of the query is matched as a prefix of the search
+    document words, typos in the name and package name are matched by
+    trigram similarity.
+    """
+    words = re.findall(r"\w+", query)
+    if not words:
+        return Plugin.objects.none()
+    search_query = SearchQuery(
+        " & ".join("%s:*" % word for word in words),
+        search_type="raw",
+        config="simple",
+    )
+    return (
+        Plugin.objects.filter(pk__in=Plugin.approved_objects.values("pk"))
+        .filter(
+            Q(search_vector=search_query)
+            | Q(name__trigram_similar=query)
+            | Q(package_name__trigram_similar=query)
+        )
+        .annotate(
+            rank=SearchRank(F("search_vector"), search_query)
+            + Greatest(
+                TrigramSimilarity("name", query),
+                TrigramSimilarity("package_name", query),
+            ),
+            headline=SearchHeadline(
+                "description",
+                search_query,
+                config="simple",
+                start_sel=HIGHLIGHT_START,
+                stop_sel=HIGHLIGHT_STOP,
+            ),
+        )
+        .order_by("-rank", "name")
+    )
+
+
+def format_headline(headline):
+    """
+    Returns the escaped headline with the matches in <mark> elements
+    """
+    return mark_safe(
+        escape(headline or "")
+        .replace(HIGHLIGHT_START, "<mark>")
+        .replace(HIGHLIGHT_STOP, "</mark>")
+    )
+
+
+class QueuedSignalProcessor(BaseSignalProcessor):
+    """
+    Queues the plugins (re)indexation when a plugin or one of its
+    versions is saved or deleted, or when a plugin is (un)tagged
+    """
+
+    def setup(self):
+        signals.m2m_changed.connect(self.handle_tags_change, sender=TaggedItem)
+        signals.post_save.connect(self.handle_plugin_save, sender=Plugin)
+        signals.post_delete.connect(self.handle_plugin_delete, sender=Plugin)
+        signals.post_save.connect(self.handle_version_change, sender=PluginVersion)
+        signals.post_delete.connect(self.handle_version_change, sender=PluginVersion)
+
+    def teardown(self):
+        signals.m2m_changed.disconnect(self.handle_tags_change, sender=TaggedItem)
+        signals.post_save.disconnect(self.handle_plugin_save, sender=Plugin)
+        signals.post_delete.disconnect(self.handle_plugin_delete, sender=Plugin)
+        signals.post_save.disconnect(self.handle_version_change, sender=PluginVersion)
+        signals.post_delete.disconnect(self.handle_version_change, sender=PluginVersion)
+
+    def handle_plugin_save(
+        self, sender, instance, raw=False, update_fields=None, **kwargs
+    ):
+        if raw or (update_fields and set(update_fields) <= UNINDEXED_FIELDS):
+            return
+        queue_search_index_update(instance.pk)
+
+    def handle_plugin_delete(self, sender, instance, **kwargs):
+        queue_search_index_update(instance.pk)
+
+    def handle_version_change(
+        self, sender, instance, raw=False, update_fields=None, **kwargs
+    ):
+        # The versions approval changes the indexed plugins
+        if raw or (update_fields and set(update_fields) <= UNINDEXED_FIELDS):
+            return
+        queue_search_index_update(instance.plugin_id)
+
+    def handle_tags_change(self, sender, instance, action, **kwargs):
+        if isinstance(instance, Plugin) and action.startswith("post_"):
+            queue_search_index_update(instance.pk)
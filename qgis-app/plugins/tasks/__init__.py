@@ -2,3 +2,7 @@ from plugins.tasks.generate_plugins_xml import *  # noqa
 from plugins.tasks.update_feedjack import *  # noqa
 from plugins.tasks.update_qgis_versions import *  # noqa
 from plugins.tasks.rebuild_search_index import *  # noqa
+from plugins.tasks.flush_download_counters import *  # noqa
+from plugins.tasks.update_search_index import *  # noqa
+from plugins.tasks.generate_resource_thumbnails import *  # noqa
+from plugins.tasks.remove_expired_uploads import *  # noqa
@@ -0,0 +1,21 @@
+from base.downloads import flush_resource_download_buffer
+from celery import shared_task
+from celery.utils.log import get_task_logger
+from plugins.downloads import flush_download_buffer
+
+logger = get_task_logger(__name__)
+
+
+@shared_task
+def flush_download_counters():
+    """
+    Writes the plugin and resource downloads buffered in the
+    DOWNLOAD_COUNTER_CACHE to the database.
+    """
+    count = flush_download_buffer()
+    resource_count = flush_resource_download_buffer()
+    logger.info(
+        "flush_download_counters : {} plugin downloads, {} resource downloads".format(
+            count, resource_count
+        )
+    )
@@ -1,9 +1,5 @@
-import os
-
-import requests
 from celery import shared_task
 from celery.utils.log import get_task_logger
-from preferences import preferences
 from django.conf import settings
 from preferences import preferences
 from plugins.utils import get_version_from_label
@@ -11,88 +7,146 @@ from plugins.utils import get_version_from_label
 
 logger = get_task_logger(__name__)
 
+DEFAULT_QGIS_VERSIONS = [
+    "1.8",
+    "2.0",
+    "2.2",
+    "2.4",
+    "2.6",
+    "2.8",
+    "2.10",
+    "2.12",
+    "2.14",
+    "2.15",
+    "2.16",
+    "2.17",
+    "2.18",
+    "2.99",
+    "3.0",
+    "3.1",
+    "3.2",
+    "3.3",
+    "3.4",
+    "3.5",
+    "3.6",
+    "3.7",
+    "3.8",
+    "3.9",
+    "3.10",
+    "3.11",
+    "3.12",
+    "3.13",
+    "3.14",
+    "3.15",
+    "3.16",
+    "3.17",
+    "3.18",
+    "3.19",
+    "3.20",
+    "3.21",
+    "3.22",
+    "3.23",
+    "3.24",
+    "3.25",
+]
+LABELS = ["latest", "stable", "ltr"]
+
+
+def _get_site(site):
+    if site:
+        return site
+    return getattr(settings, "DEFAULT_PLUGINS_SITE", "") or "http://plugins.qgis.org"
+
+
+def _get_qgis_versions():
+    versions = preferences.SitePreference.qgis_versions
+    if versions:
+        return [v for v in versions.split(",") if v]
+    return DEFAULT_QGIS_VERSIONS
+
+
+def _get_cached_xml_targets():
+    """
+    Returns the list of (file suffix, QGIS version) of the cached files:
+    one per QGIS version and one per label
+    """
+    targets = []
+    for label in LABELS:
+        try:
+            version = get_version_from_label(label)
+        except Exception as e:
+            logger.error("Cannot resolve the QGIS version of {}: {}".format(label, e))
+            continue
+        if version:
+            targets.append((label, version))
+    for version in _get_qgis_versions():
+        targets.append((version, version))
+    return targets
+
+
+def _save_plugins_xml(version_or_label, version, request, levels):
+    # Imported here: this module is loaded from the settings,
+    # before the models are ready
+    from plugins.feed_cache import invalidate_qgis_feeds
+    from plugins.xml_feed import (
+        iter_compatible_plugin_versions,
+        iter_plugins_xml,
+        normalize_qgis_version,
+        write_cached_xml,
+    )
+
+    # Built as the plugins_new.xml feed they used to be fetched from
+    versions = iter_compatible_plugin_versions(
+        normalize_qgis_version(version), new_feed=True
+    )
+    write_cached_xml(version_or_label, iter_plugins_xml(versions, request), levels)
+    # The feeds served from the previous file are outdated
+    invalidate_qgis_feeds(version)
+
 
 @shared_task
 def generate_plugins_xml(site=""):
     """
-    Fetch the xml list of plugins from the plugin site.
-    :param site: site domain where the plugins will be fetched, default to
+    Render the xml list of plugins from the database and save one file
+    per QGIS version and label in MEDIA_ROOT/cached_xmls.
+    :param site: site domain used in the download URLs, default to
                  http://plugins.qgis.org
     """
+    site = _get_site(site)
     logger.info('generate_plugins_xml : {}'.format(site))
 
-    if not site:
-        if settings.DEFAULT_PLUGINS_SITE:
-            site = settings.DEFAULT_PLUGINS_SITE
-        else:
-            site = "http://plugins.qgis.org"
-    plugins_url = "{}/plugins/plugins_new.xml".format(site)
+    from plugins.xml_feed import MAX_COMPRESSION_LEVELS, build_feed_request
 
-    versions = preferences.SitePreference.qgis_versions
-    labels = ["latest", "stable", "ltr"]
+    request = build_feed_request(site)
+    for version_or_label, version in _get_cached_xml_targets():
+        _save_plugins_xml(version_or_label, version, request, MAX_COMPRESSION_LEVELS)
 
-    if versions:
-        versions = versions.split(",")
-    else:
-        versions = [
-            "1.8",
-            "2.0",
-            "2.2",
-            "2.4",
-            "2.6",
-            "2.8",
-            "2.10",
-            "2.12",
-            "2.14",
-            "2.15",
-            "2.16",
-            "2.17",
-            "2.18",
-            "2.99",
-            "3.0",
-            "3.1",
-            "3.2",
-            "3.3",
-            "3.4",
-            "3.5",
-            "3.6",
-            "3.7",
-            "3.8",
-            "3.9",
-            "3.10",
-            "3.11",
-            "3.12",
-            "3.13",
-            "3.14",
-            "3.15",
-            "3.16",
-            "3.17",
-            "3.18",
-            "3.19",
-            "3.20",
-            "3.21",
-            "3.22",
-            "3.23",
-            "3.24",
-            "3.25",
-        ]
-
-    folder_path = os.path.join(settings.MEDIA_ROOT, "cached_xmls")
-
-    if not os.path.exists(folder_path):
-        os.mkdir(folder_path)
-
-    def fetch_and_save_xml(version_or_label, is_label=False):
-        version = get_version_from_label(version_or_label) if is_label else version_or_label
-        response = requests.get(f"{plugins_url}?qgis={version}")
-
-        if response.status_code == 200:
-            file_name = f"plugins_{version_or_label}.xml"
-            with open(os.path.join(folder_path, file_name), "w+") as file:
-                file.write(response.text)
-
-    for label in labels:
-        fetch_and_save_xml(label, is_label=True)
-
-    for version in versions:
-        fetch_and_save_xml(version)
+
+@shared_task
+def update_plugins_xml(min_qg_version, max_qg_version, site=""):
+    """
+    Render again only the cached xml files of the QGIS versions
+    between min_qg_version and max_qg_version.
+    :param min_qg_version: minimum QGIS version of the changed plugin versions
+    :param max_qg_version: maximum QGIS version of the changed plugin versions
+    :param site: site domain used in the download URLs
+    """
+    site = _get_site(site)
+    logger.info(
+        'update_plugins_xml : {} - {}'.format(min_qg_version, max_qg_version)
+    )
+
+    from plugins.xml_feed import (
+        FAST_COMPRESSION_LEVELS,
+        build_feed_request,
+        is_version_in_range,
+    )
+
+    request = build_feed_request(site)
+    # Rendered again on each plugin change: compressed faster than by
+    # the full rebuilds
+    for version_or_label, version in _get_cached_xml_targets():
+        if is_version_in_range(version, min_qg_version, max_qg_version):
+            _save_plugins_xml(
+                version_or_label, version, request, FAST_COMPRESSION_LEVELS
+            )
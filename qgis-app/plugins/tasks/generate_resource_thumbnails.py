@@ -0,0 +1,19 @@
+from base.thumbnails import update_resource_thumbnails
+from celery import shared_task
+from celery.utils.log import get_task_logger
+from django.apps import apps
+
+logger = get_task_logger(__name__)
+
+
+@shared_task
+def generate_resource_thumbnails(model_label, pk):
+    """
+    Renders the thumbnails of a resource image.
+    """
+    updated = update_resource_thumbnails(apps.get_model(model_label), pk)
+    logger.info(
+        "generate_resource_thumbnails : {} {} {}".format(
+            model_label, pk, "updated" if updated else "skipped"
+        )
+    )
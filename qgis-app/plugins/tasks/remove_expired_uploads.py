@@ -0,0 +1,14 @@
+from celery import shared_task
+from celery.utils.log import get_task_logger
+from plugins.uploads import remove_expired_uploads as remove_uploads
+
+logger = get_task_logger(__name__)
+
+
+@shared_task
+def remove_expired_uploads():
+    """
+    Removes the unfinished chunked uploads of plugin packages.
+    """
+    count = remove_uploads()
+    logger.info("remove_expired_uploads : {} uploads".format(count))
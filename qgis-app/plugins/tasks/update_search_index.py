@@ -0,0 +1,24 @@
+from celery import shared_task
+from celery.utils.log import get_task_logger
+from plugins import search
+
+logger = get_task_logger(__name__)
+
+
+@shared_task
+def update_search_index():
+    """
+    Indexes the plugins queued by the QueuedSignalProcessor.
+    """
+    count = search.flush_search_index_queue()
+    logger.info("update_search_index : {} plugins".format(count))
+
+
+@shared_task
+def catch_up_search_index(hours=24):
+    """
+    Indexes the plugins changed during the last hours and removes the
+    stale documents, without rebuilding the whole index.
+    """
+    count = search.catch_up_search_index(hours)
+    logger.info("catch_up_search_index : {} plugins".format(count))
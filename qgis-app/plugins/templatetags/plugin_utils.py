@@ -1,6 +1,4 @@
 from django import template
-from PIL import Image, UnidentifiedImageError
-import xml.etree.ElementTree as ET
 
 register = template.Library()
 
@@ -33,29 +31,13 @@ def file_extension(value):
 
 @register.filter
 def is_image_valid(image):
+    """
+    Returns the validity of a plugin icon, stored when the icon was
+    uploaded or changed (see Plugin.update_icon_info)
+    """
     if not image:
         return False
-    # Check if the file is an SVG by extension
-    if image.path.lower().endswith('.svg'):
-        return _validate_svg(image.path)
-    return _validate_image(image.path)
-
-
-def _validate_svg(file_path):
-    try:
-        # Parse the SVG file to ensure it's well-formed XML
-        ET.parse(file_path)
-        return True
-    except (ET.ParseError, FileNotFoundError):
-        return False
-
-def _validate_image(file_path):
-    try:
-        img = Image.open(file_path)
-        img.verify()
-        return True
-    except (FileNotFoundError, UnidentifiedImageError):
-        return False
+    return bool(image.instance.icon_valid)
 
 @register.filter
 def feedbacks_not_completed(feedbacks):
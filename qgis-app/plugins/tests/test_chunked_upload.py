@@ -0,0 +1,109 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from plugins.models import Plugin, PluginUpload, PluginVersion
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+
+TESTFILE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "testfiles"))
+
+
+class ChunkedUploadTestCase(TestCase):
+    fixtures = [
+        "fixtures/styles.json",
+        "fixtures/auth.json",
+        "fixtures/simplemenu.json",
+    ]
+
+    @override_settings(MEDIA_ROOT="api/tests")
+    def setUp(self):
+        uploads_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, uploads_dir)
+        for module in ("plugins.models", "plugins.uploads"):
+            patcher = patch("%s.PLUGIN_UPLOADS_DIR" % module, uploads_dir)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.user = User.objects.create_user(
+            username="testuser", password="testpassword", email="test@example.com"
+        )
+        self.client.login(username="testuser", password="testpassword")
+        with open(os.path.join(TESTFILE_DIR, "valid_plugin.zip_"), "rb") as file:
+            self.client.post(
+                reverse("plugin_upload"),
+                {"package": SimpleUploadedFile("valid_plugin.zip_", file.read())},
+            )
+        self.plugin = Plugin.objects.get(name="Test Plugin")
+        package_name = self.plugin.package_name
+        self.client.post(reverse("plugin_token_create", args=[package_name]), {})
+        refresh = RefreshToken(OutstandingToken.objects.last().token)
+        refresh["plugin_id"] = self.plugin.pk
+        refresh["refresh_jti"] = refresh["jti"]
+        self.client.logout()
+        self.api = Client(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+        self.url_start = reverse("version_upload_start_api", args=[package_name])
+
+        with open(os.path.join(TESTFILE_DIR, "valid_plugin_0.0.2.zip_"), "rb") as file:
+            self.package = file.read()
+
+    def _start(self, sha256=None):
+        response = self.api.post(
+            self.url_start,
+            {
+                "size": len(self.package),
+                "sha256": sha256 or hashlib.sha256(self.package).hexdigest(),
+            },
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.json()["url"]
+
+    def _put(self, url, offset, chunk):
+        return self.api.put(
+            "%s?offset=%s" % (url, offset),
+            chunk,
+            content_type="application/octet-stream",
+        )
+
+    def test_resumed_upload(self):
+        url = self._start()
+        half = len(self.package) // 2
+
+        response = self._put(url, 0, self.package[:half])
+        self.assertEqual(response.json()["offset"], half)
+        # A chunk after the received bytes is refused
+        response = self._put(url, half + 1, self.package[half + 1 :])
+        self.assertEqual(response.status_code, 409)
+        # The client resumes from the received offset
+        self.assertEqual(self.api.get(url).json()["offset"], half)
+        response = self._put(url, half - 10, self.package[half - 10 :])
+        self.assertEqual(response.json()["offset"], len(self.package))
+
+        response = self.api.post(url + "finish/", {})
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(
+            PluginVersion.objects.filter(plugin=self.plugin, version="0.0.2").exists()
+        )
+        self.assertFalse(PluginUpload.objects.exists())
+
+    def test_digest_mismatch(self):
+        url = self._start(sha256="0" * 64)
+        self._put(url, 0, self.package)
+
+        response = self.api.post(url + "finish/", {})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(
+            PluginVersion.objects.filter(plugin=self.plugin, version="0.0.2").exists()
+        )
+
+    def test_invalid_start(self):
+        response = self.api.post(self.url_start, {"size": len(self.package)})
+        self.assertEqual(response.status_code, 400)
+        response = self.api.post(self.url_start, {"size": 10 ** 9, "sha256": "0" * 64})
+        self.assertEqual(response.status_code, 400)
@@ -1,9 +1,14 @@
-from django.test import Client, TestCase, RequestFactory
+from unittest import mock
+
+from django.db import connection
+from django.test import Client, TestCase, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.core.files.uploadedfile import SimpleUploadedFile
 
 from plugins.models import Plugin, PluginVersion, PluginVersionDownload
+from plugins.downloads import download_buffer, flush_download_buffer
 from plugins.views import version_download
 from django.urls import reverse
 
@@ -45,7 +50,13 @@ class TestVersionDownloadView(TestCase):
 
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response['Content-Type'], 'application/zip')
-        self.assertEqual(response.content, b'file_content')
+        self.assertEqual(b''.join(response.streaming_content), b'file_content')
+        self.assertEqual(response['Content-Length'], '12')
+        self.assertEqual(
+            response['Content-Disposition'], 'attachment; filename=test-package-1.0.0.zip'
+        )
+        self.assertTrue(response.has_header('ETag'))
+        self.assertTrue(response.has_header('Last-Modified'))
 
         self.assertEqual(self.version.downloads, 1)
         self.assertEqual(self.plugin.downloads, 1)
@@ -82,4 +93,199 @@ class TestVersionDownloadView(TestCase):
 
         self.assertEqual(response.status_code, 200)
         self.assertTrue(download_record.country_code == 'N/D')
-        self.assertTrue(download_record.country_name == 'N/D')
\ No newline at end of file
+        self.assertTrue(download_record.country_name == 'N/D')
+
+    def test_version_download_range(self):
+        request = self.factory.get('/', HTTP_RANGE='bytes=5-')
+
+        response = version_download(request, self.plugin.package_name, self.version.version)
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 5-11/12')
+        self.assertEqual(response['Content-Length'], '7')
+        self.assertEqual(b''.join(response.streaming_content), b'content')
+
+        request = self.factory.get('/', HTTP_RANGE='bytes=-4')
+        response = version_download(request, self.plugin.package_name, self.version.version)
+        self.assertEqual(b''.join(response.streaming_content), b'tent')
+
+        request = self.factory.get('/', HTTP_RANGE='bytes=20-')
+        response = version_download(request, self.plugin.package_name, self.version.version)
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */12')
+
+    def test_version_download_not_modified(self):
+        response = version_download(
+            self.factory.get('/'), self.plugin.package_name, self.version.version
+        )
+        request = self.factory.get('/', HTTP_IF_NONE_MATCH=response['ETag'])
+
+        response = version_download(request, self.plugin.package_name, self.version.version)
+
+        self.assertEqual(response.status_code, 304)
+
+    @override_settings(FILE_DELIVERY_BACKEND='nginx', FILE_DELIVERY_NGINX_LOCATION='/protected-media/')
+    def test_version_download_nginx(self):
+        response = version_download(
+            self.factory.get('/'), self.plugin.package_name, self.version.version
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(
+            response['X-Accel-Redirect'],
+            '/protected-media/%s' % self.version.package.name
+        )
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        self.assertEqual(response['Content-Length'], '12')
+        self.version.refresh_from_db()
+        self.assertEqual(self.version.downloads, 1)
+
+    @override_settings(FILE_DELIVERY_BACKEND='apache')
+    def test_version_download_apache(self):
+        response = version_download(
+            self.factory.get('/'), self.plugin.package_name, self.version.version
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Sendfile'], self.version.package.path)
+
+
+DOWNLOAD_COUNTER_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"},
+    "downloads": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "test-download-counters",
+    },
+}
+
+
+class TestDownloadCounters(TestCase):
+    """Measure the database writes per download"""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.plugin = Plugin.objects.create(package_name="test-package", created_by=self.user)
+        self.versions = [
+            PluginVersion.objects.create(
+                plugin=self.plugin,
+                version=version,
+                created_by=self.user,
+                package=SimpleUploadedFile("test.zip", b"file_content"),
+                min_qg_version='3.1.1',
+                max_qg_version='3.3.0'
+            )
+            for version in ("1.0.0", "1.1.0")
+        ]
+
+    def _download(self, count):
+        """Returns the number of INSERT and UPDATE statements"""
+        with CaptureQueriesContext(connection) as context:
+            for i in range(count):
+                version = self.versions[i % 2]
+                version_download(self.factory.get('/'), self.plugin.package_name, version.version)
+        return self._count_writes(context)
+
+    def _count_writes(self, context):
+        return len([
+            q for q in context.captured_queries
+            if q['sql'].lstrip().upper().startswith(('INSERT', 'UPDATE'))
+        ])
+
+    def test_immediate_writes(self):
+        # Before: two full row saves of the version and the plugin, then
+        # a SELECT and an INSERT or UPDATE of the daily record.
+        # Now: two counter increments and one upsert.
+        self.assertEqual(self._download(1), 3)
+        self.assertEqual(self._download(10), 30)
+
+        self.plugin.refresh_from_db()
+        self.assertEqual(self.plugin.downloads, 11)
+        self.assertEqual(
+            sorted(PluginVersionDownload.objects.values_list('download_count', flat=True)),
+            [5, 6]
+        )
+
+    @override_settings(CACHES=DOWNLOAD_COUNTER_CACHES)
+    def test_buffered_writes(self):
+        with mock.patch.object(download_buffer, 'cache_alias', 'downloads'):
+            download_buffer.cache.clear()
+            self.assertEqual(self._download(20), 0)
+
+            with CaptureQueriesContext(connection) as context:
+                self.assertEqual(flush_download_buffer(), 20)
+            # Two versions, one plugin and the daily records upserted
+            # with executemany
+            self.assertEqual(self._count_writes(context), 4)
+
+            self.plugin.refresh_from_db()
+            self.assertEqual(self.plugin.downloads, 20)
+            for version in self.versions:
+                version.refresh_from_db()
+                self.assertEqual(version.downloads, 10)
+                self.assertEqual(
+                    PluginVersionDownload.objects.get(plugin_version=version).download_count,
+                    10
+                )
+
+            # Only the new downloads are flushed
+            self._download(3)
+            self.assertEqual(flush_download_buffer(), 3)
+            self.assertEqual(flush_download_buffer(), 0)
+            self.plugin.refresh_from_db()
+            self.assertEqual(self.plugin.downloads, 23)
+            self.assertEqual(
+                sorted(PluginVersionDownload.objects.values_list('download_count', flat=True)),
+                [11, 12]
+            )
+
+    @override_settings(CACHES=DOWNLOAD_COUNTER_CACHES)
+    def test_buffered_downloads_restored_on_error(self):
+        with mock.patch.object(download_buffer, 'cache_alias', 'downloads'):
+            download_buffer.cache.clear()
+            self._download(2)
+            with mock.patch('plugins.downloads.save_download_counts', side_effect=RuntimeError):
+                with self.assertRaises(RuntimeError):
+                    flush_download_buffer()
+
+            self.assertEqual(flush_download_buffer(), 2)
+
+    @override_settings(CACHES=DOWNLOAD_COUNTER_CACHES)
+    def test_buffer_registration_read_before_written(self):
+        with mock.patch.object(download_buffer, 'cache_alias', 'downloads'):
+            cache = download_buffer.cache
+            cache.clear()
+            entries = []
+
+            def register(counter_key, key):
+                # Index position taken, entry written after the drain
+                cache.add(download_buffer.index_key, 0, None)
+                entries.append((cache.incr(download_buffer.index_key), counter_key, key))
+
+            with mock.patch.object(download_buffer, '_register', register):
+                download_buffer.incr(('late',), 2)
+            self.assertEqual(download_buffer.drain(), {})
+
+            for position, counter_key, key in entries:
+                cache.set(
+                    '%s:%s' % (download_buffer.index_key, position), (counter_key, key)
+                )
+            self.assertEqual(download_buffer.drain(), {('late',): 2})
+
+    @override_settings(CACHES=DOWNLOAD_COUNTER_CACHES)
+    def test_buffer_forgets_drained_counters(self):
+        with mock.patch.object(download_buffer, 'cache_alias', 'downloads'):
+            cache = download_buffer.cache
+            cache.clear()
+            download_buffer.incr(('first',))
+            download_buffer.incr(('second',), 3)
+            self.assertEqual(
+                download_buffer.drain(), {('first',): 1, ('second',): 3}
+            )
+            self.assertEqual(cache.get(download_buffer.active_key), {})
+
+            # Registered again by their next increment
+            download_buffer.incr(('first',), 2)
+            self.assertEqual(download_buffer.drain(), {('first',): 2})
+            self.assertEqual(download_buffer.drain(), {})
@@ -0,0 +1,177 @@
+import gzip
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from lib.file_delivery import get_file_etag
+from plugins.feed_cache import feed_cache, get_qgis_range_tags
+from plugins.models import Plugin, PluginVersion
+from plugins.xml_feed import write_cached_xml
+
+FEED_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"},
+    "feeds": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+}
+
+
+@override_settings(CACHES=FEED_CACHES)
+@mock.patch.object(feed_cache, "cache_alias", "feeds")
+@mock.patch("plugins.tasks.generate_plugins_xml.update_plugins_xml.delay")
+class TestFeedCache(TestCase):
+    """Test the purge of the cached plugins.xml feeds"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="feed_user", password="12345")
+
+    def _create_version(self, name, version, min_qg_version, max_qg_version):
+        plugin, created = Plugin.objects.get_or_create(
+            package_name=name.lower(),
+            defaults={
+                "name": name,
+                "created_by": self.user,
+                "author": "Author",
+                "email": "author@example.com",
+                "description": "Description",
+            },
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            return PluginVersion.objects.create(
+                plugin=plugin,
+                version=version,
+                created_by=self.user,
+                package=SimpleUploadedFile("%s.zip" % name.lower(), b"content"),
+                min_qg_version=min_qg_version,
+                max_qg_version=max_qg_version,
+                approved=True,
+            )
+
+    def _get_feed(self, qgis="3.24"):
+        response = self.client.get(reverse("xml_plugins_new"), {"qgis": qgis})
+        self.assertEqual(response.status_code, 200)
+        if response.streaming:
+            return b"".join(response.streaming_content).decode("utf-8")
+        return response.content.decode("utf-8")
+
+    def test_qgis_range_tags(self, delay):
+        self.assertEqual(
+            get_qgis_range_tags("3.34.0", "4.1.99"),
+            ["qgis:3.%s" % minor for minor in range(34, 100)]
+            + ["qgis:4.0", "qgis:4.1"],
+        )
+        self.assertEqual(
+            get_qgis_range_tags("3.98.0", None), ["qgis:3.98", "qgis:3.99"]
+        )
+
+    def test_feed_purged_by_version_range(self, delay):
+        self._create_version("First", "1.0", "3.0.0", "3.99.0")
+        response = self.client.get(reverse("xml_plugins_new"), {"qgis": "3.24"})
+        # Streamed on a cache miss, cached once entirely sent
+        self.assertTrue(response.streaming)
+        content = b"".join(response.streaming_content).decode("utf-8")
+        self.assertIn('name="First" version="1.0"', content)
+        response = self.client.get(reverse("xml_plugins_new"), {"qgis": "3.24"})
+        self.assertFalse(response.streaming)
+        self.assertEqual(response.content.decode("utf-8"), content)
+
+        # Not listed in the QGIS 3.24 feed: the cached feed is kept
+        with mock.patch("plugins.views.iter_compatible_plugin_versions") as versions:
+            self._create_version("Legacy", "1.0", "2.0.0", "2.18.0")
+            self.assertNotIn('name="Legacy"', self._get_feed())
+            versions.assert_not_called()
+
+        version = self._create_version("First", "1.1", "3.20.0", "3.99.0")
+        self.assertIn('name="First" version="1.1"', self._get_feed())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            version.delete()
+        self.assertIn('name="First" version="1.0"', self._get_feed())
+
+
+@mock.patch("plugins.tasks.generate_plugins_xml.update_plugins_xml.delay")
+class TestConditionalFeed(TestCase):
+    """Test the ETag and Last-Modified validators of the feeds"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="etag_user", password="12345")
+        self.plugin = Plugin.objects.create(
+            name="Conditional",
+            package_name="conditional",
+            created_by=self.user,
+            author="Author",
+            email="author@example.com",
+            description="Description",
+        )
+
+    def _create_version(self, version):
+        with self.captureOnCommitCallbacks(execute=True):
+            return PluginVersion.objects.create(
+                plugin=self.plugin,
+                version=version,
+                created_by=self.user,
+                package=SimpleUploadedFile("conditional.zip", b"content"),
+                min_qg_version="3.0.0",
+                max_qg_version="3.99.0",
+                approved=True,
+            )
+
+    def _get(self, url_name="xml_plugins_new", **headers):
+        return self.client.get(reverse(url_name), {"qgis": "3.24"}, **headers)
+
+    def _assert_not_modified(self, url_name="xml_plugins_new"):
+        response = self._get(url_name)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.has_header("Last-Modified"))
+        with mock.patch("plugins.views.iter_compatible_plugin_versions") as versions:
+            self.assertEqual(
+                self._get(url_name, HTTP_IF_NONE_MATCH=response["ETag"]).status_code,
+                304,
+            )
+            self.assertEqual(
+                self._get(
+                    url_name, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+                ).status_code,
+                304,
+            )
+            versions.assert_not_called()
+        return response["ETag"]
+
+    def _test_changes(self):
+        self._create_version("1.0")
+        etag = self._assert_not_modified()
+
+        version = self._create_version("1.1")
+        self.assertEqual(self._get(HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        etag = self._assert_not_modified()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            version.delete()
+        self.assertEqual(self._get(HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_versions_validators(self, delay):
+        self._test_changes()
+
+    @override_settings(CACHES=FEED_CACHES)
+    def test_tags_validators(self, delay):
+        with mock.patch.object(feed_cache, "cache_alias", "feeds"):
+            self._test_changes()
+
+    def test_cached_xml_validators(self, delay):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        with override_settings(MEDIA_ROOT=media_root):
+            path = write_cached_xml("3.24", "<plugins/>")
+            etag = self._assert_not_modified("xml_plugins")
+            self.assertEqual(etag, get_file_etag(os.stat(path)))
+
+            response = self._get("xml_plugins", HTTP_ACCEPT_ENCODING="gzip, br;q=0")
+            self.assertEqual(response["Content-Encoding"], "gzip")
+            self.assertIn("Accept-Encoding", response["Vary"])
+            self.assertEqual(response["ETag"], get_file_etag(os.stat(path + ".gz")))
+            self.assertEqual(
+                gzip.decompress(b"".join(response.streaming_content)), b"<plugins/>"
+            )
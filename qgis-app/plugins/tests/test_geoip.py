@@ -0,0 +1,74 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from plugins.geoip import CountryLookup, get_country
+
+
+class TestCountryLookup(TestCase):
+    """Test the GeoIP LRU cache"""
+
+    def setUp(self):
+        self.reader = mock.Mock()
+        self.reader.country.side_effect = lambda ip: {
+            "country_code": "C%s" % ip[-1],
+            "country_name": "Country %s" % ip[-1],
+        }
+        patcher = mock.patch("plugins.geoip.get_geoip_reader", return_value=self.reader)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_cached_lookups(self):
+        lookup = CountryLookup(2)
+
+        self.assertEqual(lookup("10.0.0.1"), ("C1", "Country 1"))
+        self.assertEqual(lookup("10.0.0.1"), ("C1", "Country 1"))
+        lookup("10.0.0.2")
+        # 10.0.0.1 is the most recently used, 10.0.0.2 is evicted
+        lookup("10.0.0.1")
+        lookup("10.0.0.3")
+        lookup("10.0.0.1")
+        lookup("10.0.0.2")
+
+        self.assertEqual(
+            [c.args[0] for c in self.reader.country.call_args_list],
+            ["10.0.0.1", "10.0.0.2", "10.0.0.3", "10.0.0.2"],
+        )
+        stats = lookup.stats()
+        self.assertEqual(stats["size"], 2)
+        self.assertEqual(stats["hits"], 3)
+        self.assertEqual(stats["misses"], 4)
+        self.assertAlmostEqual(stats["hit_rate"], 3 / 7)
+        self.assertGreaterEqual(stats["avg_lookup_ms"], 0)
+
+    def test_unknown_addresses(self):
+        self.reader.country.side_effect = ValueError
+        lookup = CountryLookup(10)
+
+        self.assertEqual(lookup(""), ("N/D", "N/D"))
+        self.assertEqual(lookup("123.456.789.100"), ("N/D", "N/D"))
+        self.assertEqual(lookup("123.456.789.100"), ("N/D", "N/D"))
+        self.assertEqual(self.reader.country.call_count, 1)
+
+    def test_disabled_cache(self):
+        lookup = CountryLookup(0)
+
+        lookup("10.0.0.1")
+        lookup("10.0.0.1")
+
+        self.assertEqual(self.reader.country.call_count, 2)
+        self.assertEqual(lookup.stats()["size"], 0)
+
+    def test_stats_view(self):
+        url = reverse("geoip_stats")
+        user = User.objects.create_user(username="user", password="12345")
+        self.client.force_login(user)
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        user.is_staff = True
+        user.save()
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["max_size"], get_country.max_size)
@@ -0,0 +1,90 @@
+import io
+import shutil
+import tempfile
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from PIL import Image
+from plugins.models import Plugin
+from plugins.templatetags.plugin_utils import is_image_valid
+
+SVG_ICON = (
+    b'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 48 32">'
+    b'<rect width="48" height="32"/></svg>'
+)
+
+
+def _png_icon(size=(24, 16)):
+    content = io.BytesIO()
+    Image.new("RGB", size).save(content, "PNG")
+    return content.getvalue()
+
+
+class TestPluginIconInfo(TestCase):
+    """Test the stored validity and dimensions of the plugins icons"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = User.objects.create_user(username="icon_user", password="12345")
+
+    def _create_plugin(self, name, icon):
+        return Plugin.objects.create(
+            name=name,
+            package_name=name.lower(),
+            created_by=self.user,
+            author="Author",
+            email="author@example.com",
+            description="Description",
+            icon=icon,
+        )
+
+    def _icon_info(self, plugin):
+        return (
+            plugin.icon_valid,
+            plugin.icon_format,
+            plugin.icon_width,
+            plugin.icon_height,
+        )
+
+    def test_icon_checked_on_upload(self):
+        plugin = self._create_plugin(
+            "Raster", SimpleUploadedFile("icon.png", _png_icon())
+        )
+        plugin.refresh_from_db()
+        self.assertEqual(self._icon_info(plugin), (True, "PNG", 24, 16))
+        self.assertTrue(is_image_valid(plugin.icon))
+
+        plugin.icon = SimpleUploadedFile("icon.svg", SVG_ICON)
+        plugin.save()
+        plugin.refresh_from_db()
+        self.assertEqual(self._icon_info(plugin), (True, "SVG", 48, 32))
+
+        plugin.icon = SimpleUploadedFile("broken.png", b"not an image")
+        plugin.save()
+        plugin.refresh_from_db()
+        self.assertEqual(self._icon_info(plugin), (False, "", None, None))
+        self.assertFalse(is_image_valid(plugin.icon))
+
+        plugin.icon = None
+        plugin.save()
+        self.assertFalse(is_image_valid(plugin.icon))
+
+    def test_backfill_command(self):
+        valid = self._create_plugin(
+            "Valid", SimpleUploadedFile("icon.png", _png_icon())
+        )
+        broken = self._create_plugin("Broken", SimpleUploadedFile("icon.svg", b"<svg"))
+        Plugin.objects.update(icon_valid=None, icon_format="", icon_width=None)
+
+        call_command("validate_plugin_icons", workers=2, stdout=io.StringIO())
+
+        valid.refresh_from_db()
+        broken.refresh_from_db()
+        self.assertEqual(self._icon_info(valid), (True, "PNG", 24, 16))
+        self.assertEqual(self._icon_info(broken), (False, "", None, None))
@@ -0,0 +1,97 @@
+import base64
+from unittest import mock
+
+from django.contrib import auth
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from plugins.middleware import (
+    FetchFromCacheMiddleware,
+    HttpAuthMiddleware,
+    UpdateCacheMiddleware,
+)
+
+BASIC_AUTH_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"},
+    "basic_auth": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+}
+
+
+@override_settings(CACHES=BASIC_AUTH_CACHES, BASIC_AUTH_CACHE="basic_auth")
+class TestHttpAuthMiddleware(TestCase):
+    """Test the HTTP-Basic authentication of the XML-RPC clients"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="rpc_user", password="12345")
+        self.middleware = HttpAuthMiddleware(
+            lambda request: HttpResponse(getattr(request, "user", ""))
+        )
+
+    def _request(self, password="12345"):
+        credentials = base64.b64encode(("rpc_user:%s" % password).encode("utf8"))
+        request = RequestFactory().post(
+            "/plugins/RPC2/",
+            HTTP_AUTHORIZATION="Basic %s" % credentials.decode("ascii"),
+        )
+        self.middleware(request)
+        return request
+
+    @mock.patch("plugins.middleware.auth.authenticate", wraps=auth.authenticate)
+    def test_credentials_cached(self, authenticate):
+        self.assertEqual(self._request().user, self.user)
+        self.assertEqual(self._request().user, self.user)
+        self.assertEqual(authenticate.call_count, 1)
+
+        self.assertFalse(hasattr(self._request("wrong"), "user"))
+        self.assertEqual(authenticate.call_count, 2)
+
+    @mock.patch("plugins.middleware.auth.authenticate", wraps=auth.authenticate)
+    def test_cache_invalidated(self, authenticate):
+        self._request()
+
+        self.user.set_password("67890")
+        self.user.save()
+        self.assertFalse(hasattr(self._request(), "user"))
+        self.assertEqual(self._request("67890").user, self.user)
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertFalse(hasattr(self._request("67890"), "user"))
+        self.assertEqual(authenticate.call_count, 4)
+
+    def test_no_session_for_stateless_clients(self):
+        self._request()
+        self._request()
+        self.assertEqual(Session.objects.count(), 0)
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class TestHttpAuthPageCache(TestCase):
+    """Test that the pages rendered for HTTP-Basic users are not cached"""
+
+    def setUp(self):
+        User.objects.create_user(username="rpc_user", password="12345")
+        # Same order as in the MIDDLEWARE setting
+        self.middleware = UpdateCacheMiddleware(
+            HttpAuthMiddleware(
+                FetchFromCacheMiddleware(
+                    lambda request: HttpResponse(getattr(request, "user", ""))
+                )
+            )
+        )
+
+    def test_authenticated_page_not_cached(self):
+        credentials = base64.b64encode(b"rpc_user:12345").decode("ascii")
+        response = self.middleware(
+            RequestFactory().get(
+                "/plugins/my/", HTTP_AUTHORIZATION="Basic %s" % credentials
+            )
+        )
+        self.assertEqual(response.content, b"rpc_user")
+        self.assertIn("private", response["Cache-Control"])
+
+        response = self.middleware(RequestFactory().get("/plugins/my/"))
+        self.assertEqual(response.content, b"")
@@ -1,9 +1,13 @@
 from datetime import datetime
+from io import StringIO
 
 from freezegun import freeze_time
 
 from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from plugins.models import Plugin, PluginVersion, PluginVersionFeedback
 
 
@@ -127,3 +131,83 @@ class PluginVersionFeedbackManagerTest(TestCase):
         self.assertEqual(plugins[0], self.plugin_2)
 
 
+
+
+class PluginSortFieldsTest(TestCase):
+    fixtures = ["fixtures/auth.json", ]
+
+    def setUp(self):
+        self.creator = User.objects.get(id=2)
+        self.plugin = Plugin.objects.create(
+            created_by=self.creator,
+            repository="http://example.com",
+            tracker="http://example.com",
+            package_name="test-sort-fields",
+            name="test sort fields",
+            about="this is a test for the plugin sort fields"
+        )
+
+    def _create_version(self, version, approved):
+        return PluginVersion.objects.create(
+            plugin=self.plugin,
+            created_by=self.creator,
+            min_qg_version="3.0.0",
+            max_qg_version="3.99.0",
+            version=version,
+            approved=approved,
+        )
+
+    def test_latest_version_dates(self):
+        with freeze_time("2024-01-01 10:00:00"):
+            approved_version = self._create_version("0.1", approved=True)
+        with freeze_time("2024-02-01 10:00:00"):
+            unapproved_version = self._create_version("0.2", approved=False)
+
+        self.plugin.refresh_from_db()
+        self.assertEqual(self.plugin.latest_version_date, approved_version.created_on)
+        self.assertEqual(self.plugin.latest_any_version_date, unapproved_version.created_on)
+
+        unapproved_version.approved = True
+        unapproved_version.save()
+        self.plugin.refresh_from_db()
+        self.assertEqual(self.plugin.latest_version_date, unapproved_version.created_on)
+
+        unapproved_version.delete()
+        approved_version.approved = False
+        approved_version.save()
+        self.plugin.refresh_from_db()
+        self.assertIsNone(self.plugin.latest_version_date)
+        self.assertEqual(self.plugin.latest_any_version_date, approved_version.created_on)
+
+    def test_average_vote(self):
+        self.plugin.rating_score = 9
+        self.plugin.rating_votes = 2
+        self.plugin.save()
+
+        self.assertAlmostEqual(
+            Plugin.objects.get(pk=self.plugin.pk).average_vote, 9 / 2.001
+        )
+
+    def test_repair_command(self):
+        self._create_version("0.1", approved=True)
+        Plugin.objects.filter(pk=self.plugin.pk).update(
+            latest_version_date=None, average_vote=3
+        )
+
+        call_command("repair_plugin_sort_fields", "--dry-run", stdout=StringIO())
+        self.assertIsNone(Plugin.objects.get(pk=self.plugin.pk).latest_version_date)
+
+        out = StringIO()
+        call_command("repair_plugin_sort_fields", stdout=out)
+        self.assertIn("test-sort-fields", out.getvalue())
+        plugin = Plugin.objects.get(pk=self.plugin.pk)
+        self.assertIsNotNone(plugin.latest_version_date)
+        self.assertEqual(plugin.average_vote, 0)
+
+    def test_sort_by_stored_fields(self):
+        self._create_version("0.1", approved=True)
+        with CaptureQueriesContext(connection) as context:
+            list(Plugin.approved_objects.order_by("-latest_version_date", "-average_vote"))
+
+        # No correlated subquery on the versions
+        self.assertNotIn("SELECT created_on", context.captured_queries[0]["sql"])
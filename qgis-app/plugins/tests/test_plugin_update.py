@@ -164,6 +164,43 @@ class PluginUpdateTestCase(TestCase):
             settings.EMAIL_HOST_USER
         )
 
+    @patch("plugins.tasks.generate_plugins_xml", new=do_nothing)
+    @patch("plugins.validator._check_url_link", new=do_nothing)
+    def test_plugin_new_version_sort_fields(self):
+        """
+        Test the latest version dates are kept when the plugin is updated
+        from the metadata of a new version
+        """
+        approved_version = PluginVersion.objects.get(
+            plugin=self.plugin, version='0.0.1'
+        )
+        approved_version.approved = True
+        approved_version.save()
+
+        url_add_version = reverse('version_create', args=[self.plugin.package_name])
+        valid_plugin = os.path.join(TESTFILE_DIR, "change_metadata.zip_")
+        with open(valid_plugin, "rb") as file:
+            uploaded_file = SimpleUploadedFile(
+                "change_metadata.zip_", file.read(),
+                content_type="application/zip_")
+
+        response = self.client.post(url_add_version, {
+            'package': uploaded_file,
+            'experimental': False,
+            'changelog': ''
+        })
+        self.assertEqual(response.status_code, 302)
+
+        new_version = PluginVersion.objects.get(plugin=self.plugin, version='0.0.2')
+        self.assertFalse(new_version.approved)
+        self.plugin.refresh_from_db()
+        self.assertEqual(self.plugin.homepage, "https://github.com/")
+        self.assertEqual(
+            self.plugin.latest_version_date, approved_version.created_on
+        )
+        self.assertEqual(
+            self.plugin.latest_any_version_date, new_version.created_on
+        )
 
     def tearDown(self):
         self.client.logout()
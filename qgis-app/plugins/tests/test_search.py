@@ -0,0 +1,134 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from plugins.models import Plugin, PluginVersion
+from plugins.search import (
+    flush_search_index_queue,
+    format_headline,
+    search_index_queue,
+    search_plugins,
+    update_search_index,
+)
+
+SEARCH_INDEX_QUEUE_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"},
+    "search": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+}
+
+
+@override_settings(CACHES=SEARCH_INDEX_QUEUE_CACHES)
+class TestQueuedSignalProcessor(TestCase):
+    """Test the queued updates of the plugins search index"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="search_user", password="12345")
+        patcher = mock.patch.object(search_index_queue, "cache_alias", "search")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        search_index_queue.cache.clear()
+        self.plugin = Plugin.objects.create(
+            name="Search",
+            package_name="search",
+            created_by=self.user,
+            author="Author",
+            email="author@example.com",
+            description="Description",
+        )
+        self.version = PluginVersion.objects.create(
+            plugin=self.plugin,
+            version="1.0",
+            created_by=self.user,
+            min_qg_version="3.0.0",
+            max_qg_version="3.99.0",
+            approved=True,
+        )
+
+    @mock.patch("plugins.search.update_search_index")
+    def test_changes_coalesced(self, update_search_index):
+        self.plugin.description = "New description"
+        self.plugin.save()
+        self.plugin.tags.add("vector")
+        self.version.approved = False
+        self.version.save()
+
+        self.assertEqual(flush_search_index_queue(), 1)
+        update_search_index.assert_called_once()
+        self.assertEqual(list(update_search_index.call_args[0][0]), [self.plugin.pk])
+        self.assertEqual(flush_search_index_queue(), 0)
+
+    @mock.patch("plugins.search.update_search_index")
+    def test_counter_updates_ignored(self, update_search_index):
+        flush_search_index_queue()
+
+        self.plugin.downloads = 10
+        self.plugin.save(keep_date=True, update_fields=["downloads"])
+        self.version.downloads = 10
+        self.version.save(update_fields=["downloads"])
+
+        self.assertEqual(flush_search_index_queue(), 0)
+
+    @mock.patch("plugins.search.update_search_index", side_effect=RuntimeError)
+    def test_queue_restored_on_error(self, update_search_index):
+        with self.assertRaises(RuntimeError):
+            flush_search_index_queue()
+
+        update_search_index.side_effect = None
+        self.assertEqual(flush_search_index_queue(), 1)
+
+
+class TestSearchPlugins(TestCase):
+    """Test the postgres plugins search"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="search_user", password="12345")
+        self.vector = self._create_plugin(
+            "Vector Tools", "vector_tools", "Tools to edit <vector> layers", ["editing"]
+        )
+        self.raster = self._create_plugin(
+            "Raster Calculator", "raster_calc", "Compute raster bands", ["raster"]
+        )
+        self.unapproved = self._create_plugin(
+            "Vector Draft", "vector_draft", "Draft vector plugin", [], approved=False
+        )
+        update_search_index(Plugin.objects.values_list("pk", flat=True))
+
+    def _create_plugin(self, name, package_name, description, tags, approved=True):
+        plugin = Plugin.objects.create(
+            name=name,
+            package_name=package_name,
+            created_by=self.user,
+            author="Author",
+            email="author@example.com",
+            description=description,
+        )
+        plugin.tags.set(tags)
+        PluginVersion.objects.create(
+            plugin=plugin,
+            version="1.0",
+            created_by=self.user,
+            min_qg_version="3.0.0",
+            max_qg_version="3.99.0",
+            approved=approved,
+        )
+        return plugin
+
+    def test_prefix_match(self):
+        self.assertEqual(list(search_plugins("vect")), [self.vector])
+        self.assertEqual(list(search_plugins("comp rast")), [self.raster])
+        self.assertEqual(list(search_plugins("editing")), [self.vector])
+
+    def test_trigram_match(self):
+        self.assertEqual(list(search_plugins("Rastre Calculator")), [self.raster])
+
+    def test_no_match(self):
+        self.assertEqual(list(search_plugins("")), [])
+        self.assertEqual(list(search_plugins("???")), [])
+        self.assertEqual(list(search_plugins("mesh")), [])
+
+    def test_headline(self):
+        plugin = search_plugins("layers")[0]
+        self.assertEqual(
+            format_headline(plugin.headline),
+            "Tools to edit &lt;vector&gt; <mark>layers</mark>",
+        )
@@ -0,0 +1,93 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.template import Context, Template
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from plugins.models import (
+    Plugin,
+    PluginTagCount,
+    PluginVersion,
+    refresh_plugin_tag_counts,
+)
+from plugins.templatetags.plugins_tagcloud import get_queryset
+
+
+class TestPluginTagCounts(TestCase):
+    """Test the stored tag counts of the plugins tag cloud"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="tag_user", password="12345")
+
+    def _create_plugin(self, name, tags, approved=True):
+        plugin = Plugin.objects.create(
+            name=name,
+            package_name=name.lower(),
+            created_by=self.user,
+            author="Author",
+            email="author@example.com",
+            description="Description",
+        )
+        plugin.tags.set(tags)
+        PluginVersion.objects.create(
+            plugin=plugin,
+            version="1.0",
+            created_by=self.user,
+            min_qg_version="3.0.0",
+            max_qg_version="3.99.0",
+            approved=approved,
+        )
+        return plugin
+
+    def _counts(self):
+        return dict(PluginTagCount.objects.values_list("tag__name", "num_times"))
+
+    def test_counts_updated(self):
+        alpha = self._create_plugin("Alpha", ["vector", "raster"])
+        self._create_plugin("Beta", ["vector"])
+        gamma = self._create_plugin("Gamma", ["vector", "web"], approved=False)
+        self.assertEqual(self._counts(), {"vector": 2, "raster": 1})
+
+        version = gamma.pluginversion_set.get()
+        version.approved = True
+        version.save()
+        self.assertEqual(self._counts(), {"vector": 3, "raster": 1, "web": 1})
+
+        alpha.tags.remove("raster")
+        gamma.tags.add("raster")
+        self.assertEqual(self._counts(), {"vector": 3, "raster": 1, "web": 1})
+
+        gamma.tags.clear()
+        self.assertEqual(self._counts(), {"vector": 2})
+
+        alpha.delete()
+        self.assertEqual(self._counts(), {"vector": 1})
+
+    def test_refresh_all(self):
+        self._create_plugin("Alpha", ["vector", "raster"])
+        PluginTagCount.objects.all().delete()
+
+        refresh_plugin_tag_counts()
+
+        self.assertEqual(self._counts(), {"vector": 1, "raster": 1})
+
+    def test_tagcloud(self):
+        self._create_plugin("Alpha", ["vector", "raster"])
+        self._create_plugin("Beta", ["vector"])
+        self._create_plugin("Gamma", ["vector"])
+
+        with mock.patch(
+            "plugins.templatetags.plugins_tagcloud.TAGCLOUD_COUNT_GTE", None
+        ):
+            with CaptureQueriesContext(connection) as context:
+                tags = list(get_queryset())
+            self.assertEqual(len(context.captured_queries), 1)
+
+            output = Template(
+                "{% load plugins_tagcloud %}{% get_plugins_tagcloud as tags %}"
+                "{% for tag in tags %}{{ tag.name }}:{{ tag.num_times }} {% endfor %}"
+            ).render(Context())
+
+        self.assertEqual(len(tags), 2)
+        self.assertEqual(output, "raster:1 vector:3 ")
@@ -1,17 +1,38 @@
+import gzip
 import os
+import shutil
+import tempfile
 
 from django.test import TestCase, override_settings
 from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
 
 from preferences import preferences
 from unittest.mock import patch, MagicMock
 
 from base.models.site_preferences import SitePreference
-from plugins.tasks.generate_plugins_xml import generate_plugins_xml
+from plugins.models import Plugin, PluginVersion
+from plugins.tasks.generate_plugins_xml import generate_plugins_xml, update_plugins_xml
 from plugins.tasks.update_qgis_versions import update_qgis_versions
+from plugins.xml_feed import (
+    FAST_COMPRESSION_LEVELS,
+    MAX_COMPRESSION_LEVELS,
+    get_cached_xml_encodings,
+    get_cached_xml_path,
+    is_version_in_range,
+    write_cached_xml,
+)
 
 
 class TestPluginTask(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        media_settings = override_settings(MEDIA_ROOT=self.media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        self.addCleanup(shutil.rmtree, self.media_root)
+
     @patch.object(SitePreference.objects, 'first')
     @patch.object(SitePreference.objects, 'create')
     @patch('plugins.tasks.update_qgis_versions.get_qgis_versions')
@@ -37,59 +58,115 @@ class TestPluginTask(TestCase):
         update_qgis_versions()
         mock_create.assert_called_once()
 
-    @override_settings(DEFAULT_PLUGINS_SITE='http://test_plugins_site')
-    @patch('requests.get')
-    @patch('os.path.exists', return_value=False)
-    @patch('os.mkdir')
-    @patch('builtins.open', new_callable=MagicMock)
-    def test_generate_plugins_xml(self, mock_open, mock_mkdir, mock_exists, mock_get):
+    def _create_plugin_version(self):
+        user = User.objects.create_user(username='xml_user', password='12345')
+        plugin = Plugin.objects.create(
+            name="XML Plugin",
+            package_name="xml_plugin",
+            created_by=user,
+            author="Author",
+            email="author@example.com",
+            description="XML plugin description",
+        )
+        return PluginVersion.objects.create(
+            plugin=plugin,
+            version="1.0.0",
+            created_by=user,
+            package=SimpleUploadedFile("xml_plugin.zip", b"file_content"),
+            min_qg_version="3.0.0",
+            max_qg_version="3.24.99",
+            approved=True,
+        )
+
+    @patch('plugins.tasks.generate_plugins_xml.get_version_from_label', return_value='3.24')
+    def test_generate_plugins_xml(self, mock_get_version_from_label):
         # Given
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.text = '<some xml content> QGIS Version 34002|Visit https://download.qgis.org to get your copy of version 3.40.2'
-        mock_get.return_value = mock_response
+        self._create_plugin_version()
         preferences.SitePreference.qgis_versions = '3.24,3.25'
 
-        expected_folder_path = os.path.join(settings.MEDIA_ROOT, 'cached_xmls')
-
         # When
-        generate_plugins_xml()
+        generate_plugins_xml('http://test_plugins_site')
 
         # Then
-        mock_mkdir.assert_called_once_with(expected_folder_path)
-        expected_calls = [
-            ((f'{settings.DEFAULT_PLUGINS_SITE}/plugins/plugins_new.xml?qgis=3.24',),),
-            ((f'{settings.DEFAULT_PLUGINS_SITE}/plugins/plugins_new.xml?qgis=3.25',),)
-        ]
-        mock_get.assert_has_calls(expected_calls, any_order=True)
-        mock_open.assert_any_call(os.path.join(expected_folder_path, 'plugins_3.24.xml'), 'w+')
-        mock_open.assert_any_call(os.path.join(expected_folder_path, 'plugins_3.25.xml'), 'w+')
-
-    @override_settings(DEFAULT_PLUGINS_SITE='http://test_plugins_site')
-    @patch('requests.get')
-    @patch('os.path.exists', return_value=False)
-    @patch('os.mkdir')
-    @patch('builtins.open', new_callable=MagicMock)
-    def test_generate_plugins_xml_with_custom_site(self, mock_open, mock_mkdir, mock_exists, mock_get):
+        folder_path = os.path.join(self.media_root, 'cached_xmls')
+        extensions = [''] + [extension for _, extension in get_cached_xml_encodings()]
+        self.assertEqual(
+            sorted(os.listdir(folder_path)),
+            sorted(
+                'plugins_%s.xml%s' % (name, extension)
+                for name in ('3.24', '3.25', 'latest', 'ltr', 'stable')
+                for extension in extensions
+            )
+        )
+        with open(os.path.join(folder_path, 'plugins_3.24.xml')) as f:
+            content = f.read()
+        self.assertIn('<pyqgis_plugin name="XML Plugin" version="1.0.0"', content)
+        self.assertIn(
+            'http://test_plugins_site/plugins/xml_plugin/version/1.0.0/download/',
+            content
+        )
+        with open(os.path.join(folder_path, 'plugins_3.25.xml')) as f:
+            self.assertNotIn('xml_plugin', f.read())
+
+    @patch('plugins.tasks.generate_plugins_xml.get_version_from_label', return_value='3.30')
+    def test_update_plugins_xml(self, mock_get_version_from_label):
         # Given
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.text = '<some xml content>'
-        mock_response.json.return_value = {'latest': {'version': '3.40'}, 'ltr': {'version': '3.40'}}
-        mock_get.return_value = mock_response
-        preferences.SitePreference.qgis_versions = '3.24,3.25'
-
-        expected_folder_path = os.path.join(settings.MEDIA_ROOT, 'cached_xmls')
+        self._create_plugin_version()
+        preferences.SitePreference.qgis_versions = '3.22,3.24'
+        write_cached_xml('3.22', 'unchanged')
+        write_cached_xml('3.24', 'outdated')
+        write_cached_xml('latest', 'unchanged')
 
         # When
-        generate_plugins_xml('http://custom_plugins_site')
+        update_plugins_xml('3.24.0', '3.24.99', 'http://test_plugins_site')
 
         # Then
-        mock_mkdir.assert_called_once_with(expected_folder_path)
-        expected_calls = [
-            (('http://custom_plugins_site/plugins/plugins_new.xml?qgis=3.24',),),
-            (('http://custom_plugins_site/plugins/plugins_new.xml?qgis=3.25',),)
-        ]
-        mock_get.assert_has_calls(expected_calls, any_order=True)
-        mock_open.assert_any_call(os.path.join(expected_folder_path, 'plugins_3.24.xml'), 'w+')
-        mock_open.assert_any_call(os.path.join(expected_folder_path, 'plugins_3.25.xml'), 'w+')
+        with open(get_cached_xml_path('3.22')) as f:
+            self.assertEqual(f.read(), 'unchanged')
+        with open(get_cached_xml_path('latest')) as f:
+            self.assertEqual(f.read(), 'unchanged')
+        with open(get_cached_xml_path('3.24')) as f:
+            self.assertIn('xml_plugin', f.read())
+
+    @patch('plugins.tasks.generate_plugins_xml.get_version_from_label', return_value='3.24')
+    def test_compression_levels(self, mock_get_version_from_label):
+        preferences.SitePreference.qgis_versions = '3.24'
+        with patch('plugins.xml_feed.write_cached_xml') as mock_write_cached_xml:
+            generate_plugins_xml('http://test_plugins_site')
+            # Three labels and one version
+            self.assertEqual(
+                [c.args[2] for c in mock_write_cached_xml.call_args_list],
+                [MAX_COMPRESSION_LEVELS] * 4,
+            )
+            mock_write_cached_xml.reset_mock()
+            update_plugins_xml('3.24.0', '3.24.99', 'http://test_plugins_site')
+            self.assertEqual(
+                [c.args[2] for c in mock_write_cached_xml.call_args_list],
+                [FAST_COMPRESSION_LEVELS] * 4,
+            )
+
+    def test_write_cached_xml(self):
+        file_path = write_cached_xml('3.24', '<plugins/>')
+        folder_path = os.path.dirname(file_path)
+
+        self.assertEqual(file_path, get_cached_xml_path('3.24'))
+        self.assertEqual(
+            sorted(os.listdir(folder_path)),
+            sorted(
+                ['plugins_3.24.xml']
+                + ['plugins_3.24.xml%s' % ext for _, ext in get_cached_xml_encodings()]
+            )
+        )
+        for name in os.listdir(folder_path):
+            self.assertEqual(
+                os.stat(os.path.join(folder_path, name)).st_mode & 0o777, 0o644
+            )
+        with gzip.open(file_path + '.gz') as f:
+            self.assertEqual(f.read(), b'<plugins/>')
+
+    def test_is_version_in_range(self):
+        self.assertTrue(is_version_in_range('3.24', '3.0', '3.99'))
+        self.assertTrue(is_version_in_range('3.24', '3.24.2', '3.24.99'))
+        self.assertTrue(is_version_in_range('3.24', '3.0.0', '3.24.0'))
+        self.assertFalse(is_version_in_range('3.24', '3.26.0', '3.99'))
+        self.assertFalse(is_version_in_range('3.24', '3.0.0', '3.22.99'))
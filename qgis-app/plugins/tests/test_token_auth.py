@@ -2,10 +2,13 @@ import os
 from unittest.mock import patch
 
 from django.urls import reverse
-from django.test import Client, TestCase, override_settings
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase, override_settings
 from django.contrib.auth.models import User
 from django.core.files.uploadedfile import SimpleUploadedFile
-from plugins.models import Plugin, PluginVersion
+from lib.token_cache import token_validation_cache
+from plugins.decorators import has_valid_token
+from plugins.models import Plugin, PluginOutstandingToken, PluginVersion
 from plugins.forms import PackageUploadForm
 from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
 from rest_framework_simplejwt.tokens import RefreshToken
@@ -15,6 +18,11 @@ def do_nothing(*args, **kwargs):
 
 TESTFILE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "testfiles"))
 
+TOKEN_VALIDATION_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"},
+    "tokens": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+}
+
 class UploadWithTokenTestCase(TestCase):
     fixtures = [
         "fixtures/styles.json",
@@ -92,6 +100,39 @@ class UploadWithTokenTestCase(TestCase):
         self.assertEqual(response.status_code, 302)
         self.assertTrue(PluginVersion.objects.filter(plugin__name='Test Plugin', version='0.0.2').exists())
 
+    @override_settings(CACHES=TOKEN_VALIDATION_CACHES)
+    def test_token_validation_cached(self):
+        self.client.post(self.url_token_create, {})
+        outstanding_token = OutstandingToken.objects.last().token
+        refresh = RefreshToken(outstanding_token)
+        refresh['plugin_id'] = self.plugin.pk
+        refresh['refresh_jti'] = refresh['jti']
+        request = RequestFactory().post(
+            self.url_add_version,
+            HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}",
+        )
+        view = has_valid_token(lambda request, package_name: HttpResponse())
+        package_name = self.plugin.package_name
+
+        with patch.object(token_validation_cache, "cache_alias", "tokens"):
+            token_validation_cache.cache.clear()
+            self.assertEqual(view(request, package_name=package_name).status_code, 200)
+            last_used_on = PluginOutstandingToken.objects.get().last_used_on
+            self.assertIsNotNone(last_used_on)
+
+            # Validated from the cache, the last use date is not written again
+            with self.assertNumQueries(0):
+                response = view(request, package_name=package_name)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(
+                PluginOutstandingToken.objects.get().last_used_on, last_used_on
+            )
+            self.assertEqual(view(request, package_name="other").status_code, 403)
+
+            # The blacklisted token is rejected at once
+            refresh.blacklist()
+            self.assertEqual(view(request, package_name=package_name).status_code, 403)
+
     def test_upload_new_version_with_invalid_token(self):
         # Log out the user and use the token
         self.client.logout()
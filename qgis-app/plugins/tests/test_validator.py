@@ -1,10 +1,16 @@
 import os
+import threading
+import time
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
 from unittest import mock
 
 import requests
+from django.core.cache import caches
 from django.core.exceptions import ValidationError
 from django.core.files.uploadedfile import InMemoryUploadedFile
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from plugins.validator import _check_url_link, validator
 
 TESTFILE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "testfiles"))
@@ -141,17 +147,17 @@ class TestValidatorForbiddenFileFolder(TestCase):
     def tearDown(self):
         self.valid_metadata_link.close()
 
-    @mock.patch("zipfile.ZipFile.namelist")
-    def test_zipfile_with_pyc_file(self, mock_namelist):
-        mock_namelist.return_value = [".pyc"]
+    @mock.patch("zipfile.ZipFile.infolist")
+    def test_zipfile_with_pyc_file(self, mock_infolist):
+        mock_infolist.return_value = [zipfile.ZipInfo(".pyc")]
         with self.assertRaisesMessage(
             Exception, "For security reasons, zip file cannot contain .pyc file"
         ):
             validator(self.package)
 
-    @mock.patch("zipfile.ZipFile.namelist")
-    def test_zipfile_with_MACOSX(self, mock_namelist):
-        mock_namelist.return_value = ["__MACOSX/"]
+    @mock.patch("zipfile.ZipFile.infolist")
+    def test_zipfile_with_MACOSX(self, mock_infolist):
+        mock_infolist.return_value = [zipfile.ZipInfo("__MACOSX/")]
         with self.assertRaisesMessage(
             Exception,
             (
@@ -161,9 +167,9 @@ class TestValidatorForbiddenFileFolder(TestCase):
         ):
             validator(self.package)
 
-    @mock.patch("zipfile.ZipFile.namelist")
-    def test_zipfile_with_pycache(self, mock_namelist):
-        mock_namelist.return_value = ["__pycache__/"]
+    @mock.patch("zipfile.ZipFile.infolist")
+    def test_zipfile_with_pycache(self, mock_infolist):
+        mock_infolist.return_value = [zipfile.ZipInfo("__pycache__/")]
         with self.assertRaisesMessage(
             Exception,
             (
@@ -173,9 +179,9 @@ class TestValidatorForbiddenFileFolder(TestCase):
         ):
             validator(self.package)
 
-    @mock.patch("zipfile.ZipFile.namelist")
-    def test_zipfile_with_pycache_in_children(self, mock_namelist):
-        mock_namelist.return_value = ["path/to/__pycache__/"]
+    @mock.patch("zipfile.ZipFile.infolist")
+    def test_zipfile_with_pycache_in_children(self, mock_infolist):
+        mock_infolist.return_value = [zipfile.ZipInfo("path/to/__pycache__/")]
         with self.assertRaisesMessage(
             Exception,
             (
@@ -185,9 +191,9 @@ class TestValidatorForbiddenFileFolder(TestCase):
         ):
             validator(self.package)
 
-    @mock.patch("zipfile.ZipFile.namelist")
-    def test_zipfile_with_git(self, mock_namelist):
-        mock_namelist.return_value = [".git"]
+    @mock.patch("zipfile.ZipFile.infolist")
+    def test_zipfile_with_git(self, mock_infolist):
+        mock_infolist.return_value = [zipfile.ZipInfo(".git")]
         with self.assertRaisesMessage(
             Exception,
             (
@@ -197,10 +203,10 @@ class TestValidatorForbiddenFileFolder(TestCase):
         ):
             validator(self.package)
 
-    @mock.patch("zipfile.ZipFile.namelist")
-    def test_zipfile_with_gitignore(self, mock_namelist):
+    @mock.patch("zipfile.ZipFile.infolist")
+    def test_zipfile_with_gitignore(self, mock_infolist):
         """test if .gitignore will not raise ValidationError"""
-        mock_namelist.return_value = [".gitignore"]
+        mock_infolist.return_value = [zipfile.ZipInfo(".gitignore")]
         with self.assertRaises(ValidationError) as cm:
             validator(self.package)
         exception = cm.exception
@@ -306,3 +312,171 @@ class TestMultipleParentFoldersValidator(TestCase):
         )
         multiple_parent_folders = self._get_value_by_attribute('multiple_parent_folders', result)
         self.assertIsNone(multiple_parent_folders)
+
+
+class TestValidatorSinglePass(TestCase):
+    """Test that the zip members are decompressed once"""
+
+    def setUp(self):
+        with open(os.path.join(TESTFILE_DIR, "valid_plugin.zip_"), "rb") as f:
+            self.content = f.read()
+
+    def _package(self, content):
+        return InMemoryUploadedFile(
+            BytesIO(content),
+            field_name="tempfile",
+            name="testfile.zip",
+            content_type="application/zip",
+            size=len(content),
+            charset="utf8",
+        )
+
+    @mock.patch("plugins.validator._check_url_link")
+    def test_members_decompressed_once(self, mock_check_url_link):
+        with mock.patch("zipfile.ZipFile.open", side_effect=zipfile.ZipFile.open, autospec=True) as mock_open:
+            self.assertTrue(validator(self._package(self.content)))
+
+        opened = [c.args[1].filename for c in mock_open.call_args_list]
+        with zipfile.ZipFile(BytesIO(self.content)) as zip:
+            self.assertEqual(sorted(opened), sorted(zip.namelist()))
+
+    def _corrupt_last_member(self, content):
+        with zipfile.ZipFile(BytesIO(content)) as zip:
+            zinfo = zip.infolist()[-1]
+        # Corrupt the CRC of the last member in the central directory
+        content = bytearray(content)
+        position = content.rfind(b"PK\x01\x02")
+        content[position + 16:position + 20] = (zinfo.CRC ^ 0xFFFFFFFF).to_bytes(4, "little")
+        return bytes(content), zinfo.filename
+
+    def test_bad_crc_reported_before_package_checks(self):
+        # No metadata.txt and no metadata in __init__.py
+        content = BytesIO()
+        with zipfile.ZipFile(content, "w") as zip:
+            zip.writestr("bad_crc/__init__.py", "")
+            zip.writestr("bad_crc/data.txt", "data")
+        content, filename = self._corrupt_last_member(content.getvalue())
+
+        with self.assertRaisesMessage(
+            ValidationError, "Bad zip (maybe a CRC error) on file %s" % filename
+        ):
+            validator(self._package(content))
+
+    def test_no_metadata_in_init(self):
+        content = BytesIO()
+        with zipfile.ZipFile(content, "w") as zip:
+            zip.writestr("no_metadata/__init__.py", "import os\n")
+
+        with self.assertRaisesMessage(
+            ValidationError, "Cannot find valid metadata in no_metadata/__init__.py"
+        ):
+            validator(self._package(content.getvalue()))
+
+    def test_bad_crc(self):
+        content, filename = self._corrupt_last_member(self.content)
+
+        with self.assertRaisesMessage(
+            ValidationError, "Bad zip (maybe a CRC error) on file %s" % filename
+        ):
+            validator(self._package(content))
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Stub website: /ok, /missing, /slow, /redirect and /redirect-missing"""
+
+    requests = []
+
+    def do_HEAD(self):
+        self.requests.append(self.path)
+        if self.path.startswith("/slow"):
+            time.sleep(2)
+        if self.path.startswith("/redirect"):
+            self.send_response(302)
+            self.send_header("Location", "/ok" if self.path == "/redirect" else "/missing")
+        else:
+            self.send_response(404 if self.path.startswith("/missing") else 200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+URL_CHECK_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"},
+    "url_checks": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "test-url-checks",
+    },
+}
+
+
+@override_settings(CACHES=URL_CHECK_CACHES)
+@mock.patch("plugins.validator.URL_CHECK_CACHE", "url_checks")
+@mock.patch("plugins.validator.PLUGIN_URL_CHECK_TIMEOUT", 0.5)
+class TestCheckUrlLink(TestCase):
+    """Test the metadata urls checks against a local stub server"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        cls.server.daemon_threads = True
+        cls.server_thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.server_thread.start()
+        cls.base_url = "http://127.0.0.1:%s" % cls.server.server_port
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        StubHandler.requests = []
+        caches["url_checks"].clear()
+
+    def _urls(self, tracker, repository="/ok", homepage="/ok"):
+        return [
+            {'url': self.base_url + tracker, 'forbidden_url': "http://bugs", 'metadata_attr': "tracker"},
+            {'url': self.base_url + repository, 'forbidden_url': "http://repo", 'metadata_attr': "repository"},
+            {'url': self.base_url + homepage, 'forbidden_url': "http://homepage", 'metadata_attr': "homepage"},
+        ]
+
+    def test_reachable(self):
+        self.assertIsNone(_check_url_link(self._urls("/ok", "/redirect")))
+
+    def test_failing(self):
+        with self.assertRaisesMessage(ValidationError, "<strong>tracker, homepage</strong>"):
+            _check_url_link(self._urls("/missing", "/ok", "/missing?2"))
+
+    def test_redirects_not_followed(self):
+        # Any redirect is accepted, as before the concurrent checks
+        self.assertIsNone(_check_url_link(self._urls("/redirect-missing")))
+        self.assertEqual(sorted(StubHandler.requests), ["/ok", "/redirect-missing"])
+
+    def test_slow(self):
+        start = time.perf_counter()
+        with self.assertRaisesMessage(ValidationError, "<strong>tracker, repository, homepage</strong>"):
+            _check_url_link(self._urls("/slow", "/slow?2", "/slow?3"))
+        # Concurrent and bound by the timeout
+        self.assertLess(time.perf_counter() - start, 1.5)
+
+    def test_reachable_urls_are_cached(self):
+        urls = self._urls("/ok", "/redirect", "/missing")
+        for _ in range(2):
+            with self.assertRaises(ValidationError):
+                _check_url_link(urls)
+
+        # Only the unreachable url is checked again
+        self.assertEqual(
+            sorted(StubHandler.requests),
+            ["/missing", "/missing", "/ok", "/redirect"],
+        )
+
+    def test_not_cached_without_cache(self):
+        with mock.patch("plugins.validator.URL_CHECK_CACHE", None):
+            for _ in range(2):
+                _check_url_link(self._urls("/ok"))
+
+        self.assertEqual(StubHandler.requests, ["/ok", "/ok"])
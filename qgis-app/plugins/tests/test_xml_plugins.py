@@ -0,0 +1,270 @@
+import re
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from plugins.models import Plugin, PluginVersion
+from plugins.xml_feed import (
+    build_feed_request,
+    get_compatible_plugin_versions,
+    iter_compatible_plugin_versions,
+    iter_plugins_xml,
+    normalize_qgis_version,
+    render_plugins_xml,
+)
+
+
+class TestCompatiblePluginVersions(TestCase):
+    """Test the plugins.xml versions resolver"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="xml_user", password="12345")
+        self.superuser = User.objects.create_superuser(
+            username="xml_admin", password="12345", email="admin@example.com"
+        )
+
+    def _create_plugin(self, name, created_by=None):
+        plugin = Plugin.objects.create(
+            name=name,
+            package_name=name.lower(),
+            created_by=created_by or self.user,
+            author="Author",
+            email="author@example.com",
+            description="%s description" % name,
+        )
+        plugin.tags.set(["%s_tag" % name.lower(), "xml"])
+        return plugin
+
+    def _create_version(
+        self,
+        plugin,
+        version,
+        experimental=False,
+        min_qg_version="3.0.0",
+        max_qg_version="3.99.0",
+        approved=True,
+    ):
+        return PluginVersion.objects.create(
+            plugin=plugin,
+            version=version,
+            created_by=self.user,
+            package=SimpleUploadedFile("%s.zip" % plugin.package_name, b"content"),
+            min_qg_version=min_qg_version,
+            max_qg_version=max_qg_version,
+            experimental=experimental,
+            approved=approved,
+        )
+
+    def _create_plugins(self, count):
+        for i in range(count):
+            plugin = self._create_plugin("Plugin%s" % i)
+            self._create_version(plugin, "1.0.0")
+            self._create_version(plugin, "1.1.0")
+            self._create_version(plugin, "2.0.0", experimental=True)
+
+    def _count_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            object_list = get_compatible_plugin_versions(normalize_qgis_version("3.24"))
+            render_plugins_xml(object_list, None)
+        return len(context.captured_queries)
+
+    def test_latest_stable_and_experimental_versions(self):
+        plugin = self._create_plugin("Alpha", created_by=self.superuser)
+        self._create_version(plugin, "1.0.0")
+        self._create_version(plugin, "1.2.0")
+        self._create_version(plugin, "1.3.0", approved=False)
+        self._create_version(plugin, "1.4.0", min_qg_version="3.30.0")
+        self._create_version(plugin, "2.0.0", experimental=True)
+        other_plugin = self._create_plugin("Beta")
+        self._create_version(other_plugin, "0.1.0")
+
+        object_list = get_compatible_plugin_versions(normalize_qgis_version("3.24"))
+
+        self.assertEqual(
+            [
+                (v.plugin.name, v.version, v.experimental, v.is_trusted)
+                for v in object_list
+            ],
+            [
+                ("Alpha", "1.2.0", False, True),
+                ("Alpha", "2.0.0", True, True),
+                ("Beta", "0.1.0", False, False),
+            ],
+        )
+
+    def test_new_feed_trusted_uploader_and_order(self):
+        plugin = self._create_plugin("Beta")
+        self._create_version(plugin, "1.0.0")
+        self._create_version(plugin, "2.0.0", experimental=True)
+        # Created by a trusted user, uploaded by an untrusted one
+        other_plugin = self._create_plugin("Alpha", created_by=self.superuser)
+        self._create_version(other_plugin, "0.1.0")
+        trusted_version = self._create_version(other_plugin, "0.2.0", experimental=True)
+        trusted_version.created_by = self.superuser
+        trusted_version.save()
+
+        object_list = get_compatible_plugin_versions(
+            normalize_qgis_version("3.24"), new_feed=True
+        )
+
+        self.assertEqual(
+            [
+                (v.plugin.name, v.version, v.experimental, v.is_trusted)
+                for v in object_list
+            ],
+            [
+                ("Beta", "1.0.0", False, False),
+                ("Alpha", "0.1.0", False, False),
+                ("Beta", "2.0.0", True, False),
+                ("Alpha", "0.2.0", True, True),
+            ],
+        )
+
+    def test_stable_only(self):
+        plugin = self._create_plugin("Alpha")
+        self._create_version(plugin, "1.0.0")
+        self._create_version(plugin, "2.0.0", experimental=True)
+
+        object_list = get_compatible_plugin_versions(
+            normalize_qgis_version("3.24"), stable_only="1"
+        )
+
+        self.assertEqual([v.version for v in object_list], ["1.0.0"])
+
+    def test_query_count_does_not_depend_on_plugins_count(self):
+        self._create_plugins(2)
+        queries_count = self._count_queries()
+        for i in range(2, 10):
+            plugin = self._create_plugin("Plugin%s" % i)
+            self._create_version(plugin, "1.0.0")
+            self._create_version(plugin, "2.0.0", experimental=True)
+
+        self.assertEqual(self._count_queries(), queries_count)
+        # Versions with plugins and creators, then tags
+        self.assertLessEqual(queries_count, 2)
+
+
+class TestStreamingPluginsXML(TestCase):
+    """Test the plugins.xml streaming serializer"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="xml_user", password="12345")
+        special = Plugin.objects.create(
+            name='Special & "Quoted" <Plugin>',
+            package_name="special_plugin",
+            created_by=self.user,
+            author="",
+            email="author@example.com",
+            description="Uses <b>tags</b> & entities",
+            about="About ]]> & more",
+            homepage="https://example.com/?a=1&b=2",
+            tracker="https://example.com/issues",
+            repository=None,
+            server=True,
+        )
+        special.tags.set(["a&b", "vector"])
+        PluginVersion.objects.create(
+            plugin=special,
+            version="1.0.0",
+            created_by=None,
+            package=SimpleUploadedFile("special_plugin.zip", b"content"),
+            min_qg_version="3.0.0",
+            max_qg_version="3.99.0",
+        )
+        PluginVersion.objects.create(
+            plugin=special,
+            version="2.0.0",
+            created_by=self.user,
+            package=SimpleUploadedFile("special_plugin.zip", b"content"),
+            min_qg_version="3.0.0",
+            max_qg_version="3.99.0",
+            experimental=True,
+        )
+        plain = Plugin.objects.create(
+            name="Plain",
+            package_name="plain_plugin",
+            created_by=self.user,
+            author="Plain author",
+            email="author@example.com",
+            description="Plain description",
+        )
+        PluginVersion.objects.create(
+            plugin=plain,
+            version="0.1",
+            created_by=self.user,
+            package=SimpleUploadedFile("plain_plugin.zip", b"content"),
+            min_qg_version="3.10.0",
+            max_qg_version="3.99.0",
+        )
+
+    def _assert_same_output(self, object_list, request):
+        self.assertEqual(
+            "".join(iter_plugins_xml(object_list, request)).encode("utf-8"),
+            render_plugins_xml(object_list, request).encode("utf-8"),
+        )
+
+    def test_identical_to_template(self):
+        qg_version = normalize_qgis_version("3.24")
+        self._assert_same_output(
+            get_compatible_plugin_versions(qg_version),
+            build_feed_request("https://plugins.example.com"),
+        )
+        self._assert_same_output(
+            list(iter_compatible_plugin_versions(qg_version)),
+            build_feed_request("http://plugins.example.com"),
+        )
+        self._assert_same_output(get_compatible_plugin_versions(qg_version), None)
+
+    def test_identical_to_template_without_plugins(self):
+        self._assert_same_output([], build_feed_request("http://plugins.example.com"))
+
+    def test_streaming_views(self):
+        for url_name in ("xml_plugins", "xml_plugins_new"):
+            response = self.client.get(reverse(url_name), {"qgis": "3.24"})
+
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.streaming)
+            self.assertEqual(response["Content-Type"], "text/xml")
+            content = b"".join(response.streaming_content).decode("utf-8")
+            self.assertIn('<pyqgis_plugin name="Plain" version="0.1"', content)
+            self.assertTrue(content.endswith("</pyqgis_plugin>\n</plugins>\n"))
+
+    def test_feeds_list_same_versions(self):
+        listed = []
+        for url_name in ("xml_plugins", "xml_plugins_new"):
+            for stable_only in ("0", "1"):
+                response = self.client.get(
+                    reverse(url_name), {"qgis": "3.24", "stable_only": stable_only}
+                )
+                content = b"".join(response.streaming_content).decode("utf-8")
+                listed.append(
+                    sorted(
+                        re.findall(
+                            r'<pyqgis_plugin name="(.*?)" version="(.*?)"', content
+                        )
+                    )
+                )
+        # Both feeds with and without the experimental versions
+        self.assertEqual(listed[0], listed[2])
+        self.assertEqual(listed[1], listed[3])
+        self.assertIn(("Plain", "0.1"), listed[1])
+        self.assertEqual(len(listed[0]), 3)
+        self.assertEqual(len(listed[1]), 2)
+
+    def test_trusted_uploader_in_new_feed(self):
+        superuser = User.objects.create_superuser(
+            username="xml_admin", password="12345", email="admin@example.com"
+        )
+        PluginVersion.objects.filter(version="0.1").update(created_by=superuser)
+        trusted = {}
+        for url_name in ("xml_plugins", "xml_plugins_new"):
+            response = self.client.get(reverse(url_name), {"qgis": "3.24"})
+            content = b"".join(response.streaming_content).decode("utf-8")
+            trusted[url_name] = re.findall(r"<trusted>(.*?)</trusted>", content)
+        # The plugin creator in plugins.xml, the version uploader in
+        # plugins_new.xml (stable versions first)
+        self.assertEqual(trusted["xml_plugins"], ["False", "False", "False"])
+        self.assertEqual(trusted["xml_plugins_new"], ["False", "True", "False"])
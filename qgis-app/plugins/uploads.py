@@ -0,0 +1,139 @@
+"""
+Chunked and resumable uploads of the plugin packages.
+
+An upload is started with the size and the SHA-256 digest of the
+package. The chunks are written to a temporary file at the offset given
+by the client: after a dropped connection, the client asks for the
+current offset and sends the rest of the package. Once the file has the
+expected size and digest, it is given to the validator and the version
+creation like an uploaded package.
+
+The chunks are copied in blocks, the memory used by an upload is
+bounded by READ_BLOCK_SIZE whatever the size of the package.
+"""
+import datetime
+import hashlib
+import os
+import re
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.utils.translation import gettext_lazy as _
+from plugins.models import PLUGIN_UPLOADS_DIR, PluginUpload
+from plugins.validator import PLUGIN_MAX_UPLOAD_SIZE
+
+PLUGIN_UPLOAD_CHUNK_SIZE = getattr(
+    settings, "PLUGIN_UPLOAD_CHUNK_SIZE", 5 * 1024 * 1024
+)
+# Unfinished uploads are removed after this delay
+PLUGIN_UPLOAD_EXPIRATION_HOURS = getattr(settings, "PLUGIN_UPLOAD_EXPIRATION_HOURS", 24)
+READ_BLOCK_SIZE = 64 * 1024
+
+SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+class UploadError(Exception):
+    """
+    The chunk or the upload is refused, the message is sent to the client
+    """
+
+
+def start_upload(size, sha256, **kwargs):
+    """
+    Creates an upload of size bytes, the other arguments are the
+    PluginUpload fields (plugin, token or created_by)
+    """
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        raise UploadError(_("The package size is required."))
+    if not 0 < size <= PLUGIN_MAX_UPLOAD_SIZE:
+        raise UploadError(
+            _("File is too big. Max size is %s Megabytes")
+            % (PLUGIN_MAX_UPLOAD_SIZE / 1000000)
+        )
+    sha256 = str(sha256 or "").lower()
+    if not SHA256_RE.match(sha256):
+        raise UploadError(_("The SHA-256 digest of the package is required."))
+    upload = PluginUpload.objects.create(size=size, sha256=sha256, **kwargs)
+    os.makedirs(PLUGIN_UPLOADS_DIR, exist_ok=True)
+    open(upload.path, "wb").close()
+    return upload
+
+
+def get_upload_offset(upload):
+    """
+    Returns the number of bytes received
+    """
+    try:
+        return os.path.getsize(upload.path)
+    except FileNotFoundError:
+        raise UploadError(_("This upload has expired."))
+
+
+def write_chunk(upload, offset, stream, length):
+    """
+    Writes the chunk of length bytes read from stream at offset, which
+    must not be after the received bytes (a chunk can be sent again).
+    Returns the new offset, smaller than offset + length if the stream
+    ended early.
+    """
+    try:
+        offset, length = int(offset), int(length)
+    except (TypeError, ValueError):
+        raise UploadError(_("The chunk offset and length are required."))
+    if length > PLUGIN_UPLOAD_CHUNK_SIZE:
+        raise UploadError(
+            _("The chunk is too big. Max size is %s bytes") % PLUGIN_UPLOAD_CHUNK_SIZE
+        )
+    received = get_upload_offset(upload)
+    if not 0 <= offset <= received:
+        raise UploadError(_("The next chunk offset is %s.") % received)
+    if offset + length > upload.size:
+        raise UploadError(_("The chunk exceeds the package size."))
+    with open(upload.path, "r+b") as file:
+        file.seek(offset)
+        remaining = length
+        while remaining:
+            block = stream.read(min(READ_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            file.write(block)
+            remaining -= len(block)
+        file.truncate()
+        return file.tell()
+
+
+def finish_upload(upload):
+    """
+    Checks the size and the digest of the received package and returns
+    it as an uploaded file, to be closed by the caller
+    """
+    if get_upload_offset(upload) != upload.size:
+        raise UploadError(_("The package is incomplete."))
+    digest = hashlib.sha256()
+    with open(upload.path, "rb") as file:
+        for block in iter(lambda: file.read(READ_BLOCK_SIZE), b""):
+            digest.update(block)
+    if digest.hexdigest() != upload.sha256:
+        raise UploadError(_("The package SHA-256 digest does not match."))
+    return UploadedFile(
+        open(upload.path, "rb"),
+        name="package.zip",
+        content_type="application/zip",
+        size=upload.size,
+    )
+
+
+def remove_expired_uploads():
+    """
+    Removes the unfinished uploads started more than
+    PLUGIN_UPLOAD_EXPIRATION_HOURS ago, returns their number
+    """
+    expired = datetime.datetime.now() - datetime.timedelta(
+        hours=PLUGIN_UPLOAD_EXPIRATION_HOURS
+    )
+    uploads = list(PluginUpload.objects.filter(created_on__lt=expired))
+    for upload in uploads:
+        upload.delete()
+    return len(uploads)
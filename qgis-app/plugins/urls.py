@@ -25,6 +25,7 @@ urlpatterns = [
     ),
     url(r"^tags/(?P<tags>[^\/]+)/$", TagsPluginsList.as_view(), name="tags_plugins"),
     url(r"^add/$", plugin_upload, {}, name="plugin_upload"),
+    url(r"^geoip/stats/$", geoip_stats, {}, name="geoip_stats"),
     url(r"^user/(?P<username>\w+)/block/$", user_block, {}, name="user_block"),
     url(r"^user/(?P<username>\w+)/unblock/$", user_unblock, {}, name="user_unblock"),
     url(r"^user/(?P<username>\w+)/trust/$", user_trust, {}, name="user_trust"),
@@ -120,8 +121,13 @@ urlpatterns = [
     url(
         r"^unapproved/$",
         PluginsList.as_view(
-            queryset=Plugin.unapproved_objects.all().order_by("-latest_version_date"),
-            additional_context={"title": _("Unapproved plugins")},
+            queryset=Plugin.unapproved_objects.all().order_by(
+                "-latest_any_version_date"
+            ),
+            additional_context={
+                "title": _("Unapproved plugins"),
+                "show_latest_any_version_date": True,
+            },
         ),
         name="unapproved_plugins",
     ),
@@ -208,21 +214,30 @@ urlpatterns = [
     url(
         r"^feedback_completed/$",
         FeedbackCompletedPluginsList.as_view(
-            additional_context={"title": _("Reviewed Plugins (Resolved)")}
+            additional_context={
+                "title": _("Reviewed Plugins (Resolved)"),
+                "show_latest_any_version_date": True,
+            }
         ),
         name="feedback_completed_plugins",
     ),
     url(
         r"^feedback_pending/$",
         FeedbackPendingPluginsList.as_view(
-            additional_context={"title": _("Awaiting review")}
+            additional_context={
+                "title": _("Awaiting review"),
+                "show_latest_any_version_date": True,
+            }
         ),
         name="feedback_pending_plugins",
     ),
     url(
         r"^feedback_received/$",
         FeedbackReceivedPluginsList.as_view(
-            additional_context={"title": _("Reviewed Plugins (Pending)")}
+            additional_context={
+                "title": _("Reviewed Plugins (Pending)"),
+                "show_latest_any_version_date": True,
+            }
         ),
         name="feedback_received_plugins",
     ),
@@ -265,6 +280,24 @@ urlpatterns += [
         {},
         name="version_create_api",
     ),
+    url(
+        r"^api/(?P<package_name>[A-Za-z][A-Za-z0-9-_]+)/version/upload/$",
+        version_upload_start_api,
+        {},
+        name="version_upload_start_api",
+    ),
+    url(
+        r"^api/(?P<package_name>[A-Za-z][A-Za-z0-9-_]+)/version/upload/(?P<upload_id>[0-9a-f-]{36})/$",
+        version_upload_api,
+        {},
+        name="version_upload_api",
+    ),
+    url(
+        r"^api/(?P<package_name>[A-Za-z][A-Za-z0-9-_]+)/version/upload/(?P<upload_id>[0-9a-f-]{36})/finish/$",
+        version_upload_finish_api,
+        {},
+        name="version_upload_finish_api",
+    ),
     url(
         r"^(?P<package_name>[A-Za-z][A-Za-z0-9-_]+)/version/(?P<version>[^\/]+)/$",
         version_detail,
@@ -4,15 +4,20 @@ Plugin validator class
 """
 import codecs
 import configparser
+import hashlib
 import mimetypes
 import os
 import re
+import threading
 import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 from io import StringIO
 from urllib.parse import urlparse
 
 import requests
 from django.conf import settings
+from django.core.cache import caches
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.forms import ValidationError
 from django.utils.translation import gettext_lazy as _
@@ -51,6 +56,27 @@ PLUGIN_OPTIONAL_METADATA = getattr(
 PLUGIN_BOOLEAN_METADATA = getattr(
     settings, "PLUGIN_BOOLEAN_METADATA", ("experimental", "deprecated", "server")
 )
+# Maximum duration of the metadata url checks, in seconds
+PLUGIN_URL_CHECK_TIMEOUT = getattr(settings, "PLUGIN_URL_CHECK_TIMEOUT", 5)
+# Name of the cache in CACHES keeping the reachable urls, which are not
+# checked again during PLUGIN_URL_CHECK_CACHE_TIMEOUT seconds. None
+# checks them on every upload.
+URL_CHECK_CACHE = getattr(settings, "URL_CHECK_CACHE", None)
+PLUGIN_URL_CHECK_CACHE_TIMEOUT = getattr(
+    settings, "PLUGIN_URL_CHECK_CACHE_TIMEOUT", 24 * 60 * 60
+)
+
+# https://stackoverflow.com/a/41950438/10268058
+# add the headers parameter to make the request appears like coming
+# from browser, otherwise some websites will return 403
+URL_CHECK_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 6.1; WOW64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/56.0.2924.76 Safari/537.36"
+}
+
+_url_check_session = None
+_url_check_session_lock = threading.Lock()
 
 
 def _read_from_init(initcontent, initname):
@@ -96,6 +122,71 @@ def _check_required_metadata(metadata):
             )
         )
 
+def _get_url_check_session():
+    """
+    Returns the HTTP session shared by the url checks
+    """
+    global _url_check_session
+    if _url_check_session is None:
+        with _url_check_session_lock:
+            if _url_check_session is None:
+                session = requests.Session()
+                session.headers.update(URL_CHECK_HEADERS)
+                _url_check_session = session
+    return _url_check_session
+
+
+def _get_url_check_cache_key(url):
+    return "plugin_url_check:%s" % hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+
+def _is_url_reachable(url: str) -> bool:
+    """
+    Returns True if the url answers with a status < 400, the redirects
+    are not followed
+    """
+    session = _get_url_check_session()
+    try:
+        try:
+            response = session.head(
+                url, timeout=PLUGIN_URL_CHECK_TIMEOUT, allow_redirects=False
+            )
+        except requests.exceptions.SSLError:
+            response = session.head(
+                url, timeout=PLUGIN_URL_CHECK_TIMEOUT, allow_redirects=False, verify=False
+            )
+    except Exception:
+        return False
+    return response.status_code < 400
+
+
+def _check_urls_reachable(urls):
+    """
+    Returns a dict of url: reachable. The urls are checked concurrently,
+    each one with a PLUGIN_URL_CHECK_TIMEOUT seconds timeout, and the
+    reachable ones are kept in the URL_CHECK_CACHE for
+    PLUGIN_URL_CHECK_CACHE_TIMEOUT seconds.
+    """
+    cache = caches[URL_CHECK_CACHE] if URL_CHECK_CACHE else None
+    cache_keys = {url: _get_url_check_cache_key(url) for url in urls}
+    cached = cache.get_many(list(cache_keys.values())) if cache is not None else {}
+    reachable = {url: True for url, key in cache_keys.items() if key in cached}
+    to_check = [url for url in cache_keys if url not in reachable]
+    if not to_check:
+        return reachable
+
+    # Waits for every check, each one bound by the timeout
+    with ThreadPoolExecutor(max_workers=len(to_check)) as executor:
+        reachable.update(zip(to_check, executor.map(_is_url_reachable, to_check)))
+
+    if cache is not None:
+        cache.set_many(
+            {cache_keys[url]: True for url in to_check if reachable[url]},
+            PLUGIN_URL_CHECK_CACHE_TIMEOUT,
+        )
+    return reachable
+
+
 def _check_url_link(urls):
     """
     Checks if all the url link is valid.
@@ -114,31 +205,14 @@ def _check_url_link(urls):
             print(f"Error occurred: {e}")
             return True
 
-    def error_check_if_exist(url: str)->bool:
-        # Check if url is exist
-        try:
-            # https://stackoverflow.com/a/41950438/10268058
-            # add the headers parameter to make the request appears like coming
-            # from browser, otherwise some websites will return 403
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 6.1; WOW64) "
-                "AppleWebKit/537.36 (KHTML, like Gecko) "
-                "Chrome/56.0.2924.76 Safari/537.36"
-            }
-            req = requests.head(url, headers=headers)
-        except requests.exceptions.SSLError:
-            req = requests.head(url, verify=False)
-        except Exception:
-            return True
-        return req.status_code >= 400
-
     url_error = [item for item in [url_item['metadata_attr'] for url_item in urls if error_check(url_item['url'], url_item['forbidden_url'])]]
     if len(url_error) > 0:
         url_error_str = ", ".join(url_error)
         raise ValidationError(
         _(f"Please provide valid url link for the following key(s) in the metadata source: <strong>{url_error_str}</strong>. ")
     )
-    exist_url_error = [item for item in [url_item['metadata_attr'] for url_item in urls if error_check_if_exist(url_item['url'])]]
+    reachable = _check_urls_reachable({url_item['url'] for url_item in urls})
+    exist_url_error = [url_item['metadata_attr'] for url_item in urls if not reachable[url_item['url']]]
     if len(exist_url_error) > 0:
         exist_url_error_str = ", ".join(exist_url_error)
         raise ValidationError(
@@ -149,6 +223,60 @@ def _check_url_link(urls):
     )
 
 
+ZIP_READ_CHUNK_SIZE = 1024 * 1024
+
+FORBIDDEN_DIRS = ("__MACOSX", ".git", "__pycache__")
+
+
+def _check_member_name(zname):
+    """
+    Security checks on the name of a zip member, raise ValidationError
+    """
+    if zname.find("..") != -1 or zname.find(os.path.sep) == 0:
+        raise ValidationError(
+            _("For security reasons, zip file cannot contain path "
+              "information (found '{}')".format(zname))
+        )
+    if zname.find(".pyc") != -1:
+        raise ValidationError(
+            _("For security reasons, zip file cannot contain .pyc file")
+        )
+    dir_name_list = zname.split("/")
+    for forbidden_dir in FORBIDDEN_DIRS:
+        if forbidden_dir in dir_name_list:
+            if forbidden_dir == dir_name_list[0]:
+                raise ValidationError(
+                    _(
+                        "For security reasons, zip file "
+                        "cannot contain <strong> '%s' </strong> directory. However, there is one present at the root of the archive." % (forbidden_dir,)
+                    )
+                )
+            raise ValidationError(
+                _(
+                    "For security reasons, zip file "
+                    "cannot contain <strong> '%s' </strong> directory. However, it has been found at <strong> '%s' </strong>." % (forbidden_dir, zname)
+                )
+            )
+
+
+def _read_member(zip, zinfo, keep=True):
+    """
+    Decompresses a zip member, which also checks its CRC, raise
+    ValidationError. Returns its content if keep is True.
+    """
+    try:
+        with zip.open(zinfo) as member:
+            if keep:
+                return member.read()
+            while member.read(ZIP_READ_CHUNK_SIZE):
+                pass
+    except (zipfile.BadZipFile, zlib.error, EOFError):
+        raise ValidationError(
+            _("Bad zip (maybe a CRC error) on file %s") % zinfo.filename
+        )
+    return None
+
+
 def validator(package, is_new: bool = False):
     """
     Analyzes a zipped file, returns metadata if success, False otherwise.
@@ -163,6 +291,10 @@ def validator(package, is_new: bool = False):
         * package_name regexp: [A-Za-z][A-Za-z0-9-_]+
         * author regexp: [^/]+
 
+    The zip members are listed once, for the security checks and the
+    package structure, and decompressed once for the CRC check, before
+    the package checks: the metadata sources are kept, only the icon is
+    decompressed again.
     """
     try:
         if package.size > PLUGIN_MAX_UPLOAD_SIZE:
@@ -181,62 +313,45 @@ def validator(package, is_new: bool = False):
         zip = zipfile.ZipFile(package)
     except:
         raise ValidationError(_("Could not unzip file."))
-    for zname in zip.namelist():
-        if zname.find("..") != -1 or zname.find(os.path.sep) == 0:
-            raise ValidationError(
-                _("For security reasons, zip file cannot contain path "
-                  "information (found '{}')".format(zname))
-            )
-        if zname.find(".pyc") != -1:
-            raise ValidationError(
-                _("For security reasons, zip file cannot contain .pyc file")
-            )
-        for forbidden_dir in ["__MACOSX", ".git", "__pycache__"]:
-            dir_name_list = zname.split("/")
-            if forbidden_dir in dir_name_list:
-                if forbidden_dir == dir_name_list[0]:
-                    raise ValidationError(
-                        _(
-                            "For security reasons, zip file "
-                            "cannot contain <strong> '%s' </strong> directory. However, there is one present at the root of the archive." % (forbidden_dir,)
-                        )
-                    )
-                raise ValidationError(
-                    _(
-                        "For security reasons, zip file "
-                        "cannot contain <strong> '%s' </strong> directory. However, it has been found at <strong> '%s' </strong>." % (forbidden_dir, zname)
-                    )
-                )
-    bad_file = zip.testzip()
-    if bad_file:
-        zip.close()
-        del zip
-        try:
-            raise ValidationError(
-                _("Bad zip (maybe a CRC error) on file %s") % bad_file
-            )
-        except UnicodeDecodeError:
-            raise ValidationError(
-                _("Bad zip (maybe unicode filename) on file %s") % bad_file,
-                errors="replace",
-            )
 
-    # Metadata list, also usefull to pass warnings to the main view 
+    # Single pass over the zip entries: security checks, parent folders
+    # and members by name
+    infolist = zip.infolist()
+    members = {}
+    parent_folders = []
+    for zinfo in infolist:
+        zname = zinfo.filename
+        _check_member_name(zname)
+        members[zname] = zinfo
+        parent_folder = zname.split("/")[0]
+        if parent_folder not in parent_folders:
+            parent_folders.append(parent_folder)
+
+    # CRC check of every member, decompressed once: the metadata sources
+    # of the top level directories are kept
+    contents = {}
+    for zinfo in infolist:
+        zname = zinfo.filename
+        keep = members[zname] is zinfo and (
+            zname.count("/") == 1
+            and zname.endswith(("/metadata.txt", "/__init__.py"))
+        )
+        content = _read_member(zip, zinfo, keep=keep)
+        if keep:
+            contents[zname] = content
+
+    # Metadata list, also usefull to pass warnings to the main view
     metadata = []
 
-    namelist = zip.namelist()
     # Check if the zip file contains multiple parent folders
     # If it is, show a warning for now
-    try:
-        parent_folders = list(set([str(name).split('/')[0] for name in namelist]))
-        if len(parent_folders) > 1:
-            metadata.append(("multiple_parent_folders", ', '.join(parent_folders)))
-    except:
-        pass
+    if len(parent_folders) > 1:
+        metadata.append(("multiple_parent_folders", ", ".join(parent_folders)))
 
     # Checks that package_name  exists
     try:
-        package_name = namelist[0][: namelist[0].index("/")]
+        first_name = infolist[0].filename
+        package_name = first_name[: first_name.index("/")]
     except:
         raise ValidationError(
             _(
@@ -252,12 +367,9 @@ def validator(package, is_new: bool = False):
             )
         )
 
-    # Cuts the trailing slash
-    if package_name.endswith("/"):
-        package_name = package_name[:-1]
     initname = package_name + "/__init__.py"
     metadataname = package_name + "/metadata.txt"
-    if initname not in namelist and metadataname not in namelist:
+    if initname not in members and metadataname not in members:
         raise ValidationError(
             _(
                 "Cannot find __init__.py or metadata.txt in the compressed package: this does not seems a valid plugin (I searched for %s and %s)"
@@ -266,15 +378,21 @@ def validator(package, is_new: bool = False):
         )
 
     # Checks for __init__.py presence
-    if initname not in namelist:
+    if initname not in members:
         raise ValidationError(_("Cannot find __init__.py in plugin package."))
 
+    def read(zname):
+        if zname not in contents:
+            contents[zname] = _read_member(zip, members[zname])
+        return contents[zname]
+
     # First parse metadata.txt
-    if metadataname in namelist:
+    if metadataname in members:
+        metadatacontent = read(metadataname)
         try:
             parser = configparser.ConfigParser()
             parser.optionxform = str
-            parser.read_file(StringIO(codecs.decode(zip.read(metadataname), "utf8")))
+            parser.read_file(StringIO(codecs.decode(metadatacontent, "utf8")))
             if not parser.has_section("general"):
                 raise ValidationError(
                     _("Cannot find a section named 'general' in %s") % metadataname
@@ -286,38 +404,35 @@ def validator(package, is_new: bool = False):
     else:
         # Then parse __init__
         # Ugly RE: regexp guru wanted!
-        initcontent = zip.read(initname).decode("utf8")
+        initcontent = read(initname).decode("utf8")
         metadata.extend(_read_from_init(initcontent, initname))
         if not metadata:
             raise ValidationError(_("Cannot find valid metadata in %s") % initname)
         metadata.append(("metadata_source", "__init__.py"))
 
     _check_required_metadata(metadata)
+    metadata_dict = dict(metadata)
+
+    # Locate the icon, strip leading dir for ccrook plugins
+    icon = metadata_dict.get("icon")
+    icon_name = None
+    if isinstance(icon, str):
+        icon_name = package_name + "/" + (icon[2:] if icon.startswith("./") else icon)
 
     # Process Icon
-    try:
-        # Strip leading dir for ccrook plugins
-        if dict(metadata)["icon"].startswith("./"):
-            icon_path = dict(metadata)["icon"][2:]
-        else:
-            icon_path = dict(metadata)["icon"]
-        icon = zip.read(package_name + "/" + icon_path)
+    if icon_name in members:
         icon_file = SimpleUploadedFile(
-            dict(metadata)["icon"], icon, mimetypes.guess_type(dict(metadata)["icon"])
+            icon, read(icon_name), mimetypes.guess_type(icon)
         )
-    except:
+    else:
         icon_file = None
 
     metadata.append(("icon_file", icon_file))
 
     # Transforms booleans flags (experimental)
-    for flag in PLUGIN_BOOLEAN_METADATA:
-        if flag in dict(metadata):
-            metadata[metadata.index((flag, dict(metadata)[flag]))] = (
-                flag,
-                dict(metadata)[flag].lower() == "true"
-                or dict(metadata)[flag].lower() == "1",
-            )
+    for i, (k, v) in enumerate(metadata):
+        if k in PLUGIN_BOOLEAN_METADATA:
+            metadata[i] = (k, v.lower() == "true" or v.lower() == "1")
 
     # Adds package_name
     if not re.match(r"^[A-Za-z][A-Za-z0-9-_]+$", package_name):
@@ -330,13 +445,12 @@ def validator(package, is_new: bool = False):
 
     # Last temporary rule, check if mandatory metadata are also in __init__.py
     # fails if it is not
-    min_qgs_version = dict(metadata).get("qgisMinimumVersion")
-    dict(metadata).get("qgisMaximumVersion")
+    min_qgs_version = metadata_dict.get("qgisMinimumVersion")
     if (
         tuple(min_qgs_version.split(".")) < tuple("1.8".split("."))
-        and metadataname in namelist
+        and metadataname in members
     ):
-        initcontent = zip.read(initname).decode("utf8")
+        initcontent = read(initname).decode("utf8")
         try:
             initmetadata = _read_from_init(initcontent, initname)
             initmetadata.append(("metadata_source", "__init__.py"))
@@ -348,32 +462,33 @@ def validator(package, is_new: bool = False):
                 )
                 % (min_qgs_version, ",".join(e.messages))
             )
+
+    zip.close()
+    del zip
+
     # check url_link
     urls_to_check = [
-        {'url': dict(metadata).get("tracker"), 'forbidden_url': "http://bugs", 'metadata_attr': "tracker"},
-        {'url': dict(metadata).get("repository"), 'forbidden_url': "http://repo", 'metadata_attr': "repository"},
-        {'url': dict(metadata).get("homepage"), 'forbidden_url': "http://homepage", 'metadata_attr': "homepage"},
+        {'url': metadata_dict.get("tracker"), 'forbidden_url': "http://bugs", 'metadata_attr': "tracker"},
+        {'url': metadata_dict.get("repository"), 'forbidden_url': "http://repo", 'metadata_attr': "repository"},
+        {'url': metadata_dict.get("homepage"), 'forbidden_url': "http://homepage", 'metadata_attr': "homepage"},
     ]
 
     _check_url_link(urls_to_check)
 
 
     # Checks for LICENSE file presence
-    # Making it mandatory as of 03 June 2024 
+    # Making it mandatory as of 03 June 2024
     # according to https://github.com/qgis/QGIS-Enhancement-Proposals/issues/279
     licensename = package_name + "/LICENSE"
-    if licensename not in namelist:
+    if licensename not in members:
         raise ValidationError(_(
             "Cannot find LICENSE in the plugin package. "
             "This file is required, please consider adding it to the plugin package.")
         )
 
-    zip.close()
-    del zip
-
     # Check author
-    if "author" in dict(metadata):
-        if not re.match(r"^[^/]+$", dict(metadata)["author"]):
+    if "author" in metadata_dict:
+        if not re.match(r"^[^/]+$", metadata_dict["author"]):
             raise ValidationError(_("Author name cannot contain slashes."))
 
     # strip and check
@@ -16,9 +16,17 @@ from django.db import IntegrityError, connection
 from django.db.models import Max, Q
 from django.db.models.expressions import RawSQL
 from django.db.models.functions import Lower
-from django.http import Http404, HttpResponse, HttpResponseRedirect, JsonResponse
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseNotAllowed,
+    HttpResponseRedirect,
+    JsonResponse,
+    StreamingHttpResponse,
+)
 from django.shortcuts import get_object_or_404, render
 from django.urls import reverse
+from django.utils.datastructures import MultiValueDict
 from django.utils.timezone import now
 from django.utils.decorators import method_decorator
 from django.utils.encoding import DjangoUnicodeDecodeError
@@ -31,12 +39,33 @@ from django.db import transaction
 
 # from sortable_listview import SortableListView
 from django.views.generic.list import ListView
+from lib.file_delivery import serve_file
 from plugins.decorators import has_valid_token
+from plugins.downloads import record_download
+from plugins.geoip import get_country
 from plugins.forms import *
-from plugins.models import Plugin, PluginOutstandingToken, PluginVersion, PluginVersionDownload, vjust
+from plugins.models import (
+    Plugin,
+    PluginOutstandingToken,
+    PluginUpload,
+    PluginVersion,
+    vjust,
+)
+from plugins.uploads import (
+    PLUGIN_UPLOAD_CHUNK_SIZE,
+    UploadError,
+    finish_upload,
+    get_upload_offset,
+    start_upload,
+    write_chunk,
+)
 from plugins.validator import PLUGIN_REQUIRED_METADATA
-from django.contrib.gis.geoip2 import GeoIP2
 from plugins.utils import parse_remote_addr, get_version_from_label
+from plugins.xml_feed import (
+    add_patch_version as _add_patch_version,
+    iter_compatible_plugin_versions,
+    iter_plugins_xml,
+)
 
 from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
 from rest_framework_simplejwt.tokens import RefreshToken, api_settings
@@ -51,7 +80,6 @@ except ImportError:
 
 # Decorator
 staff_required = user_passes_test(lambda u: u.is_staff)
-from plugins.tasks.generate_plugins_xml import generate_plugins_xml
 
 
 def send_mail_wrapper(subject, message, mail_from, recipients, fail_silently=True):
@@ -497,9 +525,6 @@ def plugin_upload(request):
                 msg = _("The Plugin has been successfully created.")
                 messages.success(request, msg, fail_silently=True)
 
-                # Update plugins cached xml
-                generate_plugins_xml.delay()
-
                 if not new_version.approved:
                     msg = _(
                         "Your plugin is awaiting approval from a staff member and will be approved as soon as possible."
@@ -874,14 +899,9 @@ class PluginsList(ListView):
             else:
                 _sort_by = sort_by
 
-            # Check if the sort criterion is a field or 'average_vote'
-            # or 'latest_version_date'
+            # Check if the sort criterion is a field
             try:
-                (
-                    _sort_by == "average_vote"
-                    or _sort_by == "latest_version_date"
-                    or self.model._meta.get_field(_sort_by)
-                )
+                self.model._meta.get_field(_sort_by)
             except FieldDoesNotExist:
                 return qs
             qs = qs.order_by(sort_by)
@@ -1012,7 +1032,7 @@ class FeedbackCompletedPluginsList(PluginsList):
     The plugins editor can only see their plugin feedbacks.
     The staff can see all plugin feedbacks.
     """
-    queryset = Plugin.feedback_completed_objects.all().order_by("-latest_version_date")
+    queryset = Plugin.feedback_completed_objects.all().order_by("-latest_any_version_date")
 
     def get_filtered_queryset(self, qs):
         user = get_object_or_404(User, username=self.request.user)
@@ -1026,7 +1046,7 @@ class FeedbackReceivedPluginsList(PluginsList):
     The plugins editor can only see their plugin feedbacks.
     The staff can see all plugin feedbacks.
     """
-    queryset = Plugin.feedback_received_objects.all().order_by("-latest_version_date")
+    queryset = Plugin.feedback_received_objects.all().order_by("-latest_any_version_date")
 
     def get_filtered_queryset(self, qs):
         user = get_object_or_404(User, username=self.request.user)
@@ -1039,7 +1059,7 @@ class FeedbackPendingPluginsList(PluginsList):
 
     Only staff can see plugin feedback list.
     """
-    queryset = Plugin.feedback_pending_objects.all().order_by("-latest_version_date")
+    queryset = Plugin.feedback_pending_objects.all().order_by("-latest_any_version_date")
 
     def get_filtered_queryset(self, qs):
         user = get_object_or_404(User, username=self.request.user)
@@ -1201,6 +1221,98 @@ def version_create_api(request, package_name):
     return _version_create(request, plugin, version)
 
 
+def _upload_error_response(error, status=400):
+    return JsonResponse({"error": str(error)}, status=status)
+
+
+@has_valid_token
+@csrf_exempt
+@require_POST
+def version_upload_start_api(request, package_name):
+    """
+    Starts a chunked upload of a new version package with a valid
+    token, the POST data has the package size and SHA-256 digest
+    """
+    plugin = get_object_or_404(Plugin, package_name=package_name)
+    try:
+        upload = start_upload(
+            request.POST.get("size"),
+            request.POST.get("sha256"),
+            plugin=plugin,
+            token_id=request.plugin_token.pk,
+        )
+    except UploadError as e:
+        return _upload_error_response(e)
+    return JsonResponse(
+        {
+            "upload_id": str(upload.pk),
+            "offset": 0,
+            "chunk_size": PLUGIN_UPLOAD_CHUNK_SIZE,
+            "url": reverse("version_upload_api", args=(package_name, upload.pk)),
+        },
+        status=201,
+    )
+
+
+@has_valid_token
+@csrf_exempt
+def version_upload_api(request, package_name, upload_id):
+    """
+    Chunked upload of a new version package with a valid token.
+
+    GET returns the offset of the next chunk (to resume an upload), PUT
+    writes the request body at the offset given in the query string.
+    """
+    upload = get_object_or_404(
+        PluginUpload, pk=upload_id, plugin__package_name=package_name
+    )
+    try:
+        if request.method == "PUT":
+            offset = write_chunk(
+                upload,
+                request.GET.get("offset"),
+                request,
+                request.META.get("CONTENT_LENGTH"),
+            )
+        elif request.method == "GET":
+            offset = get_upload_offset(upload)
+        else:
+            return HttpResponseNotAllowed(["GET", "PUT"])
+    except UploadError as e:
+        return _upload_error_response(e, status=409)
+    return JsonResponse({"offset": offset, "size": upload.size})
+
+
+@has_valid_token
+@csrf_exempt
+@require_POST
+def version_upload_finish_api(request, package_name, upload_id):
+    """
+    Checks the package of a chunked upload and creates the version like
+    version_create_api, the POST data has the other version fields
+    """
+    upload = get_object_or_404(
+        PluginUpload, pk=upload_id, plugin__package_name=package_name
+    )
+    try:
+        package = finish_upload(upload)
+    except UploadError as e:
+        return _upload_error_response(e)
+    try:
+        version = PluginVersion(
+            plugin=upload.plugin, is_from_token=True, token=request.plugin_token
+        )
+        return _version_create(
+            request,
+            upload.plugin,
+            version,
+            files=MultiValueDict({"package": [package]}),
+        )
+    finally:
+        package.close()
+        upload.delete()
+
+
 @login_required
 def version_create(request, package_name):
     plugin = get_object_or_404(Plugin, package_name=package_name)
@@ -1212,17 +1324,19 @@ def version_create(request, package_name):
     is_trusted=request.user.has_perm("plugins.can_approve")
     return _version_create(request, plugin, version, is_trusted=is_trusted)
 
-def _version_create(request, plugin, version, is_trusted=False):
+def _version_create(request, plugin, version, is_trusted=False, files=None):
     """
     The form will create versions according to permissions,
     plugin name and description are updated according to the info
     contained in the package metadata
+
+    files replaces the request files (package of a chunked upload)
     """
     if request.method == "POST":
 
         form = PluginVersionForm(
             request.POST,
-            request.FILES,
+            request.FILES if files is None else files,
             instance=version,
             is_trusted=is_trusted
         )
@@ -1571,53 +1685,29 @@ def version_download(request, package_name, version):
     """
     Update download counter(s)
     """
-    plugin = get_object_or_404(Plugin, package_name=package_name)
-    version = get_object_or_404(PluginVersion, plugin=plugin, version=version)
-    version.downloads = version.downloads + 1
-    version.save()
-    plugin = version.plugin
-    plugin.downloads = plugin.downloads + 1
-    plugin.save(keep_date=True)
+    version = get_object_or_404(
+        PluginVersion.objects.select_related("plugin"),
+        plugin__package_name=package_name,
+        version=version,
+    )
 
-    remote_addr = parse_remote_addr(request)
-    g = GeoIP2()
+    country_code, country_name = get_country(parse_remote_addr(request))
+    record_download(version, country_code, country_name)
 
-    if remote_addr:
-        try:
-            country_data = g.country(remote_addr)
-            country_code = country_data['country_code']
-            country_name = country_data['country_name']
-        except Exception as e:  # AddressNotFoundErrors:
-            country_code = 'N/D'
-            country_name = 'N/D'
-
-    # Handle null values
-    country_code = country_code or 'N/D'
-    country_name = country_name or 'N/D'
-
-    download_record, created = PluginVersionDownload.objects.get_or_create(
-        plugin_version = version, 
-        country_code = country_code,
-        country_name = country_name,
-        download_date = now().date(), 
-        defaults = {'download_count': 1}
-    )
-    if not created:
-        download_record.download_count = (
-            download_record.download_count + 1
-        )
-        download_record.save()
-
-    if not version.package.file.file.closed:
-        version.package.file.file.close()
-    zipfile = open(version.package.file.name, "rb")
-    file_content = zipfile.read()
-    response = HttpResponse(file_content, content_type="application/zip")
-    response["Content-Disposition"] = "attachment; filename=%s-%s.zip" % (
-        version.plugin.package_name,
-        version.version,
+    return serve_file(
+        request,
+        version.package.path,
+        "application/zip",
+        filename="%s-%s.zip" % (version.plugin.package_name, version.version),
     )
-    return response
+
+
+@staff_required
+def geoip_stats(request):
+    """
+    Returns the GeoIP cache statistics of the serving process
+    """
+    return JsonResponse(get_country.stats())
 
 
 def version_detail(request, package_name, version):
@@ -1635,29 +1725,12 @@ def version_detail(request, package_name, version):
 
 ###############################################
 
-from django.views.decorators.cache import cache_page
-
-
-def _add_patch_version(version: str, additional_patch: str ) -> str:
-    """To add patch number in version.
-
-    e.g qgis version = 3.16 we add patch number (99) in versioning -> 3.16.99
-    We use this versioning to query against PluginVersion min_qg_version,
-    so that the query result will include all PluginVersion with
-    minimum QGIS version 3.16 regardless of the patch number.
-    """
+from plugins.feed_cache import cache_feed, cached_xml_file, conditional_feed
 
-    if not version:
-        return version
-    separator = '.'
-    v = version.split(separator)
-    if len(v) == 2:
-        two_first_segment = separator.join(v[:2])
-        version = f'{two_first_segment}.{additional_patch}'
-    return version
 
-
-@cache_page(60 * 15)
+@cached_xml_file
+@conditional_feed
+@cache_feed
 def xml_plugins(request, qg_version=None, stable_only=None, package_name=None):
     """
     The XML file
@@ -1717,55 +1790,13 @@ def xml_plugins(request, qg_version=None, stable_only=None, package_name=None):
             pass
     else:
 
-        # Checked the cached plugins
-        qgis_version = request.GET.get("qgis", None)
-        qgis_filename = "plugins_{}.xml".format(qgis_version)
-        folder_name = os.path.join(settings.MEDIA_ROOT, "cached_xmls")
-        path_file = os.path.join(folder_name, qgis_filename)
-        if os.path.exists(path_file):
-            return HttpResponse(open(path_file).read(), content_type="application/xml")
-
-        trusted_users_ids = list(
-            zip(
-                *User.objects.filter(
-                    Q(
-                        user_permissions__codename="can_approve",
-                        user_permissions__content_type__app_label="plugins",
-                    )
-                    | Q(is_superuser=True)
-                )
-                .distinct()
-                .values_list("id")
-            )
-        )[0]
-        qs = Plugin.approved_objects.filter(**filters).annotate(
-            is_trusted=RawSQL(
-                "%s.created_by_id in (%s)"
-                % (
-                    Plugin._meta.db_table,
-                    (",").join([str(tu) for tu in trusted_users_ids]),
-                ),
-                (),
-            )
+        # The cached plugins files are served by cached_xml_file
+        return StreamingHttpResponse(
+            iter_plugins_xml(
+                iter_compatible_plugin_versions(qg_version, stable_only), request
+            ),
+            content_type="text/xml",
         )
-        for plugin in qs:
-            plugin_version_filters = copy.copy(version_filters)
-            plugin_version_filters.update({"plugin_id": plugin.pk})
-            try:
-                data = PluginVersion.stable_objects.filter(**plugin_version_filters)[0]
-                setattr(data, "is_trusted", plugin.is_trusted)
-                object_list.append(data)
-            except IndexError:
-                pass
-            if stable_only != "1":
-                try:
-                    data = PluginVersion.experimental_objects.filter(
-                        **plugin_version_filters
-                    )[0]
-                    setattr(data, "is_trusted", plugin.is_trusted)
-                    object_list.append(data)
-                except IndexError:
-                    pass
 
     return render(
         request,
@@ -1775,7 +1806,8 @@ def xml_plugins(request, qg_version=None, stable_only=None, package_name=None):
     )
 
 
-@cache_page(60 * 15)
+@conditional_feed
+@cache_feed
 def xml_plugins_new(request, qg_version=None, stable_only=None, package_name=None):
     """
     The XML file
@@ -1836,70 +1868,16 @@ def xml_plugins_new(request, qg_version=None, stable_only=None, package_name=Non
         object_list_new = object_list
     else:
 
-        # Fast lane: uses raw queries
-
-        trusted_users_ids = """
-        (SELECT DISTINCT "auth_user"."id"
-            FROM "auth_user"
-            LEFT OUTER JOIN "auth_user_user_permissions"
-                ON ( "auth_user"."id" = "auth_user_user_permissions"."user_id" )
-            LEFT OUTER JOIN "auth_permission"
-                ON ( "auth_user_user_permissions"."permission_id" = "auth_permission"."id" )
-            LEFT OUTER JOIN "django_content_type"
-                ON ( "auth_permission"."content_type_id" = "django_content_type"."id" )
-        WHERE (("auth_permission"."codename" = 'can_approve'
-            AND "django_content_type"."app_label" = 'plugins')
-            OR "auth_user"."is_superuser" = True))
-        """
-
-        sql = """
-        SELECT DISTINCT ON (pv.plugin_id) pv.*,
-        pv.created_by_id IN %(trusted_users_ids)s AS is_trusted
-            FROM %(pv_table)s pv
-            WHERE (
-                pv.approved = True
-                AND pv."max_qg_version" >= '%(qg_version_with_patch_0)s'
-                AND pv."min_qg_version" <= '%(qg_version_with_patch_99)s'
-                AND pv.experimental = %(experimental)s
-            )
-            ORDER BY pv.plugin_id, pv.version DESC
-        """
-
-        object_list_new = PluginVersion.objects.raw(
-            sql
-            % {
-                "pv_table": PluginVersion._meta.db_table,
-                "p_table": Plugin._meta.db_table,
-                "qg_version": qg_version,
-                "qg_version_with_patch_0": _add_patch_version(qg_version, '0'),
-                "qg_version_with_patch_99": _add_patch_version(qg_version, '99'),
-                "experimental": "False",
-                "trusted_users_ids": str(trusted_users_ids),
-            }
+        return StreamingHttpResponse(
+            iter_plugins_xml(
+                iter_compatible_plugin_versions(
+                    qg_version, stable_only, new_feed=True
+                ),
+                request,
+            ),
+            content_type="text/xml",
         )
 
-        object_list_new = PluginVersion.objects.raw(sql % {
-            'pv_table': PluginVersion._meta.db_table,
-            'p_table': Plugin._meta.db_table,
-            'qg_version_with_patch_0': _add_patch_version(qg_version, '0'),
-            'qg_version_with_patch_99': _add_patch_version(qg_version, '99'),
-            'experimental': 'False',
-            'trusted_users_ids': str(trusted_users_ids),
-        })
-
-
-        if stable_only != '1':
-            # Do the query
-            object_list_new = [o for o in object_list_new]
-            object_list_new += [o for o in PluginVersion.objects.raw(sql % {
-                'pv_table': PluginVersion._meta.db_table,
-                'p_table': Plugin._meta.db_table,
-                'qg_version_with_patch_0': _add_patch_version(qg_version, '0'),
-                'qg_version_with_patch_99': _add_patch_version(qg_version, '99'),
-                'experimental': 'True',
-                'trusted_users_ids': str(trusted_users_ids),
-            })]
-
     return render(
         request,
         "plugins/plugins.xml",
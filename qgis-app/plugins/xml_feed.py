@@ -0,0 +1,463 @@
+"""
+Helpers to build the plugins.xml repository feed straight from the
+database, used both by the views and by the cached xml builder.
+"""
+import gzip
+import os
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.handlers.wsgi import WSGIRequest
+from django.db.models import Exists, F, OuterRef, Q, Window
+from django.db.models.functions import RowNumber
+from django.template import Context
+from django.template.base import render_value_in_context
+from django.template.loader import render_to_string
+from django.templatetags.static import static
+from django.utils.cache import patch_vary_headers
+from lib.file_delivery import serve_file
+from plugins.models import PluginVersion, vjust
+from plugins.templatetags.local_timezone import local_timezone
+
+try:
+    from urllib.parse import urlparse
+except ImportError:
+    from urlparse import urlparse
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+CACHED_XML_FOLDER = "cached_xmls"
+
+# Pre-compressed variants of the cached plugins.xml files, by order of
+# preference: (Content-Encoding, file extension)
+CACHED_XML_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+# Compression levels of the variants by Content-Encoding: the maximum for
+# the full rebuilds, cheaper ones for the rebuilds of each plugin change
+MAX_COMPRESSION_LEVELS = {"br": 11, "gzip": 9}
+FAST_COMPRESSION_LEVELS = {"br": 5, "gzip": 6}
+COMPRESSION_BLOCK_SIZE = 64 * 1024
+
+# Number of plugin versions fetched (and prefetched) at once
+# when streaming the plugins.xml
+XML_CHUNK_SIZE = 500
+
+
+def add_patch_version(version: str, additional_patch: str) -> str:
+    """To add patch number in version.
+
+    e.g qgis version = 3.16 we add patch number (99) in versioning -> 3.16.99
+    We use this versioning to query against PluginVersion min_qg_version,
+    so that the query result will include all PluginVersion with
+    minimum QGIS version 3.16 regardless of the patch number.
+    """
+
+    if not version:
+        return version
+    separator = "."
+    v = version.split(separator)
+    if len(v) == 2:
+        two_first_segment = separator.join(v[:2])
+        version = f"{two_first_segment}.{additional_patch}"
+    return version
+
+
+def normalize_qgis_version(request_version):
+    """
+    Transforms the "qgis" parameter (e.g. 3.24) into the sortable
+    representation stored in the database (e.g. 003.024)
+    """
+    version_level = len(str(request_version).split(".")) - 1
+    return vjust(request_version, fillchar="0", level=version_level, force_zero=True)
+
+
+def compatible_plugin_versions_queryset(qg_version, stable_only="0", new_feed=False):
+    """
+    Returns the latest approved stable (and experimental, unless
+    stable_only is "1") version of each plugin compatible with the
+    given normalized QGIS version, ordered by plugin name.
+
+    The plugins_new.xml feed (new_feed), which the cached plugins.xml
+    files are built from, lists all the stable versions by plugin id
+    before the experimental ones, and trusts the uploader of the version
+    instead of the creator of the plugin.
+
+    The versions are resolved with a single windowed query, the
+    plugins, their creators and tags used by the plugins.xml template
+    are fetched in bulk.
+    """
+    trusted_users = User.objects.filter(
+        Q(
+            user_permissions__codename="can_approve",
+            user_permissions__content_type__app_label="plugins",
+        )
+        | Q(is_superuser=True)
+    )
+    if new_feed:
+        trusted_user_field = "created_by_id"
+        ordering = ("experimental", "plugin_id")
+    else:
+        trusted_user_field = "plugin__created_by_id"
+        ordering = ("plugin__name", "experimental")
+    qs = PluginVersion.objects.filter(approved=True)
+    if qg_version:
+        qs = qs.filter(
+            min_qg_version__lte=add_patch_version(qg_version, "99"),
+            max_qg_version__gte=add_patch_version(qg_version, "0"),
+        )
+    if stable_only == "1":
+        qs = qs.filter(experimental=False)
+    qs = (
+        qs.annotate(
+            version_rank=Window(
+                expression=RowNumber(),
+                partition_by=[F("plugin_id"), F("experimental")],
+                order_by=F("version").desc(),
+            ),
+            is_trusted=Exists(trusted_users.filter(pk=OuterRef(trusted_user_field))),
+        )
+        .filter(version_rank=1)
+        .select_related("plugin", "plugin__created_by", "created_by")
+        .prefetch_related("plugin__tags")
+        .order_by(*ordering)
+    )
+    return qs
+
+
+def get_compatible_plugin_versions(qg_version, stable_only="0", new_feed=False):
+    """
+    Returns the list of compatible_plugin_versions_queryset
+    """
+    return list(compatible_plugin_versions_queryset(qg_version, stable_only, new_feed))
+
+
+def iter_compatible_plugin_versions(qg_version, stable_only="0", new_feed=False):
+    """
+    Iterates compatible_plugin_versions_queryset through a server-side
+    cursor, XML_CHUNK_SIZE versions at a time
+    """
+    return compatible_plugin_versions_queryset(
+        qg_version, stable_only, new_feed
+    ).iterator(chunk_size=XML_CHUNK_SIZE)
+
+
+def build_feed_request(site):
+    """
+    Builds a bare request for the given site, the plugins.xml template
+    uses it to write absolute download and homepage URLs.
+    """
+    parsed_site = urlparse(site)
+    scheme = parsed_site.scheme or "http"
+    return WSGIRequest(
+        {
+            "REQUEST_METHOD": "GET",
+            "PATH_INFO": "/plugins/plugins.xml",
+            "HTTP_HOST": parsed_site.netloc or parsed_site.path.strip("/"),
+            "SERVER_NAME": parsed_site.hostname or "localhost",
+            "SERVER_PORT": "443" if scheme == "https" else "80",
+            "wsgi.url_scheme": scheme,
+            "wsgi.input": BytesIO(),
+        }
+    )
+
+
+def render_plugins_xml(object_list, request):
+    """
+    Renders the plugins.xml template for the given plugin versions
+    """
+    return render_to_string(
+        "plugins/plugins.xml",
+        {"object_list": object_list},
+        request=request,
+    )
+
+
+_XML_CONTEXT = Context(autoescape=True)
+
+PLUGIN_XML = """<pyqgis_plugin name="%(name)s" version="%(version)s" plugin_id="%(plugin_id)s">
+        <description><![CDATA[%(description)s]]></description>
+        <about>%(about)s</about>
+        <version>%(version)s</version>
+        <trusted>%(trusted)s</trusted>
+        <qgis_minimum_version>%(min_qg_version)s</qgis_minimum_version>
+        <qgis_maximum_version>%(max_qg_version)s</qgis_maximum_version>
+        <homepage><![CDATA[%(homepage)s]]></homepage>
+        <file_name>%(file_name)s</file_name>
+        <icon>%(icon)s</icon>
+        <author_name><![CDATA[%(author_name)s]]></author_name>
+        <download_url>%(download_url)s</download_url>
+        <uploaded_by><![CDATA[%(uploaded_by)s]]></uploaded_by>
+        <create_date>%(create_date)s</create_date>
+        <update_date>%(update_date)s</update_date>
+        <experimental>%(experimental)s</experimental>
+        <deprecated>%(deprecated)s</deprecated>
+        <tracker><![CDATA[%(tracker)s]]></tracker>
+        <repository><![CDATA[%(repository)s]]></repository>
+        <tags><![CDATA[%(tags)s]]></tags>
+        <downloads>%(downloads)s</downloads>
+        <average_vote>%(average_vote)s</average_vote>
+        <rating_votes>%(rating_votes)s</rating_votes>
+        <external_dependencies>%(external_dependencies)s</external_dependencies>
+        <server>%(server)s</server>
+    </pyqgis_plugin>"""
+
+
+def _xml_value(value):
+    """
+    Renders a value the way the template engine renders {{ value }}
+    """
+    return render_value_in_context(value, _XML_CONTEXT)
+
+
+def _xml_attr(obj, name):
+    """
+    Renders an attribute, missing attributes are rendered as an empty
+    string like template invalid variables
+    """
+    try:
+        return _xml_value(getattr(obj, name))
+    except AttributeError:
+        return ""
+
+
+def serialize_plugin_version(version, site_url):
+    """
+    Returns the <pyqgis_plugin> element of a plugin version
+    """
+    plugin = version.plugin
+    author = plugin.author or plugin.created_by
+    return PLUGIN_XML % {
+        "name": _xml_value(plugin.name),
+        "version": _xml_value(version.version),
+        "plugin_id": _xml_value(plugin.id),
+        "description": _xml_value(plugin.description),
+        "about": ("<![CDATA[%s]]>" % _xml_value(plugin.about) if plugin.about else ""),
+        "trusted": _xml_attr(version, "is_trusted"),
+        "min_qg_version": _xml_value(version.min_qg_version),
+        "max_qg_version": _xml_value(version.max_qg_version),
+        "homepage": (
+            _xml_value(plugin.homepage)
+            if plugin.homepage
+            else site_url + _xml_value(plugin.get_absolute_url())
+        ),
+        "file_name": _xml_value(version.download_file_name()),
+        "icon": _xml_value(plugin.icon.url) if plugin.icon else "",
+        "author_name": _xml_value(author) if author else "",
+        "download_url": site_url + _xml_value(version.get_download_url()),
+        "uploaded_by": _xml_value(version.created_by),
+        "create_date": _xml_value(local_timezone(plugin.created_on, "WITH-UTC")),
+        "update_date": _xml_value(local_timezone(version.created_on, "WITH-UTC")),
+        "experimental": "True" if version.experimental else "False",
+        "deprecated": _xml_value(plugin.deprecated),
+        "tracker": _xml_value(plugin.tracker),
+        "repository": _xml_value(plugin.repository),
+        "tags": ",".join(_xml_value(tag) for tag in plugin.tags.all()),
+        "downloads": _xml_value(plugin.downloads),
+        "average_vote": _xml_value(plugin.avg_vote),
+        "rating_votes": _xml_value(plugin.rating_votes),
+        "external_dependencies": _xml_attr(plugin, "external_deps"),
+        "server": "True" if plugin.server else "False",
+    }
+
+
+def iter_plugins_xml(versions, request):
+    """
+    Streaming serializer of the plugins.xml: yields the same output
+    as the plugins/plugins.xml template, one plugin at a time.
+    """
+    if request is not None:
+        scheme = "https" if request.is_secure() else "http"
+        site_url = "%s://%s" % (scheme, _xml_value(request.get_host()))
+    else:
+        site_url = "http://"
+    yield (
+        "<?xml version = '1.0' encoding = 'UTF-8'?>\n"
+        '<?xml-stylesheet type="text/xsl" href="%s" ?>\n'
+        "<plugins>\n    " % _xml_value(static("style/plugins.xsl"))
+    )
+    for version in versions:
+        yield serialize_plugin_version(version, site_url)
+    yield "\n</plugins>\n"
+
+
+def get_cached_xml_folder():
+    """
+    Returns the folder of the pre-rendered plugins.xml files, creates it
+    if needed
+    """
+    folder_path = os.path.join(settings.MEDIA_ROOT, CACHED_XML_FOLDER)
+    if not os.path.exists(folder_path):
+        os.mkdir(folder_path)
+    return folder_path
+
+
+def get_cached_xml_path(version_or_label):
+    """
+    Returns the path of the pre-rendered plugins.xml for a QGIS version
+    or a label (latest, stable, ltr)
+    """
+    return os.path.join(
+        settings.MEDIA_ROOT, CACHED_XML_FOLDER, f"plugins_{version_or_label}.xml"
+    )
+
+
+def get_cached_xml_encodings():
+    """
+    Returns the (Content-Encoding, file extension) of the variants
+    written with the cached plugins.xml files: brotli needs the
+    optional brotli package
+    """
+    return [
+        (encoding, extension)
+        for encoding, extension in CACHED_XML_ENCODINGS
+        if encoding != "br" or brotli is not None
+    ]
+
+
+def _compress_file(target, source_path, encoding, level):
+    with open(source_path, "rb") as source:
+        if encoding == "gzip":
+            with gzip.GzipFile(
+                filename="", mode="wb", fileobj=target, compresslevel=level, mtime=0
+            ) as compressed:
+                shutil.copyfileobj(source, compressed, COMPRESSION_BLOCK_SIZE)
+        else:
+            compressor = brotli.Compressor(quality=level)
+            for block in iter(lambda: source.read(COMPRESSION_BLOCK_SIZE), b""):
+                target.write(compressor.process(block))
+            target.write(compressor.finish())
+
+
+def _write_temporary_file(folder_path, write, *args):
+    """
+    Returns the path of a temporary file of the folder filled by
+    write(file, *args)
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=folder_path, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            write(file, *args)
+        # mkstemp creates the file readable by the owner only
+        os.chmod(tmp_path, 0o644)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+    return tmp_path
+
+
+def _write_xml(file, content):
+    for chunk in content:
+        file.write(chunk.encode("utf-8"))
+
+
+def write_cached_xml(version_or_label, content, levels=MAX_COMPRESSION_LEVELS):
+    """
+    Atomically replaces the pre-rendered plugins.xml and its gzip and
+    brotli variants, compressed at the levels by Content-Encoding: the
+    content (a string or an iterable of strings) is written to temporary
+    files in the same folder and then renamed, so readers never see a
+    partially written file.
+    """
+    if isinstance(content, str):
+        content = [content]
+    folder_path = get_cached_xml_folder()
+    file_path = get_cached_xml_path(version_or_label)
+    tmp_paths = []
+    try:
+        xml_tmp_path = _write_temporary_file(folder_path, _write_xml, content)
+        tmp_paths.append((xml_tmp_path, file_path))
+        for encoding, extension in get_cached_xml_encodings():
+            tmp_path = _write_temporary_file(
+                folder_path, _compress_file, xml_tmp_path, encoding, levels[encoding]
+            )
+            tmp_paths.append((tmp_path, file_path + extension))
+        # The plain file last: it is checked before the variants
+        for tmp_path, path in reversed(tmp_paths):
+            os.replace(tmp_path, path)
+    except Exception:
+        for tmp_path, path in tmp_paths:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        raise
+    # Outdated variant of an encoding which is not available anymore
+    for encoding, extension in CACHED_XML_ENCODINGS:
+        if (encoding, extension) not in get_cached_xml_encodings():
+            if os.path.exists(file_path + extension):
+                os.remove(file_path + extension)
+    return file_path
+
+
+def get_accepted_encodings(request):
+    """
+    Returns the content codings of the Accept-Encoding header of the
+    request, except the ones refused with q=0
+    """
+    accepted = set()
+    for part in request.headers.get("Accept-Encoding", "").split(","):
+        coding, _, params = part.partition(";")
+        quality = 1
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0
+        if coding.strip() and quality > 0:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def serve_cached_xml(request, file_path):
+    """
+    Returns a response delivering a cached plugins.xml file, with the
+    FILE_DELIVERY_BACKEND. Django sends the pre-compressed variant
+    accepted by the client, the web servers select it (nginx with
+    gzip_static).
+    """
+    encoding = None
+    if getattr(settings, "FILE_DELIVERY_BACKEND", "django") == "django":
+        accepted = get_accepted_encodings(request)
+        for variant_encoding, extension in get_cached_xml_encodings():
+            if variant_encoding in accepted and os.path.exists(file_path + extension):
+                file_path, encoding = file_path + extension, variant_encoding
+                break
+    response = serve_file(request, file_path, "application/xml")
+    if encoding and response.status_code in (200, 206):
+        response["Content-Encoding"] = encoding
+    patch_vary_headers(response, ("Accept-Encoding",))
+    return response
+
+
+def version_to_tuple(version):
+    """
+    Transforms a dotted version string into a tuple of 3 integers,
+    missing or non numeric parts count as 0
+    """
+    parts = []
+    for part in str(version or "").split(".")[:3]:
+        try:
+            parts.append(int(part))
+        except ValueError:
+            parts.append(0)
+    return tuple(parts + [0] * (3 - len(parts)))
+
+
+def is_version_in_range(qgis_version, min_qg_version, max_qg_version):
+    """
+    Returns True if a plugin version compatible between min_qg_version
+    and max_qg_version is listed in the plugins.xml of qgis_version
+    (x.y, every patch release included).
+    """
+    major, minor, _ = version_to_tuple(qgis_version)
+    if min_qg_version and version_to_tuple(min_qg_version) > (major, minor, 99):
+        return False
+    if max_qg_version and version_to_tuple(max_qg_version) < (major, minor, 0):
+        return False
+    return True
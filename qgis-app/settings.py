@@ -73,7 +73,7 @@ TEMPLATE_LOADERS = (
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
-    "django.middleware.cache.UpdateCacheMiddleware",
+    "plugins.middleware.UpdateCacheMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -84,7 +84,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.RemoteUserMiddleware",
     "django.contrib.flatpages.middleware.FlatpageFallbackMiddleware",
     # Added by Tim for advanced loggin options
-    "django.middleware.cache.FetchFromCacheMiddleware",
+    "plugins.middleware.FetchFromCacheMiddleware",
     "middleware.XForwardedForMiddleware",
     # Handle missing template
     "middleware.HandleTemplateDoesNotExistMiddleware",
@@ -115,6 +115,7 @@ INSTALLED_APPS = [
     # Uncomment the next line to enable admin documentation:
     # 'django.contrib.admindocs',
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     # ABP:
     "plugins",
     #'pagination',
@@ -203,7 +204,13 @@ HAYSTACK_CONNECTIONS = {
 }
 
 # Migration: see http://django-haystack.readthedocs.org/en/latest/migration_from_1_to_2.html#removal-of-realtimesearchindex
-HAYSTACK_SIGNAL_PROCESSOR = "haystack.signals.RealtimeSignalProcessor"
+HAYSTACK_SIGNAL_PROCESSOR = "plugins.search.QueuedSignalProcessor"
+# Name of a shared cache in CACHES queuing the plugins to index until the
+# update_search_index task indexes them. None indexes them on commit.
+SEARCH_INDEX_QUEUE_CACHE = None
+# Plugins search: "postgres" (full text and trigram search in the
+# database) or "haystack" (HAYSTACK_CONNECTIONS index)
+PLUGINS_SEARCH_ENGINE = "postgres"
 
 # Added by Tim for database based caching
 # See http://docs.djangoproject.com/en/dev/topics/cache/
@@ -342,6 +349,41 @@ CELERY_BROKER_URL = BROKER_URL
 CELERY_RESULT_BACKEND = CELERY_BROKER_URL
 
 GEOIP_PATH='/var/opt/maxmind/'
+# Number of IPs whose country is kept in memory, per process
+GEOIP_CACHE_SIZE = 10000
+
+# Delivery of the downloaded files: "django" (streamed by Django),
+# "nginx" (X-Accel-Redirect) or "apache" (X-Sendfile)
+FILE_DELIVERY_BACKEND = "django"
+# nginx internal location aliasing MEDIA_ROOT
+FILE_DELIVERY_NGINX_LOCATION = "/protected-media/"
+# Name of a shared cache in CACHES (memcached, redis, not the DummyCache)
+# buffering the plugin and resource download counters until the
+# flush_download_counters task writes them. None writes them on every
+# download.
+DOWNLOAD_COUNTER_CACHE = None
+# Name of a shared cache in CACHES caching the validation of the API and
+# plugin upload tokens (by jti). None validates them on every request.
+TOKEN_VALIDATION_CACHE = None
+TOKEN_VALIDATION_CACHE_TIMEOUT = 300
+# Minimum number of seconds between two writes of the last use date of
+# a token
+TOKEN_LAST_USED_INTERVAL = 300
+# Name of a shared cache in CACHES keeping the HTTP-Basic credentials
+# verified by the HttpAuthMiddleware for BASIC_AUTH_CACHE_TIMEOUT
+# seconds. None verifies them on every request.
+BASIC_AUTH_CACHE = None
+BASIC_AUTH_CACHE_TIMEOUT = 300
+# Name of a shared cache in CACHES caching the plugins.xml feeds for
+# FEED_CACHE_TIMEOUT seconds, purged when the plugins change. The pages
+# cached by the cache middleware are purged too. None renders the feeds
+# on every request.
+FEED_CACHE = None
+FEED_CACHE_TIMEOUT = 6 * 3600
+# Name of a cache in CACHES keeping the plugin metadata urls found
+# reachable, which are not checked again on the next uploads. None checks
+# them on every upload.
+URL_CHECK_CACHE = None
 # Token access and refresh validity
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=15),
@@ -76,7 +76,6 @@ INSTALLED_APPS = [
     'rest_framework_simplejwt',
     'rest_framework_simplejwt.token_blacklist',
     "sorl_thumbnail_serializer",  # serialize image
-    "drf_multiple_model",
     "drf_yasg",
     "api",
     # styles:
@@ -135,6 +134,14 @@ REST_FRAMEWORK = {
 }
 
 GEOIP_PATH='/var/opt/maxmind/'
+FILE_DELIVERY_BACKEND = os.environ.get("FILE_DELIVERY_BACKEND", "django")
+DOWNLOAD_COUNTER_CACHE = os.environ.get("DOWNLOAD_COUNTER_CACHE") or None
+SEARCH_INDEX_QUEUE_CACHE = os.environ.get("SEARCH_INDEX_QUEUE_CACHE") or None
+TOKEN_VALIDATION_CACHE = os.environ.get("TOKEN_VALIDATION_CACHE") or None
+BASIC_AUTH_CACHE = os.environ.get("BASIC_AUTH_CACHE") or None
+FEED_CACHE = os.environ.get("FEED_CACHE") or None
+URL_CHECK_CACHE = os.environ.get("URL_CHECK_CACHE") or None
+PLUGINS_SEARCH_ENGINE = os.environ.get("PLUGINS_SEARCH_ENGINE", "postgres")
 METABASE_DOWNLOAD_STATS_URL = os.environ.get(
     "METABASE_DOWNLOAD_STATS_URL", 
     "/metabase"
@@ -144,7 +151,9 @@ CELERY_BROKER_URL = os.environ.get('BROKER_URL', 'amqp://rabbitmq:5672')
 CELERY_BEAT_SCHEDULE = {
     'generate_plugins_xml': {
         'task': 'plugins.tasks.generate_plugins_xml.generate_plugins_xml',
-        'schedule': crontab(minute='*/10'),  # Execute every 10 minutes.
+        # Plugin versions changes are rendered on save, the full
+        # generation only refreshes the download counters and votes.
+        'schedule': crontab(minute=0),  # Execute every hour.
         'kwargs': {
             'site': DEFAULT_PLUGINS_SITE
         }
@@ -157,11 +166,23 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'plugins.tasks.update_qgis_versions.update_qgis_versions',
         'schedule': crontab(minute='*/30'),  # Execute every 30 minutes.
     },
+    'flush_download_counters': {
+        'task': 'plugins.tasks.flush_download_counters.flush_download_counters',
+        'schedule': crontab(minute='*'),  # Execute every minute.
+    },
+    'update_search_index': {
+        'task': 'plugins.tasks.update_search_index.update_search_index',
+        'schedule': crontab(minute='*'),  # Execute every minute.
+    },
+    'remove_expired_uploads': {
+        'task': 'plugins.tasks.remove_expired_uploads.remove_expired_uploads',
+        'schedule': crontab(minute=30),  # Execute every hour.
+    },
     # Index synchronization sometimes fails when deleting
-    # a plugin and None is listed in the search list. So I think
-    # it would be better if we rebuild the index frequently
-    'rebuild_search_index': {
-        'task': 'plugins.tasks.rebuild_search_index.rebuild_search_index',
+    # a plugin and None is listed in the search list: the stale
+    # documents are removed and the changed plugins indexed again
+    'catch_up_search_index': {
+        'task': 'plugins.tasks.update_search_index.catch_up_search_index',
         'schedule': crontab(minute=0, hour=3),  # Execute every day at 3 AM.
     }
 }
@@ -64,7 +64,7 @@ TEMPLATE_LOADERS = (
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
-    "django.middleware.cache.UpdateCacheMiddleware",
+    "plugins.middleware.UpdateCacheMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -75,7 +75,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.RemoteUserMiddleware",
     "django.contrib.flatpages.middleware.FlatpageFallbackMiddleware",
     # Added by Tim for advanced loggin options
-    "django.middleware.cache.FetchFromCacheMiddleware",
+    "plugins.middleware.FetchFromCacheMiddleware",
     "middleware.XForwardedForMiddleware",
 ]
 
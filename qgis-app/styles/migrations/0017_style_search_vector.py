@@ -0,0 +1,42 @@
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Concat
+
+
+def populate_search_vector(apps, schema_editor):
+    Style = apps.get_model("styles", "Style")
+    User = apps.get_model("auth", "User")
+
+    creator_names = User.objects.filter(pk=OuterRef("creator_id")).annotate(
+        names=Concat("username", Value(" "), "first_name", Value(" "), "last_name")
+    )
+    Style.objects.update(
+        search_vector=(
+            SearchVector("name", weight="A")
+            + SearchVector("description", weight="B")
+            + SearchVector(Subquery(creator_names.values("names")), weight="C")
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("styles", "0016_style_tags"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="style",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="style",
+            index=django.contrib.postgres.indexes.GinIndex(fields=["search_vector"], name="style_search_idx"),
+        ),
+        migrations.RunPython(populate_search_vector, migrations.RunPython.noop),
+    ]
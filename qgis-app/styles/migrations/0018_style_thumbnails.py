@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("styles", "0017_style_search_vector"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="style",
+            name="thumbnails",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wavefronts", "0004_wavefront_search_vector"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="wavefront",
+            name="thumbnails",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -1,6 +1,8 @@
 import os
 import shutil
+from zipfile import ZIP_DEFLATED
 
+from base.license import LICENSE_FILE
 from base.models.processing_models import Resource, ResourceReview
 from django.conf import settings
 from django.core.validators import FileExtensionValidator
@@ -38,6 +40,8 @@ class Wavefront(Resource):
         null=False,
     )
 
+    archive_compression = ZIP_DEFLATED
+
     def extension(self):
         name, extension = os.path.splitext(self.file.name)
         return extension
@@ -45,6 +49,17 @@ class Wavefront(Resource):
     def get_absolute_url(self):
         return reverse("wavefront_detail", args=(self.id,))
 
+    def get_archive_members(self):
+        """All the 3D files of the folder and the license"""
+        folder_path = os.path.dirname(self.file.path)
+        members = [
+            (os.path.join(folder_path, filename), os.path.join(self.name, filename))
+            for filename in sorted(os.listdir(folder_path))
+            if not filename.endswith(".zip")
+        ]
+        members.append((LICENSE_FILE, os.path.join(self.name, "license.txt")))
+        return members
+
     def delete(self, *args, **kwargs):
         if os.path.isfile(self.file.path):
             path, _ = os.path.split(self.file.path)
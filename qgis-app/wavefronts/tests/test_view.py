@@ -190,7 +190,7 @@ class TestDownloadWavefront(SetUpTest, TestCase):
             "odm texturing/odm_textured_model_geo.obj",
             "odm texturing/license.txt",
         ]
-        with io.BytesIO(response.content) as file:
+        with io.BytesIO(b"".join(response.streaming_content)) as file:
             zip_file = zipfile.ZipFile(file, "r")
             self.assertIsNone(zip_file.testzip())
             for f in expected_filename_list:
@@ -15,7 +15,7 @@ from base.views.processing_view import (
     resource_notify,
 )
 from django.contrib import messages
-from django.http import HttpResponse, HttpResponseRedirect
+from django.http import HttpResponseRedirect
 from django.shortcuts import get_object_or_404
 from django.template.response import TemplateResponse
 from django.urls import reverse_lazy
@@ -23,7 +23,8 @@ from django.utils.text import slugify
 from django.utils.translation import gettext_lazy as _
 from wavefronts.forms import UpdateForm, UploadForm
 from wavefronts.models import Review, Wavefront
-from wavefronts.utilities import zipped_all_with_license
+from base.downloads import record_resource_download
+from lib.file_delivery import serve_file
 from django.utils.translation import gettext_lazy as _
 from urllib.parse import unquote
 
@@ -131,15 +132,11 @@ class WavefrontDownloadView(ResourceMixin, ResourceBaseDownload):
                 )
                 return TemplateResponse(request, self.template_name, context)
         else:
-            object.increase_download_counter()
-            object.save(update_fields=['download_count'])
+            record_resource_download(object)
 
-        # zip the 3d files folder and license.txt
-        path, filename = os.path.split(object.file.file.name)
-        zipfile = zipped_all_with_license(path, object.name)
-
-        response = HttpResponse(
-            zipfile.getvalue(), content_type="application/x-zip-compressed"
+        # the 3d files folder and license.txt zip, built once
+        response = serve_file(
+            request, object.get_download_archive(), "application/x-zip-compressed"
         )
         response["Content-Disposition"] = "attachment; filename=%s.zip" % (
             slugify(object.name, allow_unicode=True)